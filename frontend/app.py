@@ -1,46 +1,144 @@
 import streamlit as st
 import sys
+import os
+import json
 from pathlib import Path
-import requests  
+import requests
+from requests.adapters import HTTPAdapter
 
 sys.path.append(str(Path(__file__).parent.parent))
 
+API_BASE_URL = os.getenv("API_BASE_URL", "https://shl-recommendation-agent-1.onrender.com").rstrip("/")
+API_URL = f"{API_BASE_URL}/api/v1/recommend"
+# (connect, read) seconds; the read timeout applies between streamed events
+REQUEST_TIMEOUT = (float(os.getenv("API_CONNECT_TIMEOUT", 5)), float(os.getenv("API_READ_TIMEOUT", 30)))
+RESULTS_CACHE_TTL = int(os.getenv("RESULTS_CACHE_TTL", 600))  # seconds
+RESULTS_CACHE_SIZE = int(os.getenv("RESULTS_CACHE_SIZE", 1024))  # queries cached, shared by all sessions
+CHAT_HISTORY_WINDOW = int(os.getenv("CHAT_HISTORY_WINDOW", 20))  # messages shown without expanding
+NO_RESULTS = "⚠️ No matching assessments found. Please try a different query."
+SEARCH_FAILED = "⚠️ The recommendation service is unavailable right now. Please try again shortly."
 
-st.set_page_config(page_title="SHL Recommendation Assistant", page_icon="📚")
 
-st.title("🤖 SHL Assessment Recommender")
-st.markdown("Ask a question like _'I want to evaluate programming skills'_ or _'Give me tests for verbal ability'_.")
+@st.cache_resource
+def get_session():
+    """One pooled HTTP session for all reruns and users, so connections are reused"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=int(os.getenv("API_POOL_SIZE", 16)))
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
 
-if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
 
-user_input = st.chat_input("What are you looking for today?")
-if user_input:
-    st.session_state.chat_history.append({"role": "user", "content": user_input})
-    
-   
-    response = requests.post("https://shl-recommendation-agent-1.onrender.com/api/v1/recommend", json={"query": user_input})
+def yes_no(value):
+    return "N/A" if value is None else ("Yes" if value else "No")
 
-    results = response.json().get("results", []) if response.status_code == 200 else []
 
-    if results:
-        response_content = "## Recommended Assessments\n\n"
-        for r in results:
-            response_content += f"""
+def format_results(results, heading="## Recommended Assessments"):
+    content = f"{heading}\n\n"
+    for r in results:
+        content += f"""
 ### {r['name']}
 **Type**: {r['type']}  
-**Remote**: {r.get('remote', 'N/A')}  
-**IRT Support**: {r.get('irt', 'N/A')}  
+**Remote**: {yes_no(r.get('remote'))}  
+**IRT Support**: {yes_no(r.get('irt'))}  
 [🔗 View Test]({r['url']})  
 **Confidence Score**: {r['score']:.3f}
 
 ---
 """
-    else:
-        response_content = "⚠️ No matching assessments found. Please try a different query."
+    return content
+
+
+def stream_recommendations(query):
+    """Events from the streaming endpoint, one per NDJSON line, as they arrive.
+
+    A failed search ("error" event) raises ValueError like a malformed response.
+    """
+    with get_session().post(f"{API_URL}/stream", json={"query": query}, stream=True,
+                            timeout=REQUEST_TIMEOUT) as response:
+        response.raise_for_status()
+        for line in response.iter_lines():
+            if line:
+                event = json.loads(line)
+                if event["event"] == "error":
+                    raise ValueError(f"Search failed: {event.get('message', '')}")
+                yield event
+
+
+class NotCached(Exception):
+    """Raised by final_results on a miss; exceptions are never cached"""
+
+
+@st.cache_data(ttl=RESULTS_CACHE_TTL, max_entries=RESULTS_CACHE_SIZE, show_spinner=False)
+def final_results(api_url, query, _results=None):
+    """Final results for query from api_url, shared by every session.
+
+    Called without _results it only looks the query up, raising NotCached
+    on a miss; called with the streamed results it stores them (_results
+    isn't hashed, so both calls share one key). The streaming itself stays
+    outside: it draws into a placeholder created outside this function,
+    which cached-function replay doesn't support.
+    """
+    if _results is None:
+        raise NotCached(query)
+    return _results
 
-    st.session_state.chat_history.append({"role": "assistant", "content": response_content})
 
-for chat in st.session_state.chat_history:
+def render_message(chat):
     with st.chat_message(chat["role"]):
-        st.markdown(chat["content"], unsafe_allow_html=True)
\ No newline at end of file
+        st.markdown(chat["content"], unsafe_allow_html=True)
+
+
+st.set_page_config(page_title="SHL Recommendation Assistant", page_icon="📚")
+
+st.title("🤖 SHL Assessment Recommender")
+st.markdown("Ask a question like _'I want to evaluate programming skills'_ or _'Give me tests for verbal ability'_.")
+
+if "chat_history" not in st.session_state:
+    st.session_state.chat_history = []
+
+# Messages are stored already formatted. Only the latest CHAT_HISTORY_WINDOW
+# are rendered on each rerun, so long sessions don't get slower.
+history = st.session_state.chat_history
+hidden = max(0, len(history) - CHAT_HISTORY_WINDOW)
+if hidden and st.toggle(f"Show {hidden} earlier messages"):
+    for chat in history[:hidden]:
+        render_message(chat)
+for chat in history[hidden:]:
+    render_message(chat)
+
+user_input = st.chat_input("What are you looking for today?")
+if user_input:
+    st.session_state.chat_history.append({"role": "user", "content": user_input})
+    render_message({"role": "user", "content": user_input})
+
+    with st.chat_message("assistant"):
+        placeholder = st.empty()
+        response_content = NO_RESULTS
+        try:
+            try:
+                results = final_results(API_URL, user_input)
+            except NotCached:
+                results = None
+            if results is None:
+                # Quick keyword matches show up first and are replaced by the final ranking
+                placeholder.markdown("_Searching..._")
+                for event in stream_recommendations(user_input):
+                    if event["event"] == "candidates" and event["results"]:
+                        placeholder.markdown(format_results(event["results"], "## Early Matches (refining...)"),
+                                             unsafe_allow_html=True)
+                    elif event["event"] == "results":
+                        results = event["results"]
+                if results is None:
+                    raise ValueError("Stream ended without results")
+                # Empty lists aren't cached: they may come from a degraded search
+                if results:
+                    final_results(API_URL, user_input, _results=results)
+            if results:
+                response_content = format_results(results)
+        except (requests.RequestException, ValueError) as e:
+            print(f"Stream error: {str(e)}")
+            response_content = SEARCH_FAILED
+        placeholder.markdown(response_content, unsafe_allow_html=True)
+
+    st.session_state.chat_history.append({"role": "assistant", "content": response_content})
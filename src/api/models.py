@@ -0,0 +1,47 @@
+import os
+from typing import List, Union
+from pydantic import BaseModel, Field
+
+# Larger batches are rejected (422) rather than truncated, so results always line up with queries
+MAX_BATCH_QUERIES = int(os.getenv("MAX_BATCH_QUERIES", 5000))
+
+
+class RecommendRequest(BaseModel):
+    query: str = ""
+
+
+class StreamRequest(RecommendRequest):
+    top_k: int = 3
+
+
+class BatchQuery(BaseModel):
+    query: str = ""
+    top_k: int = 3
+
+
+class BatchRequest(BaseModel):
+    # Each query is a plain string or {"query", "top_k"}
+    queries: List[Union[str, BatchQuery]] = Field(default=[], max_length=MAX_BATCH_QUERIES)
+
+
+class Recommendation(BaseModel):
+    name: str
+    url: str
+    score: float
+    type: str = ""
+    duration: float = 0
+    remote: bool = False
+    irt: bool = False
+
+
+class RecommendResponse(BaseModel):
+    results: List[Recommendation]
+
+
+class BatchItemResponse(BaseModel):
+    query: str
+    results: List[Recommendation]
+
+
+class BatchResponse(BaseModel):
+    results: List[BatchItemResponse]
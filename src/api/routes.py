@@ -1,19 +1,84 @@
-from fastapi import APIRouter, Request
-from src.core.recommender import search_pinecone
+import time
+import orjson
+from fastapi import APIRouter
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from src.api.models import RecommendRequest, StreamRequest, BatchRequest, RecommendResponse, BatchResponse
+from src.core.recommender import search_async, search_batch_async, search_stream
+from src.core.metrics import stage, EMPTY_RESULTS
 
 router = APIRouter()
 
-@router.post("/recommend")
-async def recommend(request: Request):
+# Request bodies are validated by their models (malformed ones get a 422).
+# Handlers return ORJSONResponse directly: the models document the response
+# shape without validating every result again on the way out
+@router.post("/recommend", response_model=RecommendResponse)
+async def recommend(body: RecommendRequest):
     try:
-        body = await request.json()
-        query_text = body.get("query", "").strip()
+        query_text = body.query.strip()
         if not query_text:
             return {"results":[]}
 
-        results = search_pinecone(query_text, top_k=3)
-        return {"results": results or []}
+        results = await search_async(query_text, top_k=3)
+        if not results:
+            EMPTY_RESULTS.inc(endpoint="recommend")
+        with stage("serialize"):
+            return ORJSONResponse({"results": results or []})
 
     except Exception as e:
         print(f"API Error: {str(e)}")
-        return {"results": []}
\ No newline at end of file
+        return {"results": []}
+
+
+@router.post("/recommend/stream")
+async def recommend_stream(body: StreamRequest):
+    """NDJSON events: quick lexical "candidates" (when available), the final "results", then "done" """
+    query_text = body.query.strip()
+    top_k = max(1, body.top_k)
+
+    async def events():
+        start = time.perf_counter()
+        count = 0
+        try:
+            if query_text:
+                async for event in search_stream(query_text, top_k):
+                    if event["event"] == "results":
+                        count = len(event["results"])
+                    yield orjson.dumps(event) + b"\n"
+            else:
+                yield orjson.dumps({"event": "results", "results": [], "cached": False}) + b"\n"
+        except Exception as e:
+            print(f"API Error: {str(e)}")
+            yield orjson.dumps({"event": "error", "message": "search failed"}) + b"\n"
+        if not count:
+            EMPTY_RESULTS.inc(endpoint="recommend_stream")
+        yield orjson.dumps({"event": "done", "count": count,
+                            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1)}) + b"\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@router.post("/recommend/batch", response_model=BatchResponse)
+async def recommend_batch(body: BatchRequest):
+    try:
+        queries, top_ks = [], []
+        for item in body.queries:
+            if isinstance(item, str):
+                queries.append(item.strip())
+                top_ks.append(3)
+            else:
+                queries.append(item.query.strip())
+                top_ks.append(max(1, item.top_k))
+
+        results = await search_batch_async(queries, top_ks) if queries else []
+        empty = sum(1 for query_results in results if not query_results)
+        if empty:
+            EMPTY_RESULTS.inc(empty, endpoint="recommend_batch")
+        with stage("serialize"):
+            return ORJSONResponse({"results": [
+                {"query": query, "results": query_results}
+                for query, query_results in zip(queries, results)
+            ]})
+
+    except Exception as e:
+        print(f"API Error: {str(e)}")
+        return {"results": []}
@@ -0,0 +1,218 @@
+"""Index artifact: a dense float32 vector matrix, aligned ids and a JSON manifest.
+
+Layout of an artifact directory:
+
+    vectors.npy    float32 (count, dim), C-contiguous, optionally L2-normalized
+    ids.npy        fixed-width unicode catalog ids, row-aligned with vectors.npy
+    hashes.npy     optional sha256 of each row's embedded text, for incremental runs
+    manifest.json  model, dim, count, normalized flag and sha256 of each file
+    changes.json   optional change set (added/updated/deleted ids) against the
+                   parent build it was derived from, for downstream index sync
+
+Neither array needs pickle, so both load with np.load(mmap_mode="r") and
+workers can start without parsing or copying the vectors.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+import uuid
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+FORMAT_VERSION = 1
+VECTORS_FILE = "vectors.npy"
+IDS_FILE = "ids.npy"
+HASHES_FILE = "hashes.npy"
+MANIFEST_FILE = "manifest.json"
+CHANGES_FILE = "changes.json"
+
+DATA_DIR = Path(os.getenv("DATA_DIR", Path(__file__).resolve().parent.parent / "data"))
+INDEX_DIR = Path(os.getenv("INDEX_DIR", DATA_DIR / "index"))
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def l2_normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IndexArtifact:
+    """A loaded artifact; vectors and ids are read-only memory maps by default"""
+
+    def __init__(self, directory: Path, vectors: np.ndarray, ids: np.ndarray, manifest: Dict[str, Any],
+                 row_hashes: Optional[np.ndarray] = None):
+        self.directory = directory
+        self.vectors = vectors
+        self.ids = ids
+        self.manifest = manifest
+        self.row_hashes = row_hashes
+
+    @property
+    def normalized(self) -> bool:
+        return bool(self.manifest.get("normalized"))
+
+
+def artifact_exists(directory: Path = INDEX_DIR) -> bool:
+    return (Path(directory) / MANIFEST_FILE).exists()
+
+
+def save_artifact(directory: Path, ids: List[str], vectors: np.ndarray, model: str,
+                  normalize: bool = True, row_hashes: Optional[List[str]] = None,
+                  extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Write an artifact; the manifest is written last, so readers never see a partial one"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim != 2 or len(vectors) != len(ids):
+        raise ValueError(f"Expected ({len(ids)}, dim) vectors, got shape {vectors.shape}")
+    if normalize:
+        vectors = l2_normalize(vectors)
+
+    files = {
+        VECTORS_FILE: np.ascontiguousarray(vectors, dtype=np.float32),
+        IDS_FILE: np.array([str(i) for i in ids], dtype=np.str_),
+    }
+    if row_hashes is not None:
+        files[HASHES_FILE] = np.array(row_hashes, dtype=np.str_)
+    else:
+        (directory / HASHES_FILE).unlink(missing_ok=True)
+    hashes = {}
+    for name, array in files.items():
+        tmp = directory / f".{name}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, array, allow_pickle=False)
+        os.replace(tmp, directory / name)
+        hashes[name] = file_sha256(directory / name)
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "build_id": uuid.uuid4().hex,
+        "model": model,
+        "dim": int(vectors.shape[1]),
+        "count": int(vectors.shape[0]),
+        "dtype": "float32",
+        "normalized": bool(normalize),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "files": hashes,
+        **(extra or {})
+    }
+    tmp = directory / f".{MANIFEST_FILE}.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2))
+    os.replace(tmp, directory / MANIFEST_FILE)
+    return manifest
+
+
+def load_manifest(directory: Path = INDEX_DIR) -> Dict[str, Any]:
+    return json.loads((Path(directory) / MANIFEST_FILE).read_text())
+
+
+def load_artifact(directory: Path = INDEX_DIR, mmap: bool = True, verify: bool = False) -> IndexArtifact:
+    """Load an artifact, memory-mapped read-only unless mmap=False"""
+    directory = Path(directory)
+    manifest = load_manifest(directory)
+    if manifest.get("format_version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format: {manifest.get('format_version')}")
+
+    if verify:
+        for name, expected in manifest["files"].items():
+            if file_sha256(directory / name) != expected:
+                raise ValueError(f"Checksum mismatch for {directory / name}")
+
+    mode = "r" if mmap else None
+    vectors = np.load(directory / VECTORS_FILE, mmap_mode=mode, allow_pickle=False)
+    ids = np.load(directory / IDS_FILE, mmap_mode=mode, allow_pickle=False)
+
+    row_hashes = None
+    if HASHES_FILE in manifest["files"]:
+        row_hashes = np.load(directory / HASHES_FILE, mmap_mode=mode, allow_pickle=False)
+
+    if vectors.shape != (manifest["count"], manifest["dim"]) or len(ids) != manifest["count"]:
+        raise ValueError(f"Artifact in {directory} does not match its manifest")
+    return IndexArtifact(directory, vectors, ids, manifest, row_hashes)
+
+
+def save_changes(directory: Path, added: List[str], updated: List[str], deleted: List[str],
+                 parent_build_id: Optional[str] = None) -> Dict[str, Any]:
+    """Record which ids changed in the latest build of the artifact in directory.
+
+    parent_build_id is the build the change set is relative to; a consumer
+    that isn't at that build can't apply it and has to do a full sync.
+    """
+    changes = {
+        "build_id": load_manifest(directory)["build_id"],
+        "parent_build_id": parent_build_id,
+        "added": sorted(added),
+        "updated": sorted(updated),
+        "deleted": sorted(deleted)
+    }
+    tmp = Path(directory) / f".{CHANGES_FILE}.tmp"
+    tmp.write_text(json.dumps(changes, indent=2))
+    os.replace(tmp, Path(directory) / CHANGES_FILE)
+    return changes
+
+
+def load_changes(directory: Path = INDEX_DIR) -> Optional[Dict[str, Any]]:
+    """The change set of the current build, or None if it isn't known"""
+    path = Path(directory) / CHANGES_FILE
+    if not path.exists():
+        return None
+    changes = json.loads(path.read_text())
+    if changes.get("build_id") != load_manifest(directory).get("build_id"):
+        return None  # Left over from an earlier build
+    return changes
+
+
+def convert_legacy(embeddings_path: Path, catalog_path: Path, output_dir: Path, model: str,
+                   normalize: bool = True) -> Dict[str, Any]:
+    """Convert a pickled object-array embeddings.npy into an artifact"""
+    catalog = pd.read_csv(catalog_path)
+    embeddings = np.load(embeddings_path, allow_pickle=True)
+    if len(embeddings) != len(catalog):
+        raise ValueError(f"Embeddings ({len(embeddings)} rows) are not aligned with catalog ({len(catalog)} rows)")
+
+    # Rows that failed to embed were saved as None; leave them out of the index
+    keep = [i for i, e in enumerate(embeddings) if e is not None]
+    ids = catalog["id"].astype(str).iloc[keep].tolist()
+    vectors = np.vstack([np.asarray(embeddings[i], dtype=np.float32) for i in keep])
+    return save_artifact(output_dir, ids, vectors, model, normalize=normalize)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect an index artifact")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    convert = subparsers.add_parser("convert", help="Convert a legacy pickled embeddings.npy")
+    convert.add_argument("--embeddings", default=str(DATA_DIR / "embeddings.npy"))
+    convert.add_argument("--catalog", default=str(DATA_DIR / "product_catalog.csv"))
+    convert.add_argument("--output-dir", default=str(INDEX_DIR))
+    convert.add_argument("--model", default="models/text-embedding-004")
+    convert.add_argument("--no-normalize", action="store_true")
+
+    verify = subparsers.add_parser("verify", help="Check an artifact against its manifest")
+    verify.add_argument("--dir", default=str(INDEX_DIR))
+
+    args = parser.parse_args()
+    if args.command == "convert":
+        manifest = convert_legacy(Path(args.embeddings), Path(args.catalog), Path(args.output_dir),
+                                  args.model, normalize=not args.no_normalize)
+        print(f"✅ Wrote {manifest['count']} x {manifest['dim']} artifact to {args.output_dir}")
+    else:
+        artifact = load_artifact(Path(args.dir), verify=True)
+        print(f"✅ {artifact.manifest['count']} x {artifact.manifest['dim']} vectors, checksums OK")
@@ -0,0 +1,270 @@
+import os
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from src.core.artifact import DATA_DIR, INDEX_DIR, artifact_exists, load_artifact, l2_normalize
+from src.core.constraints import QueryConstraints, AttributeIndex, parse_type_codes
+from src.core.quantized import QuantizedMatrix
+from src.core.ivf import IVFIndex, artifact_vectors, derive_ivf, load_ivf
+from src.core.versions import resolve_index_dir, version_catalog
+
+EMBEDDINGS_PATH = Path(os.getenv("EMBEDDINGS_PATH", DATA_DIR / "embeddings.npy"))
+CATALOG_PATH = Path(os.getenv("CATALOG_PATH", DATA_DIR / "product_catalog.csv"))
+
+# "int8" or "float16" scores a quantized copy first and re-ranks the shortlist exactly
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "").lower() or None
+QUANTIZED_RERANK_FACTOR = int(os.getenv("QUANTIZED_RERANK_FACTOR", 4))
+
+# "ivf" searches an approximate IVF index instead of scanning every row
+LOCAL_ANN_INDEX = os.getenv("LOCAL_ANN_INDEX", "").lower() or None
+
+
+class RetrievalBackend:
+    """Interface for vector retrieval backends"""
+
+    def query(self, vector: List[float], top_k: int,
+              constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
+        """Return up to top_k matches as {'id', 'score', 'metadata'} dicts, best first.
+
+        Only items satisfying constraints are considered.
+        """
+        raise NotImplementedError
+
+    def query_batch(self, vectors: List[List[float]], top_k: int,
+                    constraints: Optional[List[Optional[QueryConstraints]]] = None) -> List[List[Dict[str, Any]]]:
+        """Run query for several vectors; backends override this with a batched call"""
+        constraints = constraints or [None] * len(vectors)
+        return [self.query(vector, top_k, c) for vector, c in zip(vectors, constraints)]
+
+    def score_ids(self, vector: List[float], ids: List[str]) -> Dict[str, float]:
+        """Similarity of vector to specific ids; empty if the backend can't score by id"""
+        return {}
+
+
+class PineconeBackend(RetrievalBackend):
+    """Retrieval against a remote Pinecone index"""
+
+    def __init__(self, index):
+        self.index = index
+
+    def query(self, vector: List[float], top_k: int,
+              constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
+        # Constraints are pushed down as a metadata filter
+        metadata_filter = constraints.to_pinecone_filter() if constraints else None
+        if metadata_filter:
+            response = self.index.query(vector=vector, top_k=top_k, include_metadata=True, filter=metadata_filter)
+        else:
+            response = self.index.query(vector=vector, top_k=top_k, include_metadata=True)
+        return [
+            {'id': m['id'], 'score': m['score'], 'metadata': m.get('metadata') or {}}
+            for m in response['matches'] or []
+        ]
+
+
+def catalog_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Metadata stored alongside each catalog vector (same fields as the Pinecone upsert)"""
+    metadata = {
+        "name": row["assessment_name"],
+        "url": row["url"],
+        "remote": row["remote_testing"],
+        "irt": row["adaptive_irt_support"],
+        "type": row["test_type"],
+        "type_codes": parse_type_codes(row["test_type"])  # List form for $in filters
+    }
+    if pd.notna(row.get("duration")):
+        metadata["duration"] = float(row["duration"])
+    return metadata
+
+
+class LocalBackend(RetrievalBackend):
+    """In-process cosine search over the catalog embedding matrix.
+
+    With quantization set, candidates come from a quantized in-memory copy
+    of the memory-mapped matrix and are re-ranked against the
+    full-precision rows, so returned scores are always exact. With
+    ann="ivf" only the rows in the closest IVF clusters are scored
+    (approximate; quantization is then not used).
+    """
+
+    def __init__(self, index_dir: Path = INDEX_DIR, catalog_path: Path = CATALOG_PATH,
+                 embeddings_path: Path = EMBEDDINGS_PATH, quantization: Optional[str] = LOCAL_INDEX_QUANTIZATION,
+                 rerank_factor: int = QUANTIZED_RERANK_FACTOR, ann: Optional[str] = LOCAL_ANN_INDEX):
+        # A versioned root serves its current version, with the catalog published alongside it
+        index_dir = resolve_index_dir(index_dir)
+        catalog_path = version_catalog(index_dir, catalog_path)
+        self.index_dir = index_dir
+        self.catalog_path = catalog_path
+        catalog = pd.read_csv(catalog_path)
+
+        artifact = None
+        mapped = False  # Whether the float32 rows stay in the page cache rather than process memory
+        if artifact_exists(index_dir):
+            # Memory-mapped; only copied when the artifact was saved unnormalized
+            artifact = load_artifact(index_dir)
+            matrix = artifact_vectors(artifact)
+            mapped = matrix is artifact.vectors and isinstance(matrix, np.memmap)
+            ids = [str(i) for i in artifact.ids]
+        else:
+            # Legacy pickled object array, row-aligned with the catalog
+            embeddings = np.load(embeddings_path, allow_pickle=True)
+            if len(embeddings) != len(catalog):
+                raise ValueError(
+                    f"Embeddings ({len(embeddings)} rows) are not aligned with catalog ({len(catalog)} rows)"
+                )
+            matrix = l2_normalize(np.vstack(embeddings).astype(np.float32))
+            ids = catalog["id"].astype(str).tolist()
+
+        # Normalized rows, so a dot product is the cosine similarity
+        self.matrix = matrix
+        self.ids = ids
+        by_id = {str(row["id"]): catalog_metadata(row) for row in catalog.to_dict("records")}
+        self.metadata = [by_id.get(i, {}) for i in ids]
+        self.rows = {row_id: i for i, row_id in enumerate(ids)}
+        self.attributes = AttributeIndex(self.metadata)
+
+        # The quantized copy only saves memory when the float32 rows are memory-mapped;
+        # IVF takes precedence and never reads it
+        if quantization and ann == "ivf":
+            print(f"⚠️ LOCAL_INDEX_QUANTIZATION={quantization} is ignored with LOCAL_ANN_INDEX=ivf")
+            quantization = None
+        elif quantization and not mapped:
+            print(f"⚠️ LOCAL_INDEX_QUANTIZATION={quantization} needs a normalized, memory-mapped index artifact "
+                  f"(python -m src.core.artifact convert); without one it would add a copy, so it is ignored")
+            quantization = None
+        self.quantized = QuantizedMatrix(matrix, quantization) if quantization else None
+        self.rerank_factor = max(1, rerank_factor)
+        if self.quantized is not None:
+            print(f"Quantized index ({quantization}): {self.quantized.nbytes / 1e6:.1f} MB "
+                  f"in memory; float32 rows ({matrix.nbytes / 1e6:.1f} MB) stay memory-mapped")
+
+        self.ivf = None
+        if ann == "ivf":
+            if artifact is not None:
+                self.ivf = load_ivf(index_dir, artifact)
+                if self.ivf is None:
+                    # A new build: apply its change set to the parent build's index
+                    self.ivf = derive_ivf(index_dir, artifact)
+                    if self.ivf is not None:
+                        print(f"IVF index derived from the parent build ({self.ivf.inserted} rows assigned; "
+                              f"run src/core/ivf.py to persist it)")
+            if self.ivf is None:
+                print("⚠️ No IVF index for this build; training one in memory (run src/core/ivf.py to persist it)")
+                self.ivf = IVFIndex.build(matrix, ids)
+
+    def _shortlist_size(self, top_k: int) -> int:
+        return top_k * self.rerank_factor if self.quantized is not None else top_k
+
+    def _rerank(self, q: np.ndarray, candidates: np.ndarray, top_k: int) -> List[Any]:
+        """Exact (row, score) pairs for the best top_k of a quantized shortlist"""
+        candidates = np.sort(candidates)  # Ascending rows read the memory map sequentially
+        scores = self.matrix[candidates] @ q
+        order = np.argsort(-scores)[:top_k]
+        return list(zip(candidates[order], scores[order]))
+
+    def _subset_hits(self, q: np.ndarray, rows: np.ndarray, top_k: int) -> List[Any]:
+        """Best (row, score) pairs among the given rows"""
+        if self.quantized is not None:
+            scores = self.quantized.scores(q, rows)[0]
+        else:
+            scores = self.matrix[rows] @ q
+
+        k = min(self._shortlist_size(top_k), len(rows))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        if self.quantized is not None:
+            return self._rerank(q, rows[top], top_k)
+        top = top[np.argsort(-scores[top])]
+        return [(rows[i], scores[i]) for i in top]
+
+    def _ivf_hits(self, q: np.ndarray, top_k: int, mask: Optional[np.ndarray]) -> List[Any]:
+        """Best (row, score) pairs from the IVF index, scanning exactly if a filter leaves it short"""
+        # The IVF index covers exactly the artifact's rows, so its rows are ours
+        rows, scores = self.ivf.search(q, top_k, masks=[mask])[0]
+        hits = list(zip(rows, scores))
+        if mask is not None and len(hits) < min(top_k, int(mask.sum())):
+            # A selective filter can empty the probed clusters; the eligible rows are few enough to scan
+            hits = self._subset_hits(q, np.flatnonzero(mask), top_k)
+        return hits
+
+    def _matches(self, hits: List[Any]) -> List[Dict[str, Any]]:
+        return [
+            {'id': self.ids[i], 'score': float(score), 'metadata': self.metadata[i]}
+            for i, score in hits
+        ]
+
+    def query(self, vector: List[float], top_k: int,
+              constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
+        mask = self.attributes.mask(constraints)
+        if mask is None:
+            return self.query_batch([vector], top_k)[0]
+
+        q = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(q)
+        if norm == 0 or not mask.any():
+            return []
+        if self.ivf is not None:
+            return self._matches(self._ivf_hits(q / norm, top_k, mask))
+
+        # Score only the rows that satisfy the constraints
+        return self._matches(self._subset_hits(q / norm, np.flatnonzero(mask), top_k))
+
+    def query_batch(self, vectors: List[List[float]], top_k: int,
+                    constraints: Optional[List[Optional[QueryConstraints]]] = None) -> List[List[Dict[str, Any]]]:
+        q = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        norms = np.linalg.norm(q, axis=1, keepdims=True)
+        valid = norms[:, 0] > 0
+        norms[~valid] = 1.0
+
+        q = q / norms
+        if self.ivf is not None:
+            constraints = constraints or [None] * len(q)
+            return [
+                self._matches(self._ivf_hits(qj, top_k, self.attributes.mask(c))) if ok else []
+                for qj, c, ok in zip(q, constraints, valid)
+            ]
+
+        # One matrix-matrix product scores every query against the whole catalog
+        if self.quantized is not None:
+            scores = self.quantized.scores(q)
+        else:
+            scores = q @ self.matrix.T
+
+        # Rows outside a query's constraints can never be selected
+        for j, c in enumerate(constraints or []):
+            mask = self.attributes.mask(c)
+            if mask is not None:
+                scores[j, ~mask] = -np.inf
+
+        k = min(self._shortlist_size(top_k), self.matrix.shape[0])
+        if k <= 0:
+            return [[] for _ in range(len(q))]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        results = []
+        for j, (row, row_scores, ok) in enumerate(zip(top, top_scores, valid)):
+            if not ok:
+                results.append([])
+                continue
+            finite = np.isfinite(row_scores)
+            if self.quantized is not None:
+                hits = self._rerank(q[j], row[finite], top_k)
+            else:
+                hits = zip(row[finite], row_scores[finite])
+            results.append(self._matches(hits))
+        return results
+
+    def score_ids(self, vector: List[float], ids: List[str]) -> Dict[str, float]:
+        rows = [(row_id, self.rows[row_id]) for row_id in ids if row_id in self.rows]
+        if not rows:
+            return {}
+        q = np.asarray(vector, dtype=np.float32)
+        q = q / (np.linalg.norm(q) or 1.0)
+        scores = self.matrix[[i for _, i in rows]] @ q
+        return {row_id: float(score) for (row_id, _), score in zip(rows, scores)}
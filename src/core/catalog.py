@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from typing import List, Dict, Any, Iterable
+
+
+class CatalogColumns:
+    """The catalog as one array per result field, addressed by row number.
+
+    Results are assembled by indexing these columns with the rows a search
+    returns, instead of reading per-match metadata dicts. Rows are the CSV
+    order, which is also the row order of the lexical index.
+    """
+
+    def __init__(self, catalog: pd.DataFrame):
+        self.ids = catalog["id"].astype(str).to_numpy()
+        self.rows: Dict[str, int] = {row_id: i for i, row_id in enumerate(self.ids)}
+        self.names = catalog["assessment_name"].astype(str).to_numpy()
+        self.urls = catalog["url"].astype(str).to_numpy()
+        self.types = catalog["test_type"].fillna("").astype(str).to_numpy()
+        self.remote = catalog["remote_testing"].astype(str).str.lower().eq("true").to_numpy()
+        self.irt = catalog["adaptive_irt_support"].astype(str).str.lower().eq("true").to_numpy()
+        durations = catalog["duration"] if "duration" in catalog else pd.Series(0.0, index=catalog.index)
+        self.durations = pd.to_numeric(durations, errors="coerce").fillna(0).to_numpy(dtype=np.float32)
+
+    @classmethod
+    def from_csv(cls, path: Path) -> "CatalogColumns":
+        return cls(pd.read_csv(path))
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def rows_of(self, ids: Iterable[str]) -> np.ndarray:
+        """Row of each id, -1 where the id isn't in the catalog"""
+        return np.fromiter((self.rows.get(str(i), -1) for i in ids), dtype=np.int64)
+
+    def results(self, rows: np.ndarray, scores: np.ndarray) -> List[Dict[str, Any]]:
+        """Result dicts for rows, in the given order"""
+        rows = np.asarray(rows, dtype=np.int64)
+        return [
+            {'name': name, 'url': url, 'score': score, 'type': test_type,
+             'duration': duration, 'remote': remote, 'irt': irt}
+            for name, url, score, test_type, duration, remote, irt in zip(
+                self.names[rows].tolist(), self.urls[rows].tolist(),
+                np.asarray(scores, dtype=np.float64).tolist(), self.types[rows].tolist(),
+                self.durations[rows].tolist(), self.remote[rows].tolist(), self.irt[rows].tolist()
+            )
+        ]
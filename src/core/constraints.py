@@ -0,0 +1,191 @@
+import re
+import numpy as np
+from typing import List, Dict, Any, Optional, Tuple
+
+# Phrases naming an SHL test type (codes as in product_catalog.csv). A type
+# the query asks for directly ("a personality test", "only simulations") is
+# a filter; one it only mentions ("personality and Java test") is a preference
+TEST_TYPE_PATTERNS = {
+    "A": r"\b(?:cognitive|aptitude|numerical reasoning|verbal reasoning|inductive reasoning|"
+         r"deductive reasoning|ability tests?)\b",
+    "B": r"\b(?:situational judge?ment|sjt|biodata)\b",
+    "C": r"\bcompetenc(?:y|ies)\b",
+    "D": r"\b(?:360|development report)\b",
+    "E": r"\b(?:assessment exercises?|in-?tray|role[- ]?play)\b",
+    "K": r"\b(?:knowledge tests?|skills? tests?|technical tests?)\b",
+    "P": r"\b(?:personality|behaviou?ral (?:style|assessment|test))\b",
+    "S": r"\b(?:simulations?|job simulation)\b",
+}
+TYPE_RES = {code: re.compile(pattern) for code, pattern in TEST_TYPE_PATTERNS.items()}
+TEST_NOUN = r"(?:tests?|assessments?|questionnaires?|exercises?|simulations?|inventor(?:y|ies)|measures?)"
+ENDS_IN_TEST_NOUN_RE = re.compile(rf"\b{TEST_NOUN}$")
+TEST_NOUN_NEXT_RE = re.compile(rf"\s*{TEST_NOUN}\b")
+ONLY_BEFORE_RE = re.compile(r"\b(?:only|just|purely|exclusively)\s+$")
+CONJUNCTION_RE = re.compile(r"\s*(?:,|/|&|\band\b|\bor\b)?\s*")
+
+DURATION_RE = re.compile(
+    r"\b(\d+(?:\.\d+)?)\s*(?:-|to)?\s*(minutes?|mins?|hours?|hrs?)\b"
+    r"|\b(?:half an? hour|an? hour and a half|an? hour)\b"
+)
+REMOTE_RE = re.compile(
+    r"\bremote(?:ly)?[- ](?:test(?:ing|s)?|proctor\w*|administ\w*|assess\w*|deliver\w*)\b"
+    r"|\b(?:taken|administered|completed|done|sat)\s+remotely\b"
+)
+ADAPTIVE_RE = re.compile(r"\b(?:adaptive|irt|item response theory)\b")
+
+
+class QueryConstraints:
+    """Hard filters extracted from a query, plus test types it only prefers; None means 'no constraint'"""
+
+    def __init__(self, max_duration: Optional[float] = None, remote: Optional[bool] = None,
+                 adaptive: Optional[bool] = None, test_types: Optional[List[str]] = None,
+                 preferred_types: Optional[List[str]] = None):
+        self.max_duration = max_duration
+        self.remote = remote
+        self.adaptive = adaptive
+        self.test_types = sorted(test_types) if test_types else None
+        self.preferred_types = sorted(preferred_types) if preferred_types else None
+
+    def has_filters(self) -> bool:
+        return self.max_duration is not None or self.remote is not None or \
+            self.adaptive is not None or bool(self.test_types)
+
+    def is_empty(self) -> bool:
+        return not self.has_filters() and not self.preferred_types
+
+    def without_filters(self) -> "QueryConstraints":
+        """Only the preferences, for retrying a search its filters left short"""
+        return QueryConstraints(preferred_types=self.preferred_types)
+
+    def key(self) -> str:
+        """Stable string form, for cache keys and logs"""
+        return (f"duration<={self.max_duration}|remote={self.remote}|adaptive={self.adaptive}|"
+                f"types={','.join(self.test_types or [])}|prefer={','.join(self.preferred_types or [])}")
+
+    def prefers(self, metadata: Dict[str, Any]) -> bool:
+        """Whether an item has one of the preferred test types"""
+        return bool(self.preferred_types) and \
+            bool(set(self.preferred_types) & set(parse_type_codes(metadata.get("type", ""))))
+
+    def allows(self, metadata: Dict[str, Any]) -> bool:
+        """Check one item's metadata; unknown durations are never excluded"""
+        if self.remote is not None and bool(metadata.get("remote")) != self.remote:
+            return False
+        if self.adaptive is not None and bool(metadata.get("irt")) != self.adaptive:
+            return False
+        if self.test_types and not set(self.test_types) & set(parse_type_codes(metadata.get("type", ""))):
+            return False
+        duration = metadata.get("duration") or 0
+        if self.max_duration is not None and duration and duration > self.max_duration:
+            return False
+        return True
+
+    def to_pinecone_filter(self) -> Optional[Dict[str, Any]]:
+        """The same constraints as a Pinecone metadata filter"""
+        clauses = []
+        if self.remote is not None:
+            clauses.append({"remote": {"$eq": self.remote}})
+        if self.adaptive is not None:
+            clauses.append({"irt": {"$eq": self.adaptive}})
+        if self.test_types:
+            clauses.append({"type_codes": {"$in": self.test_types}})
+        if self.max_duration is not None:
+            clauses.append({"$or": [
+                {"duration": {"$lte": self.max_duration}},
+                {"duration": {"$exists": False}}
+            ]})
+        if not clauses:
+            return None
+        return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def parse_type_codes(test_type: str) -> List[str]:
+    """'A, B, P' -> ['A', 'B', 'P']"""
+    return [c.strip() for c in str(test_type).split(",") if c.strip() and c.strip() != "N/A"]
+
+
+def parse_duration(text: str) -> Optional[float]:
+    """Largest time budget mentioned in the text, in minutes"""
+    minutes = []
+    for match in DURATION_RE.finditer(text):
+        value, unit, phrase = match.group(1), match.group(2), match.group(0)
+        if value:
+            minutes.append(float(value) * (60 if unit.startswith("h") else 1))
+        elif phrase.startswith("half"):
+            minutes.append(30.0)
+        else:
+            minutes.append(90.0 if "half" in phrase else 60.0)
+    return max(minutes) if minutes else None
+
+
+def parse_test_types(text: str) -> Tuple[List[str], List[str]]:
+    """(types asked for directly, types only mentioned) in a lowercased query.
+
+    A type is asked for when its phrase names a test ("knowledge tests"),
+    is followed by one, possibly through a list ("personality and
+    numerical reasoning tests"), follows "only"/"just", or is the whole query.
+    """
+    spans = sorted((m.start(), m.end(), code) for code, regex in TYPE_RES.items() for m in regex.finditer(text))
+    starts = {start: (end, code) for start, end, code in spans}
+
+    requested, mentioned = set(), set()
+    for start, end, code in spans:
+        # Follow a list of type phrases to its end
+        last_start, last_end = start, end
+        while True:
+            gap = CONJUNCTION_RE.match(text, last_end).end()
+            if gap not in starts:
+                break
+            last_start, last_end = gap, starts[gap][0]
+        direct = (ENDS_IN_TEST_NOUN_RE.search(text[last_start:last_end]) is not None
+                  or TEST_NOUN_NEXT_RE.match(text, last_end) is not None
+                  or ONLY_BEFORE_RE.search(text, 0, start) is not None
+                  or text.strip() == text[start:end])
+        (requested if direct else mentioned).add(code)
+    return sorted(requested), sorted(mentioned - requested)
+
+
+def parse_constraints(query: str) -> QueryConstraints:
+    """Pull duration limits, remote testing, adaptive/IRT and test types out of a query"""
+    text = query.lower()
+    requested, mentioned = parse_test_types(text)
+    return QueryConstraints(
+        max_duration=parse_duration(text),
+        remote=True if REMOTE_RE.search(text) else None,
+        adaptive=True if ADAPTIVE_RE.search(text) else None,
+        test_types=requested or None,
+        preferred_types=mentioned or None
+    )
+
+
+class AttributeIndex:
+    """Per-attribute boolean arrays over catalog rows, for filtering before scoring"""
+
+    def __init__(self, metadata: List[Dict[str, Any]]):
+        self.size = len(metadata)
+        self.remote = np.array([bool(m.get("remote")) for m in metadata], dtype=bool)
+        self.irt = np.array([bool(m.get("irt")) for m in metadata], dtype=bool)
+        self.duration = np.array([float(m.get("duration") or 0) for m in metadata], dtype=np.float32)
+        self.types: Dict[str, np.ndarray] = {}
+        for row, m in enumerate(metadata):
+            for code in parse_type_codes(m.get("type", "")):
+                self.types.setdefault(code, np.zeros(self.size, dtype=bool))[row] = True
+
+    def mask(self, constraints: Optional[QueryConstraints]) -> Optional[np.ndarray]:
+        """Eligible rows for the constraints, or None when every row is eligible"""
+        if constraints is None or not constraints.has_filters():
+            return None
+        mask = np.ones(self.size, dtype=bool)
+        if constraints.remote is not None:
+            mask &= self.remote == constraints.remote
+        if constraints.adaptive is not None:
+            mask &= self.irt == constraints.adaptive
+        if constraints.test_types:
+            any_type = np.zeros(self.size, dtype=bool)
+            for code in constraints.test_types:
+                if code in self.types:
+                    any_type |= self.types[code]
+            mask &= any_type
+        if constraints.max_duration is not None:
+            mask &= (self.duration == 0) | (self.duration <= constraints.max_duration)
+        return mask
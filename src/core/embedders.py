@@ -0,0 +1,236 @@
+"""Query embedders: the remote Gemini model and a local TF-IDF + SVD model.
+
+The local model is fitted on the catalog itself and needs no network, so
+it serves as a fallback when Gemini is slow or unreachable and lets the
+whole stack run air-gapped. Its vectors live in a different space from
+Gemini's, so it ships with its own index artifact (LOCAL_EMBEDDER_DIR):
+the usual vectors/ids/manifest files plus the fitted vocabulary, idf
+weights and SVD projection.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import numpy as np
+import pandas as pd
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Optional, Callable
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core.artifact import DATA_DIR, artifact_exists, file_sha256, load_manifest, save_artifact
+from src.core.lexical import TEST_TYPE_NAMES, tokenize
+
+GEMINI_MODEL = "models/text-embedding-004"
+LOCAL_MODEL = "local/tfidf-svd"
+LOCAL_EMBEDDER_DIR = Path(os.getenv("LOCAL_EMBEDDER_DIR", DATA_DIR / "index_local"))
+LOCAL_EMBEDDER_DIM = int(os.getenv("LOCAL_EMBEDDER_DIM", 256))
+
+VOCAB_FILE = "embedder_vocab.json"
+IDF_FILE = "embedder_idf.npy"
+COMPONENTS_FILE = "embedder_components.npy"
+
+
+class QueryEmbedder:
+    """Interface for turning search queries into vectors"""
+
+    # Model id; also keys the embedding cache, so different models never share entries
+    name = ""
+
+    def embed(self, query: str) -> List[float]:
+        raise NotImplementedError
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        return [self.embed(q) for q in queries]
+
+
+class FunctionEmbedder(QueryEmbedder):
+    """Adapts plain functions (e.g. test stubs) to the embedder interface"""
+
+    def __init__(self, embed_fn: Callable[[str], List[float]],
+                 embed_batch_fn: Optional[Callable[[List[str]], List[List[float]]]] = None,
+                 name: str = GEMINI_MODEL):
+        self.name = name
+        self.embed_fn = embed_fn
+        self.embed_batch_fn = embed_batch_fn
+
+    def embed(self, query: str) -> List[float]:
+        return self.embed_fn(query)
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        if self.embed_batch_fn is None:
+            return super().embed_batch(queries)
+        return self.embed_batch_fn(queries)
+
+
+class GeminiEmbedder(QueryEmbedder):
+    """Remote Gemini embeddings; the client is imported and configured on first use"""
+
+    def __init__(self, api_key: Optional[str], model: str = GEMINI_MODEL):
+        self.name = model
+        self.api_key = api_key
+        self._genai = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        if self._genai is None:
+            with self._lock:
+                if self._genai is None:
+                    import google.generativeai as genai
+                    genai.configure(api_key=self.api_key)
+                    self._genai = genai
+        return self._genai
+
+    def embed(self, query: str) -> List[float]:
+        return self.client().embed_content(
+            model=self.name,
+            content=query,
+            task_type="retrieval_query"  # Lowercase as per current API
+        ).get("embedding", [])
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        return self.client().embed_content(
+            model=self.name,
+            content=queries,
+            task_type="retrieval_query"
+        ).get("embedding", [])
+
+
+def catalog_document(row: Dict) -> str:
+    """Text the local model is fitted on: the name plus spelled-out type and delivery fields"""
+    codes = [c.strip() for c in str(row["test_type"]).split(",")]
+    parts = [str(row["assessment_name"])] + [TEST_TYPE_NAMES.get(c, "") for c in codes]
+    if str(row.get("remote_testing")).lower() == "true":
+        parts.append("remote testing")
+    if str(row.get("adaptive_irt_support")).lower() == "true":
+        parts.append("adaptive irt")
+    return " ".join(parts)
+
+
+class TfidfSvdEmbedder(QueryEmbedder):
+    """TF-IDF over catalog tokens, projected onto the top singular vectors (LSA).
+
+    Embedding a query is a handful of dictionary lookups and a weighted
+    sum of projection rows, so it takes microseconds.
+    """
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, components: np.ndarray):
+        self.vocabulary = vocabulary
+        self.idf = np.asarray(idf, dtype=np.float32)
+        self.components = np.asarray(components, dtype=np.float32)  # (vocab, dim)
+        self.dim = self.components.shape[1]
+        self.name = f"{LOCAL_MODEL}-{self.dim}"
+
+    @classmethod
+    def fit(cls, documents: List[str], dim: int = LOCAL_EMBEDDER_DIM,
+            max_features: int = 20000) -> "TfidfSvdEmbedder":
+        tokenized = [tokenize(doc) for doc in documents]
+        df = Counter(token for tokens in tokenized for token in set(tokens))
+        vocabulary = {token: i for i, (token, _) in enumerate(df.most_common(max_features))}
+
+        n = len(documents)
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        for token, i in vocabulary.items():
+            idf[i] = np.log((1 + n) / (1 + df[token])) + 1
+
+        tfidf = np.zeros((n, len(vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(tokenized):
+            for token, count in Counter(tokens).items():
+                if token in vocabulary:
+                    tfidf[row, vocabulary[token]] = (1 + np.log(count)) * idf[vocabulary[token]]
+        norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        tfidf /= norms
+
+        _, _, vt = np.linalg.svd(tfidf, full_matrices=False)
+        k = min(dim, vt.shape[0])
+        return cls(vocabulary, idf, vt[:k].T)
+
+    def transform(self, texts: List[str]) -> np.ndarray:
+        """Unnormalized projections of several texts"""
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            counts = Counter(t for t in tokenize(text) if t in self.vocabulary)
+            if not counts:
+                continue
+            idx = np.fromiter((self.vocabulary[t] for t in counts), dtype=np.int64, count=len(counts))
+            weights = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32, count=len(counts)))) * self.idf[idx]
+            out[row] = (weights / np.linalg.norm(weights)) @ self.components[idx]
+        return out
+
+    def embed(self, query: str) -> List[float]:
+        return self.embed_batch([query])[0]
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        vectors = self.transform(queries)
+        norms = np.linalg.norm(vectors, axis=1)
+        # No known token: an empty embedding, which callers treat like a failed call
+        return [(v / n).tolist() if n > 0 else [] for v, n in zip(vectors, norms)]
+
+    def save(self, directory: Path) -> None:
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, array in ((IDF_FILE, self.idf), (COMPONENTS_FILE, self.components)):
+            tmp = directory / f".{name}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp, directory / name)
+        tmp = directory / f".{VOCAB_FILE}.tmp"
+        tmp.write_text(json.dumps(self.vocabulary))
+        os.replace(tmp, directory / VOCAB_FILE)
+
+    @classmethod
+    def load(cls, directory: Path) -> "TfidfSvdEmbedder":
+        directory = Path(directory)
+        return cls(
+            json.loads((directory / VOCAB_FILE).read_text()),
+            np.load(directory / IDF_FILE, allow_pickle=False),
+            np.load(directory / COMPONENTS_FILE, allow_pickle=False)
+        )
+
+
+def build_local_index(catalog_path: Path, directory: Path = LOCAL_EMBEDDER_DIR,
+                      dim: int = LOCAL_EMBEDDER_DIM) -> TfidfSvdEmbedder:
+    """Fit the local embedder on the catalog and write it with its aligned index artifact"""
+    catalog = pd.read_csv(catalog_path)
+    documents = [catalog_document(row) for row in catalog.to_dict("records")]
+    embedder = TfidfSvdEmbedder.fit(documents, dim)
+
+    # Embedder files first; the artifact manifest is written last and marks the build complete
+    embedder.save(directory)
+    save_artifact(directory, catalog["id"].astype(str).tolist(), embedder.transform(documents), embedder.name,
+                  extra={"catalog_sha256": file_sha256(Path(catalog_path))})
+    return embedder
+
+
+def local_embedder_fitted(catalog_path: Path, directory: Path = LOCAL_EMBEDDER_DIR) -> bool:
+    """Whether directory holds a local embedder fitted on this catalog"""
+    directory = Path(directory)
+    return artifact_exists(directory) and (directory / VOCAB_FILE).exists() and \
+        load_manifest(directory).get("catalog_sha256") == file_sha256(Path(catalog_path))
+
+
+def load_local_embedder(catalog_path: Path, directory: Path = LOCAL_EMBEDDER_DIR) -> TfidfSvdEmbedder:
+    """The local embedder for this catalog, refitting it when missing or built from another catalog"""
+    directory = Path(directory)
+    if local_embedder_fitted(catalog_path, directory):
+        return TfidfSvdEmbedder.load(directory)
+    print(f"Fitting local embedder on {catalog_path}")
+    return build_local_index(catalog_path, directory)
+
+
+if __name__ == "__main__":
+    from src.core.backends import CATALOG_PATH
+
+    parser = argparse.ArgumentParser(description="Fit the local TF-IDF + SVD query embedder")
+    parser.add_argument("--catalog", default=str(CATALOG_PATH))
+    parser.add_argument("--output-dir", default=str(LOCAL_EMBEDDER_DIR))
+    parser.add_argument("--dim", type=int, default=LOCAL_EMBEDDER_DIM)
+    args = parser.parse_args()
+
+    embedder = build_local_index(Path(args.catalog), Path(args.output_dir), args.dim)
+    print(f"✅ Local embedder ({len(embedder.vocabulary)} terms -> {embedder.dim} dims) "
+          f"and index written to {args.output_dir}")
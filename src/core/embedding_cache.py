@@ -0,0 +1,130 @@
+import hashlib
+import sqlite3
+import threading
+import time
+import numpy as np
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share a key"""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Bounded LRU/TTL cache for query embeddings with an optional SQLite tier on disk.
+
+    The disk tier is bounded too: expired rows are deleted and the oldest
+    rows past disk_max_size are evicted.
+    """
+
+    # Disk eviction runs once per this many writes, not on every write
+    EVICT_EVERY = 64
+
+    def __init__(self, max_size: int = 2048, ttl: float = 86400.0, disk_path: Optional[str] = None,
+                 disk_max_size: int = 100000):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.disk_max_size = disk_max_size
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self._disk_writes = 0
+
+        if disk_path:
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, created REAL NOT NULL, vector BLOB NOT NULL)"
+            )
+            self._disk.execute("CREATE INDEX IF NOT EXISTS embeddings_created ON embeddings (created)")
+            self._disk.commit()
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        digest = hashlib.sha256(normalize_query(text).encode("utf-8")).hexdigest()
+        return f"{model}:{digest}"
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return the cached embedding, or None on a miss or expired entry"""
+        key = self.make_key(text, model)
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, vector = entry
+                if now - created < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return vector.tolist()
+                del self._entries[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT created, vector FROM embeddings WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[0] < self.ttl:
+                    vector = np.frombuffer(row[1], dtype=np.float32)
+                    self._remember(key, row[0], vector)
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return vector.tolist()
+
+            self.misses += 1
+            return None
+
+    def set(self, text: str, model: str, embedding: List[float]) -> None:
+        key = self.make_key(text, model)
+        created = time.time()
+        vector = np.asarray(embedding, dtype=np.float32)
+
+        with self._lock:
+            self._remember(key, created, vector)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO embeddings (key, created, vector) VALUES (?, ?, ?)",
+                    (key, created, vector.tobytes())
+                )
+                self._disk_writes += 1
+                if self._disk_writes % self.EVICT_EVERY == 0:
+                    self._disk.execute("DELETE FROM embeddings WHERE created <= ?", (created - self.ttl,))
+                    self._disk.execute(
+                        "DELETE FROM embeddings WHERE key IN "
+                        "(SELECT key FROM embeddings ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                        (self.disk_max_size,)
+                    )
+                self._disk.commit()
+
+    def _remember(self, key: str, created: float, vector: np.ndarray) -> None:
+        self._entries[key] = (created, vector)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM embeddings")
+                self._disk.commit()
+
+    def disk_size(self) -> int:
+        if self._disk is None:
+            return 0
+        with self._lock:
+            return self._disk.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -1,23 +1,34 @@
 import pandas as pd
 import numpy as np
 import os
-from dotenv import load_dotenv 
+import sys
+import shutil
+import hashlib
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple
+from dotenv import load_dotenv
 import google.generativeai as genai
 from tqdm import tqdm
 from tenacity import retry, stop_after_attempt, wait_exponential
 
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
 
+from src.utils.rate_limit import RateLimiter
+from src.core.artifact import (
+    DATA_DIR, INDEX_DIR, artifact_exists, load_artifact, load_manifest, save_artifact, save_changes, file_sha256
+)
+from src.core.versions import is_versioned, publish, resolve_index_dir, staging_dir, version_dir
 
 load_dotenv()
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY not found in environment variables")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-
-
-df=pd.read_csv('app/data/product_catalog.csv')
 
+EMBEDDING_MODEL = "models/text-embedding-004"
+BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 100))  # Gemini accepts up to 100 texts per call
+WORKERS = int(os.getenv("EMBED_WORKERS", 4))
+REQUESTS_PER_MINUTE = float(os.getenv("EMBED_REQUESTS_PER_MINUTE", 1500))
 
 
 def combine_fields(row):
@@ -30,49 +41,213 @@ def combine_fields(row):
               Type:{row['test_type']}.
              """
 
-df['combined_text']=df.apply(combine_fields, axis=1)
 
-@retry(stop=stop_after_attempt(3), wait=wait_exponential(multiplier=1,min=4,max=10))
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=0.5, min=0.5, max=8), reraise=True)
+def get_embeddings(texts: List[str], limiter: RateLimiter) -> List[List[float]]:
+    """Embed a batch of documents in one API call, with retry logic for API stability"""
+    limiter.acquire()
+    result = genai.embed_content(
+        model=EMBEDDING_MODEL,
+        content=texts,
+        task_type="retrieval_document"
+    )
+    embeddings = result['embedding']
+    if len(embeddings) != len(texts):
+        raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+    return embeddings
+
+
+class Checkpoint:
+    """Completed batches saved as small .npz shards so an interrupted run can resume"""
+
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._shards = len(list(self.directory.glob("shard_*.npz")))
+
+    def load(self) -> Dict[Tuple[str, str], np.ndarray]:
+        """Vectors already embedded, keyed by (id, text hash)"""
+        done = {}
+        for shard in sorted(self.directory.glob("shard_*.npz")):
+            data = np.load(shard)
+            for row_id, digest, vector in zip(data["ids"], data["hashes"], data["vectors"]):
+                done[(str(row_id), str(digest))] = vector
+        return done
+
+    def save(self, ids: List[str], hashes: List[str], vectors: List[List[float]]) -> None:
+        with self._lock:
+            path = self.directory / f"shard_{self._shards:06d}.npz"
+            self._shards += 1
+        tmp = path.with_suffix(".tmp.npz")
+        np.savez(tmp, ids=np.array(ids), hashes=np.array(hashes),
+                 vectors=np.asarray(vectors, dtype=np.float32))
+        os.replace(tmp, path)  # Never leave a half-written shard behind
+
+    def clear(self) -> None:
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+def generate_embeddings(df: pd.DataFrame, checkpoint: Checkpoint, batch_size: int = BATCH_SIZE,
+                        workers: int = WORKERS, requests_per_minute: float = REQUESTS_PER_MINUTE):
+    """Embed every catalog row; returns (embeddings aligned with df, failed row indices)"""
+    ids = df["id"].astype(str).tolist()
+    texts = df["combined_text"].tolist()
+    hashes = [text_hash(t) for t in texts]
+    limiter = RateLimiter(requests_per_minute / 60.0, burst=workers)
+
+    done = checkpoint.load()
+    pending = [i for i in range(len(df)) if (ids[i], hashes[i]) not in done]
+    if len(pending) < len(df):
+        print(f"Resuming: {len(df) - len(pending)} rows already embedded")
+
+    def run_batch(rows: List[int]) -> None:
+        vectors = get_embeddings([texts[i] for i in rows], limiter)
+        checkpoint.save([ids[i] for i in rows], [hashes[i] for i in rows], vectors)
+        for i, vector in zip(rows, vectors):
+            done[(ids[i], hashes[i])] = np.asarray(vector, dtype=np.float32)
+
+    batches = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+    failed = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run_batch, rows): rows for rows in batches}
+        with tqdm(total=len(pending), desc="Generating embeddings") as progress:
+            for future in as_completed(futures):
+                rows = futures[future]
+                try:
+                    future.result()
+                except Exception as e:
+                    print(f"Error generating embeddings for batch of {len(rows)}: {str(e)}")
+                    failed.extend(rows)
+                progress.update(len(rows))
 
-def get_embedding(text:str)-> list:
-    """Get embedding with retry logic for API stability """
+    # Retry only the rows that failed, one at a time, so one bad row can't sink a batch
+    still_failed = []
+    for i in tqdm(sorted(failed), desc="Retrying failed rows", disable=not failed):
+        try:
+            run_batch([i])
+        except Exception as e:
+            print(f"Error generating embedding for row {i}: {str(e)}")
+            still_failed.append(i)
 
+    embeddings = [done.get((ids[i], hashes[i])) for i in range(len(df))]
+    return embeddings, still_failed
+
+
+def load_previous(directory: Path) -> Dict[str, Tuple[str, np.ndarray]]:
+    """Text hash and vector of every row in the existing artifact, keyed by id"""
+    if not artifact_exists(directory):
+        return {}
+    artifact = load_artifact(directory, mmap=False)
+    if artifact.row_hashes is None or artifact.manifest["model"] != EMBEDDING_MODEL:
+        return {}  # Nothing we can safely reuse
+    return {
+        str(row_id): (str(digest), vector)
+        for row_id, digest, vector in zip(artifact.ids, artifact.row_hashes, artifact.vectors)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate catalog embeddings")
+    parser.add_argument("--catalog", default=str(DATA_DIR / "product_catalog.csv"))
+    parser.add_argument("--output-dir", default=str(INDEX_DIR), help="Index artifact directory")
+    parser.add_argument("--no-normalize", action="store_true", help="Store raw, unnormalized vectors")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--rpm", type=float, default=REQUESTS_PER_MINUTE, help="API requests per minute")
+    parser.add_argument("--full", action="store_true", help="Re-embed every row, ignoring the previous artifact")
+    args = parser.parse_args()
+
+    GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
+    if not GOOGLE_API_KEY:
+        raise ValueError("GOOGLE_API_KEY not found in environment variables")
+    genai.configure(api_key=GOOGLE_API_KEY)
+
+    output_dir = Path(args.output_dir)
+    # A versioned root is read from its current version and published to as a new one
+    versioned = is_versioned(output_dir)
+    df = pd.read_csv(args.catalog)
+    df['combined_text'] = df.apply(combine_fields, axis=1)
+
+    ids = df["id"].astype(str).tolist()
+    hashes = [text_hash(t) for t in df["combined_text"]]
+
+    # Embed only rows that are new or whose text changed since the last artifact
+    previous = {} if args.full else load_previous(resolve_index_dir(output_dir))
+    # The change set is only meaningful relative to the build it was diffed against
+    parent_build_id = load_manifest(resolve_index_dir(output_dir))["build_id"] if previous else None
+    changed = [i for i, (row_id, digest) in enumerate(zip(ids, hashes))
+               if previous.get(row_id, (None, None))[0] != digest]
+    deleted = sorted(set(previous) - set(ids))
+    print(f"{len(changed)} new or changed rows, {len(deleted)} removed, "
+          f"{len(ids) - len(changed)} unchanged")
+    if not changed and not deleted:
+        print("Catalog unchanged; nothing to embed")
+        return
+
+    checkpoint = Checkpoint(output_dir.parent / ".embedding_checkpoint")
+    new_embeddings, failed = generate_embeddings(
+        df.iloc[changed].reset_index(drop=True), checkpoint,
+        batch_size=args.batch_size, workers=args.workers, requests_per_minute=args.rpm
+    )
+    embedded = {changed[i]: e for i, e in enumerate(new_embeddings) if e is not None}
+    failed_indices = [changed[i] for i in failed]
+
+    # Carry unchanged vectors forward. A changed row that failed to embed keeps
+    # its old vector and old hash, so the next run picks it up again.
+    out_ids, out_hashes, out_vectors, added, updated = [], [], [], [], []
+    for i, row_id in enumerate(ids):
+        if i in embedded:
+            (updated if row_id in previous else added).append(row_id)
+            out_ids.append(row_id)
+            out_hashes.append(hashes[i])
+            out_vectors.append(embedded[i])
+        elif row_id in previous:
+            out_ids.append(row_id)
+            out_hashes.append(previous[row_id][0])
+            out_vectors.append(previous[row_id][1])
+
+    if not out_vectors:
+        raise RuntimeError("No embeddings were generated")
+
+    # Save the embeddings as a dense float32 artifact; failed rows are left out
+    build_dir = staging_dir(output_dir) if versioned else output_dir
     try:
-        result=genai.embed_content(
-              model="models/text-embedding-004",
-              content=text,
-              task_type="retrieval_document"
+        manifest = save_artifact(
+            build_dir,
+            ids=out_ids,
+            vectors=np.vstack(out_vectors),
+            model=EMBEDDING_MODEL,
+            normalize=not args.no_normalize,
+            row_hashes=out_hashes,
+            extra={"catalog_sha256": file_sha256(Path(args.catalog))}
         )
-        return result['embedding']
+        changes = save_changes(build_dir, added, updated, deleted, parent_build_id)
+        if versioned:
+            version = publish(output_dir, build_dir, Path(args.catalog))
+            build_dir = version_dir(output_dir, version)
+            print(f"Published index version {version}")
+        print(f"Saved {manifest['count']} x {manifest['dim']} embeddings to {build_dir} "
+              f"({len(changes['added'])} added, {len(changes['updated'])} updated, "
+              f"{len(changes['deleted'])} deleted)")
+
+        if failed_indices:
+            print(f"Warning: Failed to generate embeddings for {len(failed_indices)} rows (indices: {failed_indices})")
+            print("Completed rows are checkpointed; re-run to retry the failed ones")
+        else:
+            checkpoint.clear()
+            print("Successfully generated embeddings for all rows")
+
     except Exception as e:
-        print(f"Error generating embedding:{str(e)}")
+        print(f"Error saving embeddings: {str(e)}")
+        if versioned and build_dir.name.endswith(".staging"):
+            shutil.rmtree(build_dir, ignore_errors=True)
         raise
 
-embeddings=[]
-failed_indices=[]
-for idx, text in tqdm(enumerate(df["combined_text"]), total=len(df), desc="Generating embeddings"):
-    try:
-        embedding = get_embedding(text)
-        embeddings.append(embedding)
-    except:
-        embeddings.append(None)  # Keep index alignment
-        failed_indices.append(idx)
-        continue
-
-# Save the embeddings
-try:
-    embeddings_array = np.array(embeddings, dtype=object)
-    np.save("app/data/embeddings.npy", embeddings_array)
-    
-    # Add embeddings to DataFrame (as list for CSV compatibility)
-    df['embedding'] = embeddings
-    df.to_csv("app/data/embeddings.csv", index=False)
-    
-    if failed_indices:
-        print(f"Warning: Failed to generate embeddings for {len(failed_indices)} rows (indices: {failed_indices})")
-    else:
-        print("Successfully generated embeddings for all rows")
-        
-except Exception as e:
-    print(f"Error saving embeddings: {str(e)}")
-    raise
\ No newline at end of file
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Inverted-file (IVF) approximate nearest-neighbour index.
+
+Spherical k-means splits the normalized vectors into nlist clusters; a
+query scores the centroids, then only the rows of its nprobe closest
+clusters. Files are written next to the artifact they index:
+
+    ivf.json           nlist, nprobe, artifact build_id, row count
+    ivf_centroids.npy  float32 (nlist, dim)
+    ivf_assign.npy     int32 cluster of every row
+    ivf_ids.npy        ids of the rows, so a later build can reuse assignments
+
+A new build of the artifact is indexed incrementally from the IVF index
+of its parent build by applying the build's change set (changes.json):
+added and updated rows are assigned to their nearest centroid, deleted
+rows drop out and every other row keeps its cluster, so neither k-means
+nor re-scoring the unchanged rows is needed. Both the ivf.py CLI and
+LocalBackend do this when the current build has no IVF index of its own.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core.artifact import INDEX_DIR, IndexArtifact, load_artifact, load_changes, l2_normalize
+from src.core.versions import VERSIONS_DIR, resolve_index_dir
+
+IVF_MANIFEST = "ivf.json"
+CENTROIDS_FILE = "ivf_centroids.npy"
+ASSIGN_FILE = "ivf_assign.npy"
+IDS_FILE = "ivf_ids.npy"
+
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))
+
+# Rows scored against the centroids at a time during training and assignment
+ASSIGN_BLOCK_ROWS = 16384
+
+
+def artifact_vectors(artifact: IndexArtifact) -> np.ndarray:
+    """Normalized artifact rows; the memory map itself when they were saved normalized"""
+    return artifact.vectors if artifact.normalized else l2_normalize(np.asarray(artifact.vectors))
+
+
+def default_nlist(count: int) -> int:
+    """About 4 * sqrt(n) clusters, the usual starting point for IVF"""
+    return int(max(1, min(count, round(4 * np.sqrt(count)))))
+
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid for every row"""
+    assign = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + ASSIGN_BLOCK_ROWS], dtype=np.float32)
+        assign[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assign
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = 15,
+                    sample_size: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the (normalized) vectors"""
+    rng = np.random.default_rng(seed)
+    sample_size = min(len(vectors), sample_size or nlist * 64)
+    sample = np.asarray(vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = assign_clusters(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        sums = np.zeros_like(centroids)
+        sums[~empty] = np.add.reduceat(sample[order], np.cumsum(counts)[~empty] - counts[~empty])
+        # Re-seed empty clusters with random sample points
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = l2_normalize(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """IVF index over a row-aligned vector matrix (usually the artifact's memory map)"""
+
+    def __init__(self, centroids: np.ndarray, vectors: np.ndarray, ids: List[str], assign: np.ndarray,
+                 nprobe: int = IVF_NPROBE, build_id: Optional[str] = None):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.vectors = vectors
+        self.ids = [str(i) for i in ids]
+        self.assign = np.asarray(assign, dtype=np.int32)
+        self.nprobe = nprobe
+        self.build_id = build_id
+        self.inserted = 0  # Rows assigned on top of a parent build's index by apply_changes
+        self._build_lists()
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: List[str], nlist: Optional[int] = None,
+              nprobe: int = IVF_NPROBE, iterations: int = 15, seed: int = 0,
+              build_id: Optional[str] = None) -> "IVFIndex":
+        """Train centroids on normalized vectors and assign every row"""
+        centroids = train_centroids(vectors, nlist or default_nlist(len(vectors)), iterations, seed=seed)
+        return cls(centroids, vectors, ids, assign_clusters(vectors, centroids), nprobe=nprobe, build_id=build_id)
+
+    def _build_lists(self):
+        order = np.argsort(self.assign, kind="stable").astype(np.int64)
+        bounds = np.searchsorted(self.assign[order], np.arange(self.nlist + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(self.nlist)]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def for_artifact(cls, centroids: np.ndarray, artifact: IndexArtifact, nprobe: int = IVF_NPROBE) -> "IVFIndex":
+        """Index a (new build of an) artifact with already-trained centroids, re-assigning every row"""
+        vectors = artifact_vectors(artifact)
+        return cls(centroids, vectors, [str(i) for i in artifact.ids], assign_clusters(vectors, centroids),
+                   nprobe=nprobe, build_id=artifact.manifest.get("build_id"))
+
+    @classmethod
+    def apply_changes(cls, centroids: np.ndarray, parent_ids: List[str], parent_assign: np.ndarray,
+                      artifact: IndexArtifact, changes: Dict[str, Any], nprobe: int = IVF_NPROBE) -> "IVFIndex":
+        """Index a new build from its parent build's assignments and the build's change set.
+
+        Added and updated rows (and any id the parent didn't index) are
+        assigned to their nearest centroid; deleted rows are simply not in
+        the new build; every other row keeps the parent's cluster.
+        """
+        vectors = artifact_vectors(artifact)
+        ids = [str(i) for i in artifact.ids]
+        parent_rows = {str(row_id): row for row, row_id in enumerate(parent_ids)}
+        changed = set(changes.get("added", [])) | set(changes.get("updated", []))
+
+        assign = np.empty(len(ids), dtype=np.int32)
+        inserted = []
+        for row, row_id in enumerate(ids):
+            parent_row = parent_rows.get(row_id)
+            if parent_row is None or row_id in changed:
+                inserted.append(row)
+            else:
+                assign[row] = parent_assign[parent_row]
+        if inserted:
+            assign[inserted] = assign_clusters(vectors[np.asarray(inserted)], centroids)
+
+        index = cls(centroids, vectors, ids, assign, nprobe=nprobe, build_id=artifact.manifest.get("build_id"))
+        index.inserted = len(inserted)
+        return index
+
+    def candidates(self, query: np.ndarray, nprobe: Optional[int] = None) -> np.ndarray:
+        """Rows in the nprobe clusters closest to one normalized query"""
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        probe = np.argpartition(-(self.centroids @ query), nprobe - 1)[:nprobe]
+        return np.sort(np.concatenate([self.lists[c] for c in probe]))
+
+    def search(self, queries: np.ndarray, top_k: int, nprobe: Optional[int] = None,
+               masks: Optional[List[Optional[np.ndarray]]] = None) -> List[Tuple[np.ndarray, np.ndarray]]:
+        """(rows, scores) best first for each normalized query; masks select eligible rows"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        masks = masks or [None] * len(queries)
+        results = []
+        for q, mask in zip(queries, masks):
+            rows = self.candidates(q, nprobe)
+            if mask is not None:
+                rows = rows[mask[rows]]
+            if not len(rows):
+                results.append((rows, np.empty(0, dtype=np.float32)))
+                continue
+            scores = np.asarray(self.vectors[rows], dtype=np.float32) @ q
+            k = min(top_k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            results.append((rows[top], scores[top]))
+        return results
+
+    def save(self, directory: Path):
+        """Write the index next to its artifact; ivf.json goes last"""
+        directory = Path(directory)
+        files = {
+            CENTROIDS_FILE: self.centroids,
+            ASSIGN_FILE: self.assign,
+            IDS_FILE: np.array(self.ids, dtype=np.str_),
+        }
+        for name, array in files.items():
+            tmp = directory / f".{name}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp, directory / name)
+
+        manifest = {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "build_id": self.build_id,
+            "count": len(self.ids),
+            "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        }
+        tmp = directory / f".{IVF_MANIFEST}.tmp"
+        tmp.write_text(json.dumps(manifest, indent=2))
+        os.replace(tmp, directory / IVF_MANIFEST)
+
+
+def ivf_exists(directory: Path = INDEX_DIR) -> bool:
+    return (Path(directory) / IVF_MANIFEST).exists()
+
+
+def load_ivf_manifest(directory: Path) -> Dict[str, Any]:
+    return json.loads((Path(directory) / IVF_MANIFEST).read_text())
+
+
+def load_ivf(directory: Path, artifact: IndexArtifact, nprobe: Optional[int] = None) -> Optional[IVFIndex]:
+    """The saved IVF index for this artifact build, or None if missing or built for another one"""
+    directory = Path(directory)
+    if not ivf_exists(directory):
+        return None
+    manifest = load_ivf_manifest(directory)
+    if manifest.get("build_id") != artifact.manifest.get("build_id"):
+        return None
+
+    return IVFIndex(
+        np.load(directory / CENTROIDS_FILE, allow_pickle=False), artifact_vectors(artifact),
+        [str(i) for i in artifact.ids], np.load(directory / ASSIGN_FILE, allow_pickle=False),
+        nprobe=nprobe or manifest["nprobe"], build_id=manifest["build_id"]
+    )
+
+
+def parent_ivf_dirs(directory: Path) -> List[Path]:
+    """Where the parent build's IVF index may be: this directory (a flat artifact
+    rebuilt in place) and, in a versioned root, the other versions, newest first"""
+    directory = Path(directory)
+    candidates = [directory]
+    if directory.parent.name == VERSIONS_DIR:
+        candidates += sorted((p for p in directory.parent.iterdir()
+                              if p != directory and p.is_dir() and not p.name.startswith(".")), reverse=True)
+    return candidates
+
+
+def derive_ivf(directory: Path, artifact: IndexArtifact, nprobe: Optional[int] = None) -> Optional[IVFIndex]:
+    """IVF index for this build, derived from its parent build's index and change set; None if
+    either is unavailable"""
+    changes = load_changes(directory)
+    parent = changes.get("parent_build_id") if changes else None
+    if not parent:
+        return None
+    for candidate in parent_ivf_dirs(directory):
+        try:
+            if not ivf_exists(candidate) or not (candidate / IDS_FILE).exists():
+                continue
+            manifest = load_ivf_manifest(candidate)
+            if manifest.get("build_id") != parent:
+                continue
+            return IVFIndex.apply_changes(
+                np.load(candidate / CENTROIDS_FILE, allow_pickle=False),
+                [str(i) for i in np.load(candidate / IDS_FILE, allow_pickle=False)],
+                np.load(candidate / ASSIGN_FILE, allow_pickle=False),
+                artifact, changes, nprobe or manifest["nprobe"]
+            )
+        except (OSError, ValueError) as e:
+            # e.g. the parent version was garbage-collected while being read
+            print(f"IVF derive error ({candidate}): {str(e)}")
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or refresh the IVF index next to an artifact")
+    parser.add_argument("--index-dir", default=str(INDEX_DIR))
+    parser.add_argument("--nlist", type=int, default=None, help="Clusters (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=IVF_NPROBE)
+    parser.add_argument("--iterations", type=int, default=15)
+    parser.add_argument("--retrain", action="store_true", help="Re-run k-means even if centroids exist")
+    args = parser.parse_args()
+
+    directory = resolve_index_dir(Path(args.index_dir))  # Current version of a versioned root
+    artifact = load_artifact(directory)
+    build_id = artifact.manifest.get("build_id")
+
+    index = None if args.retrain else derive_ivf(directory, artifact, args.nprobe)
+    if index is not None:
+        # Parent build's index plus this build's change set
+        print(f"Applied the change set to the parent build's index ({index.inserted} rows assigned)")
+    elif ivf_exists(directory) and not args.retrain:
+        # New artifact build: keep the centroids, re-assign rows
+        centroids = np.load(directory / CENTROIDS_FILE, allow_pickle=False)
+        index = IVFIndex.for_artifact(centroids, artifact, args.nprobe)
+        print(f"Re-assigned {len(index)} rows to {index.nlist} existing clusters")
+    else:
+        vectors = artifact_vectors(artifact)
+        index = IVFIndex.build(vectors, [str(i) for i in artifact.ids], args.nlist, args.nprobe,
+                               args.iterations, build_id=build_id)
+        print(f"Trained {index.nlist} clusters over {len(index)} rows")
+
+    index.save(directory)
+    sizes = np.bincount(index.assign, minlength=index.nlist)
+    print(f"✅ IVF index saved to {directory} (cluster sizes {sizes.min()}-{sizes.max()}, nprobe {index.nprobe})")
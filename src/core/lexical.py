@@ -0,0 +1,117 @@
+import re
+import numpy as np
+import pandas as pd
+from collections import defaultdict
+from typing import List, Dict, Tuple, Any
+
+from src.core.backends import catalog_metadata
+
+# SHL test type codes, expanded so queries can match them by name
+TEST_TYPE_NAMES = {
+    "A": "ability aptitude",
+    "B": "biodata situational judgement",
+    "C": "competencies",
+    "D": "development 360",
+    "E": "assessment exercises",
+    "K": "knowledge skills",
+    "P": "personality behavior behaviour",
+    "S": "simulations simulation",
+}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "i", "in", "is", "it", "me",
+    "my", "of", "on", "or", "that", "the", "to", "with", "who", "want", "looking", "need",
+}
+
+# Words that decorate catalog names without identifying the product
+NAME_NOISE = {"new"}
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[+#]+|\.[a-z0-9]+)*|\.[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, keeping names like c++, c#, .net and 4.5 intact"""
+    return [t for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS]
+
+
+def name_key(text: str) -> str:
+    """Order-insensitive key used to recognize queries that are a product name"""
+    return " ".join(sorted(set(tokenize(text)) - NAME_NOISE))
+
+
+class LexicalIndex:
+    """BM25 inverted index over catalog names and test types"""
+
+    def __init__(self, catalog: pd.DataFrame, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.ids = catalog["id"].astype(str).tolist()
+        self.metadata = [catalog_metadata(row) for row in catalog.to_dict("records")]
+
+        postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        lengths = []
+        self.names: Dict[str, List[int]] = defaultdict(list)
+        for doc, row in enumerate(catalog.to_dict("records")):
+            codes = [c.strip() for c in str(row["test_type"]).split(",")]
+            text = f"{row['assessment_name']} " + " ".join(TEST_TYPE_NAMES.get(c, "") for c in codes)
+            tokens = tokenize(text)
+            lengths.append(len(tokens))
+            for token in tokens:
+                postings[token][doc] = postings[token].get(doc, 0) + 1
+            self.names[name_key(row["assessment_name"])].append(doc)
+
+        self.doc_len = np.asarray(lengths, dtype=np.float32)
+        self.avgdl = float(self.doc_len.mean()) if len(lengths) else 0.0
+        n = len(lengths)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray, float]] = {}
+        for token, docs in postings.items():
+            df = len(docs)
+            idf = float(np.log(1 + (n - df + 0.5) / (df + 0.5)))
+            self.postings[token] = (
+                np.fromiter(docs.keys(), dtype=np.int32, count=df),
+                np.fromiter(docs.values(), dtype=np.float32, count=df),
+                idf
+            )
+
+    def exact_matches(self, query: str) -> List[int]:
+        """Rows whose name matches the query up to case, punctuation, word order and '(New)'"""
+        key = name_key(query)
+        return list(self.names.get(key, [])) if key else []
+
+    def search(self, query: str, top_k: int) -> List[Tuple[int, float]]:
+        """(row, BM25 score) pairs, best first"""
+        scores = np.zeros(len(self.doc_len), dtype=np.float32)
+        for token in set(tokenize(query)):
+            posting = self.postings.get(token)
+            if posting is None:
+                continue
+            docs, tf, idf = posting
+            norm = tf + self.k1 * (1 - self.b + self.b * self.doc_len[docs] / self.avgdl)
+            scores[docs] += idf * tf * (self.k1 + 1) / norm
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        k = min(top_k, len(hits))
+        top = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def match(self, row: int, score: float) -> Dict[str, Any]:
+        """A row as a backend-style match dict"""
+        return {'id': self.ids[row], 'score': score, 'metadata': self.metadata[row]}
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60, normalize: bool = False) -> Dict[str, float]:
+    """Fuse several best-first id rankings into one score per id.
+
+    With normalize, scores are scaled to (0, 1]: 1.0 means first in every ranking.
+    """
+    fused: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, 1):
+            fused[item] += 1.0 / (k + rank)
+    if normalize and rankings:
+        best = len(rankings) / (k + 1)
+        fused = defaultdict(float, {item: score / best for item, score in fused.items()})
+    return fused
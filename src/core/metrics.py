@@ -0,0 +1,153 @@
+"""In-process counters, histograms and per-request stage timers.
+
+Metrics render in the Prometheus text exposition format for /metrics.
+Stage timings of the current request are collected through a context
+variable, so code on the search thread pool adds to the same request as
+long as it runs in a copy of the request's context.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Tuple, Optional, Iterator
+
+# Seconds; covers cache hits (sub-ms) up to slow upstream calls
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (last slot is +Inf), sum, count
+        self._series: Dict[LabelKey, Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = _label_key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[slot] += 1
+            total[0] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(_label_key(labels))
+        return sum(series[0]) if series else 0
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {total[0]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter("shl_requests_total", "HTTP requests by endpoint and status code")
+REQUEST_SECONDS = Histogram("shl_request_duration_seconds", "End-to-end HTTP request latency by endpoint")
+STAGE_SECONDS = Histogram("shl_stage_duration_seconds", "Latency of each stage of the recommend path")
+EMBEDDING_CACHE_HITS = Counter("shl_embedding_cache_hits_total", "Query embeddings served from the cache")
+EMBEDDING_CACHE_MISSES = Counter("shl_embedding_cache_misses_total", "Query embeddings requested from the service")
+RESPONSE_CACHE_HITS = Counter("shl_response_cache_hits_total", "Recommendations served from the response cache")
+RESPONSE_CACHE_MISSES = Counter("shl_response_cache_misses_total", "Recommendations that had to be searched")
+EMPTY_RESULTS = Counter("shl_empty_results_total", "Queries answered with no results, by endpoint")
+UPSTREAM_ERRORS = Counter("shl_upstream_errors_total", "Failed calls to upstream services, by service")
+COALESCED_REQUESTS = Counter("shl_coalesced_requests_total", "Searches that joined an identical in-flight search")
+
+REGISTRY = [
+    REQUESTS, REQUEST_SECONDS, STAGE_SECONDS, EMBEDDING_CACHE_HITS, EMBEDDING_CACHE_MISSES,
+    RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES, EMPTY_RESULTS, UPSTREAM_ERRORS, COALESCED_REQUESTS,
+]
+
+
+def render() -> str:
+    """All registered metrics in Prometheus text format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# (stage, seconds) pairs of the request being handled, in completion order
+_request_stages: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_stages", default=None)
+
+
+def start_request() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request"""
+    stages: List[Tuple[str, float]] = []
+    _request_stages.set(stages)
+    return stages
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block as one stage: always into the histogram, and into the current request if any"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stages = _request_stages.get()
+        if stages is not None:
+            stages.append((name, elapsed))
+
+
+def server_timing(stages: List[Tuple[str, float]], total: Optional[float] = None) -> str:
+    """Server-Timing header value; repeated stages (e.g. a retry) are summed"""
+    totals: Dict[str, float] = {}
+    for name, seconds in stages:
+        totals[name] = totals.get(name, 0.0) + seconds
+    if total is not None:
+        totals["total"] = total
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
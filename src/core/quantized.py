@@ -0,0 +1,135 @@
+"""Quantized copies of the embedding matrix for coarse scoring.
+
+int8 stores each row as round(x / scale) with a per-row scale of
+max|x| / 127 (4x smaller than float32); float16 halves the footprint.
+Coarse scores from the quantized matrix pick a shortlist that is then
+re-ranked exactly against the full-precision rows, so only the shortlist
+ever touches the float32 data (which can stay memory-mapped on disk).
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from typing import Dict, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+QUANTIZATION_KINDS = ("int8", "float16")
+
+# Rows converted back to float32 at a time while scoring
+SCORE_BLOCK_ROWS = 8192
+
+
+class QuantizedMatrix:
+    """Row-quantized (int8 or float16) copy of a float32 matrix"""
+
+    def __init__(self, matrix: np.ndarray, kind: str = "int8"):
+        if kind not in QUANTIZATION_KINDS:
+            raise ValueError(f"Unknown quantization: {kind}")
+        self.kind = kind
+        self.shape = matrix.shape
+        self.scale: Optional[np.ndarray] = None
+
+        if kind == "int8":
+            codes = np.empty(matrix.shape, dtype=np.int8)
+            scale = np.empty(matrix.shape[0], dtype=np.float32)
+            for start in range(0, matrix.shape[0], SCORE_BLOCK_ROWS):
+                block = np.asarray(matrix[start:start + SCORE_BLOCK_ROWS], dtype=np.float32)
+                block_scale = np.abs(block).max(axis=1) / 127.0
+                block_scale[block_scale == 0] = 1.0
+                codes[start:start + len(block)] = np.rint(block / block_scale[:, None]).astype(np.int8)
+                scale[start:start + len(block)] = block_scale
+            self.codes = codes
+            self.scale = scale
+        else:
+            self.codes = np.asarray(matrix, dtype=np.float16)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def scores(self, queries: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Approximate (n_queries, n_rows) dot products, optionally for a subset of rows"""
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        codes = self.codes if rows is None else self.codes[rows]
+        scale = None if self.scale is None else (self.scale if rows is None else self.scale[rows])
+
+        out = np.empty((len(queries), len(codes)), dtype=np.float32)
+        for start in range(0, len(codes), SCORE_BLOCK_ROWS):
+            end = start + SCORE_BLOCK_ROWS
+            block = queries @ codes[start:end].astype(np.float32).T
+            if scale is not None:
+                block *= scale[start:end]
+            out[:, start:end] = block
+        return out
+
+
+def top_k_rows(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores in each row, best first"""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def evaluate_quantization(matrix: np.ndarray, queries: np.ndarray, kind: str = "int8",
+                          k: int = 10, rerank_factor: int = 4) -> Dict[str, float]:
+    """Memory footprint and recall@k of coarse and re-ranked search against exact search"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    queries = np.asarray(queries, dtype=np.float32)
+    quantized = QuantizedMatrix(matrix, kind)
+
+    start = time.perf_counter()
+    exact_scores = queries @ matrix.T
+    exact_time = time.perf_counter() - start
+    exact = top_k_rows(exact_scores, k)
+
+    start = time.perf_counter()
+    coarse_scores = quantized.scores(queries)
+    coarse_time = time.perf_counter() - start
+    coarse = top_k_rows(coarse_scores, k)
+    shortlist = top_k_rows(coarse_scores, k * rerank_factor)
+
+    reranked = np.empty_like(exact)
+    for j, rows in enumerate(shortlist):
+        reranked[j] = rows[np.argsort(-(matrix[rows] @ queries[j]))[:k]]
+
+    def recall(found: np.ndarray) -> float:
+        return float(np.mean([len(set(a) & set(b)) / k for a, b in zip(found, exact)]))
+
+    return {
+        "kind": kind,
+        "rows": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "float32_bytes": int(matrix.nbytes),
+        "quantized_bytes": int(quantized.nbytes),
+        "compression": matrix.nbytes / quantized.nbytes,
+        "recall@k_coarse": recall(coarse),
+        "recall@k_reranked": recall(reranked),
+        "mean_abs_score_error": float(np.mean(np.abs(coarse_scores - exact_scores))),
+        "exact_scan_ms": exact_time * 1000,
+        "quantized_scan_ms": coarse_time * 1000,
+    }
+
+
+if __name__ == "__main__":
+    from src.core.backends import LocalBackend
+
+    parser = argparse.ArgumentParser(description="Report footprint and recall of a quantized index")
+    parser.add_argument("--kind", choices=QUANTIZATION_KINDS, default="int8")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=200, help="Noisy catalog vectors used as queries")
+    args = parser.parse_args()
+
+    matrix = np.asarray(LocalBackend().matrix, dtype=np.float32)
+    rng = np.random.default_rng(0)
+    picks = rng.integers(0, len(matrix), args.queries)
+    queries = matrix[picks] + rng.normal(0, 0.02, (args.queries, matrix.shape[1])).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    report = evaluate_quantization(matrix, queries, args.kind, args.k, args.rerank_factor)
+    for key, value in report.items():
+        print(f"{key}: {value:.4f}" if isinstance(value, float) else f"{key}: {value}")
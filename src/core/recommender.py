@@ -1,8 +1,32 @@
-import google.generativeai as genai
-from pinecone import Pinecone
 import os
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from typing import List, Dict, Optional
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple, AsyncIterator
+
+from src.core.artifact import INDEX_DIR
+from src.core.backends import RetrievalBackend, LocalBackend, PineconeBackend, CATALOG_PATH, EMBEDDINGS_PATH
+from src.core.embedders import (
+    QueryEmbedder, FunctionEmbedder, GeminiEmbedder, TfidfSvdEmbedder, LOCAL_MODEL, LOCAL_EMBEDDER_DIR,
+    LOCAL_EMBEDDER_DIM, load_local_embedder, local_embedder_fitted
+)
+from src.core.catalog import CatalogColumns
+from src.core.lexical import LexicalIndex, reciprocal_rank_fusion
+from src.core.constraints import QueryConstraints, parse_constraints
+from src.core.embedding_cache import EmbeddingCache, normalize_query
+from src.core.response_cache import ResponseCache, MemoryResponseStore, SQLiteResponseStore
+from src.core.versions import Lease, collect_garbage, current_version, version_catalog, version_dir
+from src.core.metrics import (
+    stage, EMBEDDING_CACHE_HITS, EMBEDDING_CACHE_MISSES, UPSTREAM_ERRORS,
+    RESPONSE_CACHE_HITS, RESPONSE_CACHE_MISSES, COALESCED_REQUESTS
+)
 
 load_dotenv()
 
@@ -10,56 +34,800 @@ load_dotenv()
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "local").lower()
+EMBEDDING_MODEL = "models/text-embedding-004"
+# "gemini" (remote) or "local" (TF-IDF + SVD fitted on the catalog; no network needed)
+QUERY_EMBEDDER = os.getenv("QUERY_EMBEDDER", "gemini").lower()
+# When Gemini fails, embed with the local model and search its index before going lexical-only
+EMBEDDER_FALLBACK = os.getenv("EMBEDDER_FALLBACK", "true").lower() in ("1", "true", "yes")
+MAX_CONCURRENT_SEARCHES = int(os.getenv("MAX_CONCURRENT_SEARCHES", 32))
+SEARCH_THREADS = int(os.getenv("SEARCH_THREADS", MAX_CONCURRENT_SEARCHES))
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 100))  # Gemini accepts up to 100 texts per call
+# Exact product-name lookups, lexical/vector fusion and lexical fallback
+LEXICAL_SEARCH = os.getenv("LEXICAL_SEARCH", "true").lower() in ("1", "true", "yes")
+# Duration/remote/adaptive limits and test types asked for directly become hard filters;
+# test types only mentioned in passing boost matching products instead
+CONSTRAINT_FILTERS = os.getenv("CONSTRAINT_FILTERS", "true").lower() in ("1", "true", "yes")
+TYPE_PREFERENCE_BOOST = float(os.getenv("TYPE_PREFERENCE_BOOST", 0.1))  # share of the gap to a perfect score
+# Identical concurrent searches share one in-flight computation
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "true").lower() in ("1", "true", "yes")
+# Seconds between checks of a versioned INDEX_DIR for a newly published version
+INDEX_CHECK_INTERVAL = float(os.getenv("INDEX_CHECK_INTERVAL", 5))
+WARMUP_QUERY = os.getenv("WARMUP_QUERY", "Java developer who collaborates with business teams")
+
+embedding_cache = EmbeddingCache(
+    max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("EMBEDDING_CACHE_TTL", 86400)),
+    disk_path=os.getenv("EMBEDDING_CACHE_PATH"),  # Persistent tier is opt-in
+    disk_max_size=int(os.getenv("EMBEDDING_CACHE_DISK_SIZE", 100000))
+)
+
+# Final result lists, keyed by query, top_k, filters and the index/catalog version
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 4096))  # 0 disables the in-process tier
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", 3600))
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH")  # SQLite file shared by all workers (opt-in)
+
+response_cache = ResponseCache(
+    local=MemoryResponseStore(RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL) if RESPONSE_CACHE_SIZE > 0 else None,
+    shared=SQLiteResponseStore(RESPONSE_CACHE_PATH, ttl=RESPONSE_CACHE_TTL) if RESPONSE_CACHE_PATH else None,
+    index_dir=LOCAL_EMBEDDER_DIR if QUERY_EMBEDDER == "local" else INDEX_DIR,
+    catalog_path=CATALOG_PATH,
+    embeddings_path=EMBEDDINGS_PATH
+)
+
+
+def create_backend(name: str) -> RetrievalBackend:
+    """Build the retrieval backend selected by name ('local' or 'pinecone')"""
+    if name == "local":
+        if QUERY_EMBEDDER == "local":
+            # Local query vectors are searched against the index fitted alongside them
+            get_local_embedder()
+            return LocalBackend(index_dir=LOCAL_EMBEDDER_DIR)
+        return LocalBackend(index_dir=serving_index_dir())
+    if name == "pinecone":
+        if QUERY_EMBEDDER == "local":
+            raise ValueError("The Pinecone index holds Gemini vectors; QUERY_EMBEDDER=local needs the local backend")
+        from pinecone import Pinecone
+        pc = Pinecone(api_key=PINECONE_API_KEY)
+        return PineconeBackend(pc.Index(INDEX_NAME))
+    raise ValueError(f"Unknown retrieval backend: {name}")
+
+
+def create_embedder(name: str) -> QueryEmbedder:
+    """Build the query embedder selected by name ('gemini' or 'local')"""
+    if name == "gemini":
+        return GeminiEmbedder(GOOGLE_API_KEY, EMBEDDING_MODEL)
+    if name == "local":
+        return get_local_embedder()
+    raise ValueError(f"Unknown query embedder: {name}")
+
+
+# Clients are created on first use so importing this module needs no
+# credentials or network, and a failing service surfaces per request.
+_backend: Optional[RetrievalBackend] = None
+_lexical: Optional[LexicalIndex] = None
+_catalog: Optional[CatalogColumns] = None
+_embedder: Optional[QueryEmbedder] = None
+_local_embedder: Optional[TfidfSvdEmbedder] = None
+_fallback_backend: Optional[RetrievalBackend] = None
+_init_lock = threading.RLock()  # Re-entrant: creating the backend may load the local embedder
+_ready = threading.Event()
+
+# Index version served from a versioned INDEX_DIR (None for a plain artifact
+# directory), the lease that keeps it from being garbage-collected, and the
+# background load of a newer version, if one is running
+_index_resolved = False
+_index_version: Optional[str] = None
+_index_lease: Optional[Lease] = None
+_index_checked = 0.0
+_index_loader: Optional[threading.Thread] = None
+
+# (backend, catalog, lexical index) fixed for the request running in this context
+_pinned: contextvars.ContextVar[Optional[Tuple[Any, Any, Any]]] = contextvars.ContextVar("pinned_index", default=None)
+
+
+def serving_index_dir() -> Path:
+    """Artifact directory this process serves, leasing the current version on first use"""
+    global _index_resolved, _index_version, _index_lease
+    with _init_lock:
+        if not _index_resolved:
+            _index_resolved = True
+            version = current_version(INDEX_DIR)
+            if version is not None:
+                _index_lease = Lease(INDEX_DIR, version)
+                _index_version = version
+                # Key cached responses by the version actually served, not the newest on disk
+                response_cache.index_dir = version_dir(INDEX_DIR, version)
+                response_cache.invalidate_version()
+        return version_dir(INDEX_DIR, _index_version) if _index_version else INDEX_DIR
+
+
+def serving_catalog_path() -> Path:
+    return version_catalog(serving_index_dir(), CATALOG_PATH)
+
+
+def check_index_version() -> None:
+    """Start loading a newly published index version in the background (at most every INDEX_CHECK_INTERVAL)"""
+    global _index_checked, _index_loader
+    now = time.monotonic()
+    if now - _index_checked < INDEX_CHECK_INTERVAL:
+        return
+    _index_checked = now
+    serving_index_dir()
+    version = current_version(INDEX_DIR)
+    if version is None or version == _index_version:
+        return
+    with _init_lock:
+        if _index_loader is None or not _index_loader.is_alive():
+            _index_loader = threading.Thread(target=swap_index, args=(version,), name="index-swap", daemon=True)
+            _index_loader.start()
+
+
+def swap_index(version: str) -> None:
+    """Load an index version next to the current one, then switch new requests over to it.
+
+    Requests already running keep the objects they pinned, so none fail
+    during the switch. The old version's lease is then released and
+    versions no worker uses are garbage-collected.
+    """
+    global _backend, _catalog, _lexical, _index_version, _index_lease
+    lease = Lease(INDEX_DIR, version)  # Taken before loading so GC can't remove the files underneath
+    try:
+        directory = version_dir(INDEX_DIR, version)
+        catalog_path = version_catalog(directory, CATALOG_PATH)
+        # Only the in-process vector index is versioned here; Pinecone and the local embedder's index aren't
+        swap_backend = RETRIEVAL_BACKEND == "local" and QUERY_EMBEDDER != "local"
+        backend = LocalBackend(index_dir=directory, catalog_path=catalog_path) if swap_backend else None
+        catalog = CatalogColumns.from_csv(catalog_path)
+        lexical = LexicalIndex(pd.read_csv(catalog_path)) if LEXICAL_SEARCH else None
+    except Exception as e:
+        lease.release()
+        print(f"Index swap error ({version}): {str(e)}")
+        return
+
+    with _init_lock:
+        if swap_backend:
+            _backend = backend
+        _catalog = catalog
+        _lexical = lexical
+        old_lease, _index_lease, _index_version = _index_lease, lease, version
+        response_cache.index_dir = directory
+        response_cache.invalidate_version()
+    if old_lease is not None:
+        old_lease.release()
+    print(f"✅ Serving index version {version}")
+
+    try:
+        collect_garbage(INDEX_DIR)
+    except Exception as e:
+        print(f"Index GC error: {str(e)}")
+
+
+def pinned(fn):
+    """Run fn with one consistent backend, catalog and lexical index, even if a new version is swapped in"""
+    def load(getter):
+        try:
+            return getter()
+        except Exception:
+            return None  # Left unpinned; raises again where the request needs it, as before
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        check_index_version()
+        with _init_lock:
+            state = (load(get_backend), load(get_catalog), load(get_lexical_index) if LEXICAL_SEARCH else None)
+        token = _pinned.set(state)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _pinned.reset(token)
+    return wrapper
+
+
+def get_backend() -> RetrievalBackend:
+    """Return the retrieval backend, creating it on first use"""
+    global _backend
+    pinned_state = _pinned.get()
+    if pinned_state is not None and pinned_state[0] is not None:
+        return pinned_state[0]
+    if _backend is None:
+        with _init_lock:
+            if _backend is None:
+                try:
+                    _backend = create_backend(RETRIEVAL_BACKEND)
+                except Exception as e:
+                    raise RuntimeError(f"Failed to initialize {RETRIEVAL_BACKEND} backend: {str(e)}")
+    return _backend
+
+
+def set_backend(new_backend: RetrievalBackend) -> None:
+    """Swap the retrieval backend used by search_pinecone"""
+    global _backend
+    _backend = new_backend
+
+
+def get_catalog() -> CatalogColumns:
+    """Return the columnar catalog results are assembled from, loading it on first use"""
+    global _catalog
+    pinned_state = _pinned.get()
+    if pinned_state is not None and pinned_state[1] is not None:
+        return pinned_state[1]
+    if _catalog is None:
+        with _init_lock:
+            if _catalog is None:
+                _catalog = CatalogColumns.from_csv(serving_catalog_path())
+    return _catalog
+
+
+def get_lexical_index() -> LexicalIndex:
+    """Return the BM25 index over the catalog, building it on first use"""
+    global _lexical
+    pinned_state = _pinned.get()
+    if pinned_state is not None and pinned_state[2] is not None:
+        return pinned_state[2]
+    if _lexical is None:
+        with _init_lock:
+            if _lexical is None:
+                _lexical = LexicalIndex(pd.read_csv(serving_catalog_path()))
+    return _lexical
+
+
+def get_embedder() -> QueryEmbedder:
+    """Return the query embedder, creating it on first use"""
+    global _embedder
+    if _embedder is None:
+        with _init_lock:
+            if _embedder is None:
+                _embedder = create_embedder(QUERY_EMBEDDER)
+    return _embedder
+
+
+def embedder_name() -> str:
+    """Name of the query embedder, without creating it, so it is safe to call on the event loop"""
+    embedder = _embedder
+    if embedder is not None:
+        return embedder.name
+    return EMBEDDING_MODEL if QUERY_EMBEDDER == "gemini" else f"{LOCAL_MODEL}-{LOCAL_EMBEDDER_DIM}"
+
+
+def set_embedder(embed_fn, embed_batch_fn=None) -> None:
+    """Swap the embedder used for uncached queries: a QueryEmbedder, or plain functions
+    embedding one query and (optionally) a batch of them"""
+    global _embedder
+    if isinstance(embed_fn, QueryEmbedder):
+        _embedder = embed_fn
+    else:
+        _embedder = FunctionEmbedder(embed_fn, embed_batch_fn, name=EMBEDDING_MODEL)
+
+
+def get_local_embedder() -> TfidfSvdEmbedder:
+    """Return the catalog-fitted local embedder, fitting and saving it on first use if needed"""
+    global _local_embedder
+    if _local_embedder is None:
+        with _init_lock:
+            if _local_embedder is None:
+                _local_embedder = load_local_embedder(CATALOG_PATH, LOCAL_EMBEDDER_DIR)
+    return _local_embedder
+
+
+def get_fallback() -> Tuple[QueryEmbedder, RetrievalBackend]:
+    """The local embedder and a backend over its own index, for when the primary embedder fails"""
+    global _fallback_backend
+    embedder = get_local_embedder()
+    if _fallback_backend is None:
+        with _init_lock:
+            if _fallback_backend is None:
+                _fallback_backend = LocalBackend(index_dir=LOCAL_EMBEDDER_DIR)
+    return embedder, _fallback_backend
+
+
+def fallback_available() -> bool:
+    # Falling back to the model that just failed wouldn't help
+    return EMBEDDER_FALLBACK and not isinstance(get_embedder(), TfidfSvdEmbedder)
+
+
+def get_query_embedding(query: str, embedder: Optional[QueryEmbedder] = None) -> List[float]:
+    """Embed a search query, serving repeated queries from the embedding cache"""
+    embedder = embedder or get_embedder()
+    cached = embedding_cache.get(query, embedder.name)
+    if cached is not None:
+        EMBEDDING_CACHE_HITS.inc()
+        return cached
+
+    EMBEDDING_CACHE_MISSES.inc()
+    embedding = embedder.embed(query)
+
+    if embedding:
+        embedding_cache.set(query, embedder.name, embedding)
+    return embedding
+
+
+def get_query_embeddings(queries: List[str], embedder: Optional[QueryEmbedder] = None) -> List[List[float]]:
+    """Embed many queries, batching the cache misses into chunks of EMBED_BATCH_SIZE"""
+    embedder = embedder or get_embedder()
+    embeddings: List[Optional[List[float]]] = [embedding_cache.get(q, embedder.name) for q in queries]
+
+    # Embed each distinct missing query once
+    missing: Dict[str, List[int]] = {}
+    for i, (query, embedding) in enumerate(zip(queries, embeddings)):
+        if embedding is None:
+            missing.setdefault(query, []).append(i)
+
+    pending = list(missing)
+    EMBEDDING_CACHE_MISSES.inc(len(pending))
+    EMBEDDING_CACHE_HITS.inc(len(queries) - sum(len(rows) for rows in missing.values()))
+    for start in range(0, len(pending), EMBED_BATCH_SIZE):
+        chunk = pending[start:start + EMBED_BATCH_SIZE]
+        for query, embedding in zip(chunk, embedder.embed_batch(chunk)):
+            if embedding:
+                embedding_cache.set(query, embedder.name, embedding)
+            for i in missing[query]:
+                embeddings[i] = embedding
+
+    return [embedding or [] for embedding in embeddings]
+
+
+def fallback_embeddings(queries: List[str]) -> Tuple[List[List[float]], Optional[RetrievalBackend]]:
+    """Embed queries with the local model after the primary embedder failed.
+
+    Returns the embeddings and the backend holding vectors of the same
+    model, or empty embeddings when the fallback is off or unavailable.
+    """
+    if not fallback_available():
+        return [[] for _ in queries], None
+    try:
+        embedder, backend = get_fallback()
+        with stage("embed_local"):
+            return get_query_embeddings(queries, embedder), backend
+    except Exception as e:
+        print(f"Local embedder error: {str(e)}")
+        return [[] for _ in queries], None
+
+
+def format_result(match: Dict) -> Dict[str, Optional[str]]:
+    meta = match.get('metadata', {})
+    return {
+        'name': meta.get('name', 'Unnamed'),
+        'url': meta.get('url', '#'),
+        'score': float(match['score']),
+        'type': meta.get('type', ''),
+        'duration': meta.get('duration', 0),
+        'remote': str(meta.get('remote')).lower() == 'true',
+        'irt': str(meta.get('irt')).lower() == 'true'
+    }
+
+
+def format_matches(matches: List[Dict], top_k: int) -> List[Dict[str, Optional[str]]]:
+    """Apply the adaptive score threshold to best-first matches and format the top_k results.
+
+    The threshold applies to vector similarity; fused matches report
+    their fused score, so the reported scores follow the result order.
+    """
+    if not matches:
+        return []
+    scores = np.fromiter((m['score'] for m in matches), dtype=np.float64, count=len(matches))
+    threshold = max(0.5, scores.max() - 0.2)  # Adaptive threshold
+    keep = np.flatnonzero(scores >= threshold)[:top_k]
+    shown = np.fromiter((matches[i].get('fused_score', matches[i]['score']) for i in keep),
+                        dtype=np.float64, count=len(keep))
+
+    catalog = get_catalog()
+    rows = catalog.rows_of(matches[i]['id'] for i in keep)
+    if (rows >= 0).all():
+        return catalog.results(rows, shown)
+    # Ids missing from the local catalog (e.g. a remote index ahead of it) use their own metadata
+    return [
+        catalog.results(rows[j:j + 1], shown[j:j + 1])[0] if rows[j] >= 0
+        else {**format_result(matches[i]), 'score': float(shown[j])}
+        for j, i in enumerate(keep)
+    ]
+
+
+def exact_name_results(query: str, top_k: int) -> List[Dict[str, Optional[str]]]:
+    """Products whose name is the query itself; these need no embedding at all"""
+    if not LEXICAL_SEARCH:
+        return []
+    rows = get_lexical_index().exact_matches(query)[:top_k]
+    return get_catalog().results(rows, np.ones(len(rows))) if rows else []
+
+
+def get_constraints(query: str) -> Optional[QueryConstraints]:
+    if not CONSTRAINT_FILTERS:
+        return None
+    constraints = parse_constraints(query)
+    return None if constraints.is_empty() else constraints
+
+
+def lexical_results(query: str, top_k: int,
+                    constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Optional[str]]]:
+    """BM25-only results, scaled to (0, 1]; the degraded path when embedding fails"""
+    if not LEXICAL_SEARCH:
+        return []
+    lexical = get_lexical_index()
+    hits = lexical.search(query, top_k * 3 if constraints else top_k)
+    if constraints:
+        # Products within the constraints first, then the rest if they leave fewer than top_k
+        allowed = [constraints.allows(lexical.metadata[row]) for row, _ in hits]
+        hits = [h for h, ok in zip(hits, allowed) if ok] + [h for h, ok in zip(hits, allowed) if not ok]
+    hits = hits[:top_k]
+    if not hits:
+        return []
+    # Lexical rows are catalog rows: both are read from CATALOG_PATH in file order
+    rows = np.fromiter((row for row, _ in hits), dtype=np.int64, count=len(hits))
+    scores = np.fromiter((score for _, score in hits), dtype=np.float64, count=len(hits))
+    return get_catalog().results(rows, scores / scores[0])
+
+
+def fuse_lexical(query: str, embedding: List[float], matches: List[Dict], fetch_k: int,
+                 constraints: Optional[QueryConstraints] = None,
+                 backend: Optional[RetrievalBackend] = None) -> List[Dict]:
+    """Re-order vector matches by reciprocal-rank fusion with the BM25 ranking.
+
+    Each returned match keeps its vector 'score' and gains a 'fused_score'
+    in (0, 1] that the results are ordered by.
+    """
+    if not LEXICAL_SEARCH:
+        return matches
+    lexical = get_lexical_index()
+    hits = lexical.search(query, fetch_k)
+    if constraints:
+        hits = [h for h in hits if constraints.allows(lexical.metadata[h[0]])]
+    if not hits:
+        return matches
+
+    # Lexical hits the vector search missed join with their real vector score,
+    # so the adaptive threshold still applies to them
+    candidates = {m['id']: m for m in matches}
+    missing = [lexical.ids[row] for row, _ in hits if lexical.ids[row] not in candidates]
+    if missing:
+        scores = (backend or get_backend()).score_ids(embedding, missing)
+        for row, _ in hits:
+            row_id = lexical.ids[row]
+            if row_id in scores:
+                candidates[row_id] = {'id': row_id, 'score': scores[row_id], 'metadata': lexical.metadata[row]}
+
+    fused = reciprocal_rank_fusion([[m['id'] for m in matches], [lexical.ids[row] for row, _ in hits]],
+                                   normalize=True)
+    ordered = list(candidates.values())
+    fused_scores = np.fromiter((fused[m['id']] for m in ordered), dtype=np.float64, count=len(ordered))
+    return [{**ordered[i], 'fused_score': float(fused_scores[i])}
+            for i in np.argsort(-fused_scores, kind="stable")]
+
+
+def boost_preferred(matches: List[Dict], constraints: Optional[QueryConstraints]) -> List[Dict]:
+    """Re-order matches so products of a preferred test type gain TYPE_PREFERENCE_BOOST of the
+    gap to a perfect ranking score; boosted matches report the boosted score as 'fused_score'"""
+    if not matches or constraints is None or not constraints.preferred_types or TYPE_PREFERENCE_BOOST <= 0:
+        return matches
+    ranking = np.fromiter((m.get('fused_score', m['score']) for m in matches), dtype=np.float64, count=len(matches))
+    preferred = np.fromiter((constraints.prefers(m.get('metadata') or {}) for m in matches),
+                            dtype=bool, count=len(matches))
+    ranking = np.where(preferred, ranking + TYPE_PREFERENCE_BOOST * (1.0 - ranking), ranking)
+    return [{**matches[i], 'fused_score': float(ranking[i])} for i in np.argsort(-ranking, kind="stable")]
+
+
+def query_backend(embedding: List[float], top_k: int, constraints: Optional[QueryConstraints] = None,
+                  backend: Optional[RetrievalBackend] = None) -> List[Dict]:
+    """Timed backend query (the configured backend unless given); failures count as upstream errors"""
+    with stage("retrieve"):
+        try:
+            return (backend or get_backend()).query(embedding, top_k=top_k, constraints=constraints)
+        except Exception:
+            UPSTREAM_ERRORS.inc(service="retrieval")
+            raise
+
+
+def rank_matches(query: str, embedding: List[float], matches: List[Dict], top_k: int,
+                 constraints: Optional[QueryConstraints],
+                 backend: Optional[RetrievalBackend] = None) -> List[Dict[str, Optional[str]]]:
+    """Fuse, boost, threshold and format backend matches for one query"""
+    with stage("rank"):
+        matches = fuse_lexical(query, embedding, matches, top_k*3, constraints, backend)
+        results = format_matches(boost_preferred(matches, constraints), top_k)
+
+    if len(results) < top_k and constraints is not None and constraints.has_filters():
+        # Constraints the catalog can barely satisfy shouldn't leave the user short:
+        # results within them come first, the best of the rest fill up to top_k
+        print(f"{len(results)} results within constraints ({constraints.key()}); filling without them")
+        preferences = constraints.without_filters()
+        matches = query_backend(embedding, top_k*3, backend=backend)
+        with stage("rank"):
+            matches = fuse_lexical(query, embedding, matches, top_k*3, backend=backend)
+            extra = format_matches(boost_preferred(matches, preferences), top_k)
+        shown = {r['url'] for r in results}
+        results += [r for r in extra if r['url'] not in shown][:top_k - len(results)]
+    return results
 
-# Initialize clients
-try:
-    genai.configure(api_key=GOOGLE_API_KEY)
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    index = pc.Index(INDEX_NAME)
-except Exception as e:
-    raise RuntimeError(f"Failed to initialize services: {str(e)}")
 
 def search_pinecone(query: str, top_k: int = 10) -> List[Dict[str, Optional[str]]]:
+    return run_search(query, top_k)[0]
+
+
+@pinned
+def run_search(query: str, top_k: int = 10) -> Tuple[List[Dict[str, Optional[str]]], bool]:
+    """search_pinecone, also telling whether the results are safe to cache (no degraded path)"""
     if not query or not isinstance(query, str):
-        return []
-    
+        return [], False
+
     try:
+        with stage("exact_match"):
+            exact = exact_name_results(query, top_k)
+        if exact:
+            return exact, True
+
+        constraints = get_constraints(query)
+
         # Get embedding with proper error handling
-        embedding = genai.embed_content(
-            model="models/text-embedding-004",
-            content=query,
-            task_type="retrieval_query"  # Lowercase as per current API
-        ).get("embedding", [])
-        
+        with stage("embed"):
+            try:
+                embedding = get_query_embedding(query)
+            except Exception as e:
+                print(f"Embedding error: {str(e)}")
+                UPSTREAM_ERRORS.inc(service="embedding")
+                embedding = []
+
+        backend = None
+        if not embedding and fallback_available():
+            print("Error: Empty embedding generated; trying the local embedder")
+            [embedding], backend = fallback_embeddings([query])
+
         if not embedding:
-            print("Error: Empty embedding generated")
-            return []
-
-        # Query Pinecone with score threshold
-        search_response = index.query(
-            vector=embedding,
-            top_k=top_k*3,  # Get extra results to filter
-            include_metadata=True
-        )
-
-        # Filter and format results
-        max_score = max([m['score'] for m in search_response['matches'] or [0]])
-        threshold = max(0.5, max_score - 0.2)  # Adaptive threshold
-
-        results = []
-        for match in search_response['matches']:
-            if match['score'] >= threshold:
-                meta = match.get('metadata', {})
-                results.append({
-                    'name': meta.get('name', 'Unnamed'),
-                    'url': meta.get('url', '#'),
-                    'score': match['score'],
-                    'type': meta.get('type', ''),
-                    'duration': meta.get('duration', 0)
-                })
-
-        return sorted(results, key=lambda x: x['score'], reverse=True)[:top_k]
+            print("Error: No embedding available; falling back to lexical search")
+            with stage("lexical_fallback"):
+                return lexical_results(query, top_k, constraints), False
+
+        # Query the vector backend, getting extra results to filter;
+        # constraints are applied by the backend before scoring
+        matches = query_backend(embedding, top_k*3, constraints, backend)
+
+        # Filter and format results; fallback results aren't cached, so recovery shows up at once
+        return rank_matches(query, embedding, matches, top_k, constraints, backend), backend is None
 
     except Exception as e:
         print(f"Search error: {str(e)}")
-        return []
\ No newline at end of file
+        return [], False
+
+
+def search_batch(queries: List[str], top_ks: List[int]) -> List[List[Dict[str, Optional[str]]]]:
+    """Search many queries at once with batched embedding and one batched backend query"""
+    return run_search_batch(queries, top_ks)[0]
+
+
+@pinned
+def run_search_batch(queries: List[str],
+                     top_ks: List[int]) -> Tuple[List[List[Dict[str, Optional[str]]]], List[bool]]:
+    """search_batch, also telling per query whether its results are safe to cache"""
+    results: List[List[Dict[str, Optional[str]]]] = [[] for _ in queries]
+    valid = [i for i, q in enumerate(queries) if q and isinstance(q, str)]
+    cacheable = [False] * len(queries)
+
+    try:
+        # Product-name queries are answered without embedding
+        pending = []
+        with stage("exact_match"):
+            for i in valid:
+                results[i] = exact_name_results(queries[i], top_ks[i])
+                if results[i]:
+                    cacheable[i] = True
+                else:
+                    pending.append(i)
+        if not pending:
+            return results, cacheable
+
+        constraints = {i: get_constraints(queries[i]) for i in pending}
+
+        with stage("embed"):
+            try:
+                embeddings = get_query_embeddings([queries[i] for i in pending])
+            except Exception as e:
+                print(f"Embedding error: {str(e)}")
+                UPSTREAM_ERRORS.inc(service="embedding")
+                embeddings = [[] for _ in pending]
+
+        embedded = [(i, e) for i, e in zip(pending, embeddings) if e]
+        failed = [i for i, e in zip(pending, embeddings) if not e]
+        if failed and fallback_available():
+            print(f"Error: Empty embedding generated for {len(failed)} queries; trying the local embedder")
+            local_embeddings, backend = fallback_embeddings([queries[i] for i in failed])
+            for i, embedding in zip(failed, local_embeddings):
+                if embedding:
+                    matches = query_backend(embedding, top_ks[i]*3, constraints[i], backend)
+                    results[i] = rank_matches(queries[i], embedding, matches, top_ks[i], constraints[i], backend)
+            failed = [i for i, e in zip(failed, local_embeddings) if not e]
+
+        if failed:
+            print(f"Error: No embedding available for {len(failed)} queries; falling back to lexical search")
+            with stage("lexical_fallback"):
+                for i in failed:
+                    results[i] = lexical_results(queries[i], top_ks[i], constraints[i])
+        if not embedded:
+            return results, cacheable
+
+        # Overfetch once for the largest top_k; each query keeps its own prefix,
+        # which is exactly what a single query with its own top_k would return
+        fetch_k = max(top_ks[i] for i, _ in embedded) * 3
+        with stage("retrieve"):
+            try:
+                batch_matches = get_backend().query_batch(
+                    [e for _, e in embedded], top_k=fetch_k, constraints=[constraints[i] for i, _ in embedded]
+                )
+            except Exception:
+                UPSTREAM_ERRORS.inc(service="retrieval")
+                raise
+
+        for (i, embedding), matches in zip(embedded, batch_matches):
+            results[i] = rank_matches(queries[i], embedding, matches[:top_ks[i] * 3], top_ks[i], constraints[i])
+            cacheable[i] = True
+        return results, cacheable
+
+    except Exception as e:
+        print(f"Batch search error: {str(e)}")
+        return results, [False] * len(queries)
+
+
+def warmup() -> None:
+    """Load the retrieval index and run one query so the first real request is fast"""
+    try:
+        get_backend()
+        get_catalog()
+        if LEXICAL_SEARCH:
+            get_lexical_index()
+    except Exception as e:
+        print(f"Warm-up error: {str(e)}")
+        return
+
+    if fallback_available() and local_embedder_fitted(CATALOG_PATH, LOCAL_EMBEDDER_DIR):
+        # Load an already fitted local model now rather than during the first outage;
+        # fitting one is left to the first request that needs the fallback
+        try:
+            get_fallback()
+        except Exception as e:
+            print(f"Local embedder warm-up error: {str(e)}")
+
+    if WARMUP_QUERY:
+        # A failing warm-up query is logged, not fatal: the index is loaded and
+        # the embedding service may recover on its own
+        try:
+            if not search_pinecone(WARMUP_QUERY, top_k=3):
+                print("Warm-up query returned no results")
+        except Exception as e:
+            print(f"Warm-up query error: {str(e)}")
+
+    _ready.set()
+
+
+def is_ready() -> bool:
+    return _ready.is_set()
+
+
+# The embedding and vector clients are synchronous, so async callers run the
+# pipeline on a bounded thread pool instead of blocking the event loop.
+_search_executor = ThreadPoolExecutor(max_workers=SEARCH_THREADS, thread_name_prefix="search")
+_search_slots = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+# (normalized query, top_k) -> task of the search currently running for it
+_in_flight: Dict[Tuple[str, int], "asyncio.Task"] = {}
+
+
+def response_key(query: str, top_k: int) -> Optional[str]:
+    """Response cache key, or None when the cache is off or the query can't be searched"""
+    if not response_cache.enabled or not query or not isinstance(query, str):
+        return None
+    constraints = get_constraints(query)
+    settings = f"{RETRIEVAL_BACKEND}|{embedder_name()}|{LEXICAL_SEARCH}|{CONSTRAINT_FILTERS}"
+    return response_cache.make_key(query, top_k, constraints.key() if constraints else "", settings)
+
+
+def cached_response(key: Optional[str]) -> Optional[List[Dict[str, Optional[str]]]]:
+    if key is None:
+        return None
+    with stage("response_cache"):
+        results = response_cache.get(key)
+    if results is None:
+        RESPONSE_CACHE_MISSES.inc()
+    else:
+        RESPONSE_CACHE_HITS.inc()
+    return results
+
+
+async def search_async(query: str, top_k: int = 10) -> List[Dict[str, Optional[str]]]:
+    """Non-blocking search_pinecone, limited to MAX_CONCURRENT_SEARCHES in flight per process.
+
+    Cached responses are answered on the event loop without taking a slot.
+    """
+    key = response_key(query, top_k)
+    cached = cached_response(key)
+    if cached is not None:
+        return cached
+    return await search_and_cache(query, top_k, key)
+
+
+async def search_and_cache(query: str, top_k: int, key: Optional[str]) -> List[Dict[str, Optional[str]]]:
+    """Run the search, or join an identical one already in flight (single-flight).
+
+    Searches run as tasks awaited through shield(), so one caller
+    disconnecting doesn't cancel the search for the others.
+    """
+    if not COALESCE_REQUESTS:
+        return await run_and_cache(query, top_k, key)
+
+    flight = (normalize_query(query), top_k)
+    task = _in_flight.get(flight)
+    if task is None:
+        task = asyncio.ensure_future(run_and_cache(query, top_k, key))
+        _in_flight[flight] = task
+
+        def forget(done: "asyncio.Task"):
+            if _in_flight.get(flight) is done:
+                del _in_flight[flight]
+        task.add_done_callback(forget)
+        return await asyncio.shield(task)
+
+    COALESCED_REQUESTS.inc()
+    with stage("coalesced"):
+        return await asyncio.shield(task)
+
+
+async def run_and_cache(query: str, top_k: int, key: Optional[str]) -> List[Dict[str, Optional[str]]]:
+    """Run the search on the thread pool and store cacheable results under key"""
+    async with _search_slots:
+        loop = asyncio.get_running_loop()
+        # Run in a copy of the request's context so stage timings reach it
+        call = functools.partial(contextvars.copy_context().run, run_search, query, top_k)
+        results, cacheable = await loop.run_in_executor(_search_executor, call)
+
+    if key is not None and cacheable:
+        response_cache.set(key, results)
+    return results
+
+
+async def search_batch_async(queries: List[str], top_ks: List[int]) -> List[List[Dict[str, Optional[str]]]]:
+    """Non-blocking search_batch; a whole batch occupies one concurrency slot.
+
+    Only queries missing from the response cache are searched.
+    """
+    keys = [response_key(q, k) for q, k in zip(queries, top_ks)]
+    results: List[Optional[List[Dict[str, Optional[str]]]]] = [cached_response(key) for key in keys]
+    missing = [i for i, r in enumerate(results) if r is None]
+
+    if missing:
+        async with _search_slots:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(contextvars.copy_context().run, run_search_batch,
+                                     [queries[i] for i in missing], [top_ks[i] for i in missing])
+            found, cacheable = await loop.run_in_executor(_search_executor, call)
+
+        for i, query_results, ok in zip(missing, found, cacheable):
+            results[i] = query_results
+            if keys[i] is not None and ok:
+                response_cache.set(keys[i], query_results)
+    return results
+
+
+def preview_results(query: str, top_k: int) -> List[Dict[str, Optional[str]]]:
+    """Instant candidates from the in-memory lexical index; empty until the index is loaded"""
+    if not LEXICAL_SEARCH or _lexical is None or not query or not isinstance(query, str):
+        return []
+    with stage("preview"):
+        return exact_name_results(query, top_k) or lexical_results(query, top_k, get_constraints(query))
+
+
+async def search_stream(query: str, top_k: int = 10) -> AsyncIterator[Dict[str, Any]]:
+    """search_async as events: lexical candidates while the full search runs, then the final results.
+
+    Events are {"event": "candidates" | "results", "results": [...], "cached": bool}.
+    A cached response is a single "results" event.
+    """
+    key = response_key(query, top_k)
+    cached = cached_response(key)
+    if cached is not None:
+        yield {"event": "results", "results": cached, "cached": True}
+        return
+
+    # A task, so a client that disconnects mid-stream still leaves its results in the cache
+    search = asyncio.ensure_future(search_and_cache(query, top_k, key))
+
+    # BM25 over the catalog takes well under a millisecond, so it runs on the loop
+    preview = preview_results(query, top_k)
+    if preview and not search.done():
+        yield {"event": "candidates", "results": preview, "cached": False}
+    yield {"event": "results", "results": await search, "cached": False}
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+from src.core.artifact import INDEX_DIR, artifact_exists, load_manifest
+from src.core.embedding_cache import normalize_query
+from src.core.versions import resolve_index_dir, version_catalog
+
+Results = List[Dict[str, Any]]
+
+# How often (seconds) the index/catalog version is re-read from disk
+VERSION_CHECK_INTERVAL = float(os.getenv("RESPONSE_CACHE_VERSION_CHECK", 5))
+
+
+class ResponseStore:
+    """Interface for places cached result lists can live"""
+
+    def get(self, key: str) -> Optional[Results]:
+        raise NotImplementedError
+
+    def set(self, key: str, results: Results) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryResponseStore(ResponseStore):
+    """Per-process LRU with a TTL"""
+
+    def __init__(self, max_size: int = 4096, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Results]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, results = entry
+            if time.time() - created >= self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def set(self, key: str, results: Results) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), results)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteResponseStore(ResponseStore):
+    """SQLite file shared by every worker on the host; oldest entries are evicted past max_size"""
+
+    # Eviction runs once per this many writes, not on every write
+    EVICT_EVERY = 64
+
+    def __init__(self, path: str, max_size: int = 50000, ttl: float = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=5.0)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses "
+            "(key TEXT PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._db.commit()
+
+    def get(self, key: str) -> Optional[Results]:
+        with self._lock:
+            row = self._db.execute("SELECT created, payload FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[0] >= self.ttl:
+            return None
+        return json.loads(row[1])
+
+    def set(self, key: str, results: Results) -> None:
+        payload = json.dumps(results)
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, created, payload) VALUES (?, ?, ?)",
+                (key, time.time(), payload)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._db.execute(
+                    "DELETE FROM responses WHERE key IN "
+                    "(SELECT key FROM responses ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                    (self.max_size,)
+                )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM responses")
+            self._db.commit()
+
+
+def file_version(path: Path) -> str:
+    """Cheap change marker for a file: size and modification time"""
+    try:
+        stat = Path(path).stat()
+    except OSError:
+        return "missing"
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+
+class ResponseCache:
+    """Final result lists keyed by normalized query, top_k, filters and the data version.
+
+    The data version is the artifact build_id (or the legacy embeddings
+    file) plus the catalog file, so rebuilding either invalidates every
+    entry at once. Lookups go to the in-process store first, then the
+    shared one.
+    """
+
+    def __init__(self, local: Optional[ResponseStore], shared: Optional[ResponseStore] = None,
+                 index_dir: Path = INDEX_DIR, catalog_path: Optional[Path] = None,
+                 embeddings_path: Optional[Path] = None):
+        self.local = local
+        self.shared = shared
+        self.index_dir = Path(index_dir)
+        self.catalog_path = catalog_path
+        self.embeddings_path = embeddings_path
+        self.hits = 0
+        self.misses = 0
+        self._version: Optional[str] = None
+        self._version_checked = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.shared is not None
+
+    def version(self) -> str:
+        """Current data version, re-read at most every VERSION_CHECK_INTERVAL seconds"""
+        now = time.monotonic()
+        if self._version is None or now - self._version_checked >= VERSION_CHECK_INTERVAL:
+            index_dir = resolve_index_dir(self.index_dir)
+            if artifact_exists(index_dir):
+                index = load_manifest(index_dir).get("build_id", "")
+            else:
+                index = file_version(self.embeddings_path) if self.embeddings_path else ""
+            catalog = file_version(version_catalog(index_dir, self.catalog_path)) if self.catalog_path else ""
+            self._version = hashlib.sha256(f"{index}|{catalog}".encode("utf-8")).hexdigest()[:16]
+            self._version_checked = now
+        return self._version
+
+    def invalidate_version(self) -> None:
+        """Re-read the data version on the next lookup, e.g. right after switching index versions"""
+        self._version = None
+
+    def make_key(self, query: str, top_k: int, filters: str = "", settings: str = "") -> str:
+        raw = f"{normalize_query(query)}|{top_k}|{filters}|{settings}"
+        return f"{self.version()}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+    def get(self, key: str) -> Optional[Results]:
+        results = self.local.get(key) if self.local is not None else None
+        if results is None and self.shared is not None:
+            results = self.shared.get(key)
+            if results is not None and self.local is not None:
+                self.local.set(key, results)
+        if results is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return results
+
+    def set(self, key: str, results: Results) -> None:
+        if self.local is not None:
+            self.local.set(key, results)
+        if self.shared is not None:
+            self.shared.set(key, results)
+
+    def clear(self) -> None:
+        for store in (self.local, self.shared):
+            if store is not None:
+                store.clear()
+
+    def stats(self) -> Dict[str, float]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
@@ -0,0 +1,258 @@
+"""Versioned index directories, published by an atomic pointer swap.
+
+An index root (INDEX_DIR) in the versioned layout looks like:
+
+    CURRENT            name of the version workers should serve
+    versions/<name>/   a complete artifact (vectors, ids, manifest, ivf*),
+                       plus catalog.csv, the catalog it was built from
+    leases/<name>/     one empty file per worker process serving <name>,
+                       touched every INDEX_LEASE_TTL / 3 seconds while held
+
+A build is written to a staging directory and moved into versions/, then
+CURRENT is replaced with os.replace, so a reader sees either the old or
+the new version, never a mix. Running workers notice the new pointer,
+load the new version in the background and swap it in; requests already
+running finish on the version they started with.
+
+Vectors are memory-mapped read-only, so every worker on the host shares
+one page-cache copy of each version. A version is deleted once it is
+neither current, nor among the newest INDEX_KEEP_VERSIONS, nor leased by
+a live worker: a process that still runs on this host, or, for a lease
+from another host sharing the root, one renewed within INDEX_LEASE_TTL
+seconds. A plain artifact directory without CURRENT still works
+as before.
+"""
+import argparse
+import os
+import shutil
+import socket
+import sys
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core.artifact import INDEX_DIR, artifact_exists, load_manifest
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+LEASES_DIR = "leases"
+CATALOG_FILE = "catalog.csv"
+
+# Newest versions kept for rollback even when no worker uses them (the current one included)
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", 2))
+# Seconds after its last renewal that a lease from another host counts as abandoned
+LEASE_TTL = float(os.getenv("INDEX_LEASE_TTL", 300))
+
+
+def is_versioned(root: Path) -> bool:
+    return (Path(root) / CURRENT_FILE).exists()
+
+
+def current_version(root: Path) -> Optional[str]:
+    try:
+        return (Path(root) / CURRENT_FILE).read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def version_dir(root: Path, version: str) -> Path:
+    return Path(root) / VERSIONS_DIR / version
+
+
+def resolve_index_dir(root: Path) -> Path:
+    """The artifact directory to serve: the current version, or root itself if it isn't versioned"""
+    version = current_version(root)
+    return version_dir(root, version) if version else Path(root)
+
+
+def version_catalog(directory: Path, default: Path) -> Path:
+    """The catalog snapshot published with a version, else default"""
+    snapshot = Path(directory) / CATALOG_FILE
+    return snapshot if snapshot.exists() else Path(default)
+
+
+def list_versions(root: Path) -> List[str]:
+    """Published versions, oldest first (names sort by creation time)"""
+    directory = Path(root) / VERSIONS_DIR
+    if not directory.exists():
+        return []
+    return sorted(p.name for p in directory.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+
+def staging_dir(root: Path) -> Path:
+    """A fresh directory to build the next version in; invisible to readers and GC"""
+    name = f"{time.strftime('%Y%m%dT%H%M%SZ', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    path = Path(root) / VERSIONS_DIR / f".{name}.staging"
+    path.mkdir(parents=True)
+    return path
+
+
+def publish(root: Path, build_dir: Path, catalog_path: Optional[Path] = None) -> str:
+    """Make a complete artifact directory the current version and return its name.
+
+    A staging directory under root is moved into place; anything else is
+    copied first. The catalog, if given, is stored with the version.
+    """
+    root, build_dir = Path(root), Path(build_dir)
+    if not artifact_exists(build_dir):
+        raise ValueError(f"No complete artifact in {build_dir}")
+
+    if build_dir.parent != root / VERSIONS_DIR or not build_dir.name.endswith(".staging"):
+        staged = staging_dir(root)
+        # Leaves out the versioned layout itself, so a flat root can be published into versions/
+        shutil.copytree(build_dir, staged, dirs_exist_ok=True,
+                        ignore=shutil.ignore_patterns(VERSIONS_DIR, LEASES_DIR, CURRENT_FILE, ".*"))
+        build_dir = staged
+    if catalog_path is not None:
+        shutil.copyfile(catalog_path, build_dir / CATALOG_FILE)
+
+    version = build_dir.name[1:-len(".staging")]
+    os.replace(build_dir, version_dir(root, version))
+
+    tmp = root / f".{CURRENT_FILE}.tmp"
+    tmp.write_text(version + "\n")
+    os.replace(tmp, root / CURRENT_FILE)
+    return version
+
+
+def _lease_owner() -> str:
+    return f"{socket.gethostname()}.{os.getpid()}"
+
+
+def _lease_alive(lease: Path, ttl: float = LEASE_TTL) -> bool:
+    host, _, pid = lease.name.rpartition(".")
+    if host != socket.gethostname():
+        # Can't check another host's processes; its lease is live while it keeps renewing it
+        try:
+            return time.time() - lease.stat().st_mtime < ttl
+        except FileNotFoundError:
+            return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, ValueError):
+        return True
+    return True
+
+
+class Lease:
+    """Marks a version as in use by this process until released (or the process exits).
+
+    A background thread renews the lease file's mtime every ttl / 3
+    seconds, so workers on other hosts can tell it from an abandoned one.
+    """
+
+    def __init__(self, root: Path, version: str, ttl: float = LEASE_TTL):
+        self.path = Path(root) / LEASES_DIR / version / _lease_owner()
+        self.version = version
+        self.renew()
+        self._released = threading.Event()
+        self._heartbeat = threading.Thread(target=self._keep_alive, args=(ttl / 3,),
+                                           name=f"lease-{version}", daemon=True)
+        self._heartbeat.start()
+
+    def renew(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.touch()
+
+    def _keep_alive(self, interval: float):
+        while not self._released.wait(interval):
+            try:
+                self.renew()
+            except OSError as e:
+                print(f"Lease renewal error ({self.version}): {str(e)}")
+
+    def release(self):
+        self._released.set()
+        self._heartbeat.join()  # So a renewal in progress can't recreate the file
+        # The version's lease directory stays; GC removes it with the version
+        self.path.unlink(missing_ok=True)
+
+
+def live_leases(root: Path, ttl: float = LEASE_TTL) -> Dict[str, List[str]]:
+    """version -> owners of live leases; stale lease files (dead processes, expired foreign leases) are removed"""
+    directory = Path(root) / LEASES_DIR
+    leases: Dict[str, List[str]] = {}
+    if not directory.exists():
+        return leases
+    for version in directory.iterdir():
+        for lease in version.iterdir():
+            if _lease_alive(lease, ttl):
+                leases.setdefault(version.name, []).append(lease.name)
+            else:
+                lease.unlink(missing_ok=True)
+    return leases
+
+
+def collect_garbage(root: Path, keep: int = KEEP_VERSIONS) -> List[str]:
+    """Delete versions that are not current, not among the newest `keep` and not leased"""
+    root = Path(root)
+    versions = list_versions(root)
+    protected = set(versions[-keep:]) if keep > 0 else set()
+    protected.add(current_version(root))
+    protected.update(live_leases(root))
+
+    removed = []
+    for version in versions:
+        if version not in protected:
+            shutil.rmtree(version_dir(root, version), ignore_errors=True)
+            shutil.rmtree(root / LEASES_DIR / version, ignore_errors=True)
+            removed.append(version)
+    return removed
+
+
+def status(root: Path) -> Dict[str, Any]:
+    leases = live_leases(root)
+    current = current_version(root)
+    return {
+        "current": current,
+        "versions": [
+            {
+                "version": version,
+                "current": version == current,
+                "workers": len(leases.get(version, [])),
+                "build_id": load_manifest(version_dir(root, version)).get("build_id")
+                if artifact_exists(version_dir(root, version)) else None,
+            }
+            for version in list_versions(root)
+        ]
+    }
+
+
+if __name__ == "__main__":
+    from src.core.backends import CATALOG_PATH
+
+    parser = argparse.ArgumentParser(description="Publish and garbage-collect versioned index artifacts")
+    parser.add_argument("--root", default=str(INDEX_DIR), help="Versioned index root")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    publish_cmd = subparsers.add_parser("publish", help="Make an artifact directory the current version")
+    publish_cmd.add_argument("--from", dest="source", required=True, help="Directory holding a complete artifact")
+    publish_cmd.add_argument("--catalog", default=str(CATALOG_PATH), help="Catalog the artifact was built from")
+
+    gc_cmd = subparsers.add_parser("gc", help="Delete versions no worker uses")
+    gc_cmd.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+
+    subparsers.add_parser("status", help="List versions and the workers serving them")
+
+    args = parser.parse_args()
+    root = Path(args.root)
+    if args.command == "publish":
+        version = publish(root, Path(args.source), Path(args.catalog))
+        print(f"✅ Published {version}; workers switch to it on their next check")
+        removed = collect_garbage(root)
+        if removed:
+            print(f"Removed unused versions: {', '.join(removed)}")
+    elif args.command == "gc":
+        removed = collect_garbage(root, args.keep)
+        print(f"✅ Removed {len(removed)} unused versions" + (f": {', '.join(removed)}" if removed else ""))
+    else:
+        for entry in status(root)["versions"]:
+            marker = "*" if entry["current"] else " "
+            print(f"{marker} {entry['version']}  workers={entry['workers']}  build={entry['build_id']}")
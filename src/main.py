@@ -1,8 +1,24 @@
-from fastapi import FastAPI
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, PlainTextResponse
 from src.api.routes import router
+from src.core import metrics
+from src.core.recommender import warmup, is_ready
 
-app = FastAPI(title="SHL Assessment Recommender")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up in the background: the worker answers /health at once and
+    # reports /ready only when the index is loaded and a query has run
+    warmup_task = asyncio.create_task(asyncio.to_thread(warmup))
+    yield
+    warmup_task.cancel()
+
+
+app = FastAPI(title="SHL Assessment Recommender", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,4 +28,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.include_router(router, prefix="/api/v1")
\ No newline at end of file
+app.include_router(router, prefix="/api/v1")
+
+
+@app.middleware("http")
+async def record_timings(request: Request, call_next):
+    """Count and time every request; stage timings go out in a Server-Timing header"""
+    stages = metrics.start_request()
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+
+    # Only matched routes get their own label, so 404 scans can't add series
+    endpoint = request.url.path if request.scope.get("route") is not None else "unmatched"
+    metrics.REQUESTS.inc(endpoint=endpoint, status=str(response.status_code))
+    metrics.REQUEST_SECONDS.observe(elapsed, endpoint=endpoint)
+    response.headers["Server-Timing"] = metrics.server_timing(stages, elapsed)
+    return response
+
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "healthy"}
+
+
+@app.get("/ready")
+async def ready():
+    """Readiness: the index is loaded and warm, so the worker can take traffic"""
+    if not is_ready():
+        return ORJSONResponse(status_code=503, content={"status": "warming up"})
+    return {"status": "ready"}
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Counters and latency histograms in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,92 @@
+"""Recall@k vs. queries/second of the IVF index against exact search.
+
+Usage:
+    PYTHONPATH=. python src/test_eval/ann_benchmark.py --synthetic 100000
+    PYTHONPATH=. python src/test_eval/ann_benchmark.py --real
+"""
+import argparse
+import sys
+import time
+import numpy as np
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.core.artifact import INDEX_DIR, l2_normalize
+from src.core.ivf import IVFIndex, default_nlist
+
+
+def synthetic_vectors(count: int, dim: int, clusters: int, rng: np.random.Generator,
+                      spread: float = 1.0) -> np.ndarray:
+    """Normalized points scattered around random directions, like topic-clustered embeddings"""
+    centers = l2_normalize(rng.normal(size=(clusters, dim)).astype(np.float32))
+    # Noise of norm ~spread around each center
+    points = centers[rng.integers(0, clusters, count)] + rng.normal(0, spread / np.sqrt(dim), (count, dim))
+    return l2_normalize(points.astype(np.float32))
+
+
+def real_vectors(index_dir: Path) -> np.ndarray:
+    from src.core.backends import LocalBackend
+    return np.asarray(LocalBackend(index_dir=index_dir, ann=None, quantization=None).matrix, dtype=np.float32)
+
+
+def exact_top_k(matrix: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    scores = queries @ matrix.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def run(matrix: np.ndarray, queries: np.ndarray, k: int, nlist: int, nprobes: List[int], label: str):
+    print(f"\n{label}: {matrix.shape[0]} x {matrix.shape[1]} vectors, {len(queries)} queries, k={k}")
+
+    start = time.perf_counter()
+    for q in queries:
+        exact_top_k(matrix, q[None, :], k)
+    exact_qps = len(queries) / (time.perf_counter() - start)
+    truth = exact_top_k(matrix, queries, k)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(matrix, [str(i) for i in range(len(matrix))], nlist)
+    print(f"  built {index.nlist} clusters in {time.perf_counter() - start:.2f}s")
+    print(f"  {'method':<14}{'recall@k':>10}{'QPS':>12}{'speedup':>10}")
+    print(f"  {'exact':<14}{1.0:>10.4f}{exact_qps:>12.1f}{1.0:>10.2f}")
+
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            continue
+        start = time.perf_counter()
+        found = index.search(queries, k, nprobe=nprobe)
+        qps = len(queries) / (time.perf_counter() - start)
+        recall = np.mean([len(set(rows) & set(t)) / k for (rows, _), t in zip(found, truth)])
+        print(f"  {'ivf nprobe=' + str(nprobe):<14}{recall:>10.4f}{qps:>12.1f}{qps / exact_qps:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the IVF index against exact search")
+    parser.add_argument("--synthetic", type=int, default=0, help="Number of synthetic vectors (0 to skip)")
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200, help="Topics in the synthetic data")
+    parser.add_argument("--real", action="store_true", help="Also benchmark the catalog artifact")
+    parser.add_argument("--index-dir", default=str(INDEX_DIR))
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=None, help="Clusters (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32, 64])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if not args.synthetic and not args.real:
+        args.synthetic = 100000
+
+    if args.synthetic:
+        data = synthetic_vectors(args.synthetic + args.queries, args.dim, args.clusters, rng)
+        matrix, queries = data[:args.synthetic], data[args.synthetic:]
+        run(matrix, queries, args.k, args.nlist or default_nlist(len(matrix)), args.nprobe, "synthetic")
+
+    if args.real:
+        matrix = real_vectors(Path(args.index_dir))
+        # Catalog rows with a little noise stand in for queries
+        queries = matrix[rng.integers(0, len(matrix), args.queries)]
+        queries = l2_normalize(queries + rng.normal(0, 0.02, queries.shape).astype(np.float32))
+        run(matrix, queries, args.k, args.nlist or default_nlist(len(matrix)), args.nprobe, "catalog")
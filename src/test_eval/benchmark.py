@@ -0,0 +1,254 @@
+"""Load and latency benchmark for /api/v1/recommend.
+
+Runs the app from src/main.py in-process with the deterministic stub
+embedder and a latency-wrapped local vector store, drives it with a fixed
+number of concurrent clients per level and reports throughput and
+p50/p95/p99 latency for the whole request and for each upstream stage.
+
+    PYTHONPATH=. python src/test_eval/benchmark.py --output bench.json
+    PYTHONPATH=. python src/test_eval/benchmark.py --baseline bench.json
+
+With --baseline the run exits non-zero if throughput drops or request
+p95/p99 latency grows by more than --tolerance at any level.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+import httpx
+import numpy as np
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core import recommender
+from src.core.backends import RetrievalBackend, LocalBackend
+from src.core.constraints import QueryConstraints
+from src.test_eval.stubs import StubEmbedder, LatencyBackend
+
+# Query shapes similar to real traffic; a counter keeps every query distinct
+QUERY_TEMPLATES = [
+    "Java developer who can collaborate with business teams, request {i}",
+    "entry level sales role with a short personality test, request {i}",
+    "numerical reasoning for a financial analyst within 40 minutes, request {i}",
+    "senior data analyst with SQL and Python skills, request {i}",
+    "customer service representative situational judgement, request {i}",
+]
+
+
+class StageTimings:
+    """Durations in seconds per stage, appended from any thread"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, stage: str, seconds: float):
+        self.samples[stage].append(seconds)
+
+    def clear(self):
+        self.samples.clear()
+
+
+class TimedEmbedder:
+    """Records how long each embedding call takes"""
+
+    def __init__(self, embedder: StubEmbedder, timings: StageTimings):
+        self.embedder = embedder
+        self.timings = timings
+
+    def __call__(self, query: str) -> List[float]:
+        start = time.perf_counter()
+        try:
+            return self.embedder(query)
+        finally:
+            self.timings.record("embed", time.perf_counter() - start)
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        try:
+            return self.embedder.embed_batch(queries)
+        finally:
+            self.timings.record("embed", time.perf_counter() - start)
+
+
+class TimedBackend(RetrievalBackend):
+    """Records how long each vector-store call takes"""
+
+    def __init__(self, inner: RetrievalBackend, timings: StageTimings):
+        self.inner = inner
+        self.timings = timings
+
+    def query(self, vector: List[float], top_k: int,
+              constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
+        start = time.perf_counter()
+        try:
+            return self.inner.query(vector, top_k, constraints)
+        finally:
+            self.timings.record("retrieve", time.perf_counter() - start)
+
+    def score_ids(self, vector: List[float], ids: List[str]) -> Dict[str, float]:
+        return self.inner.score_ids(vector, ids)
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Count, mean and percentiles in milliseconds"""
+    if not samples:
+        return {"count": 0}
+    ms = np.asarray(samples) * 1000
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return {
+        "count": len(samples),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(p50),
+        "p95_ms": float(p95),
+        "p99_ms": float(p99),
+        "max_ms": float(ms.max()),
+    }
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, requests_count: int,
+                    timings: StageTimings, offset: int) -> Dict[str, Any]:
+    """Closed loop: `concurrency` clients each send their next request as soon as the last returns"""
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests_count):
+        queue.put_nowait(QUERY_TEMPLATES[i % len(QUERY_TEMPLATES)].format(i=offset + i))
+    errors = 0
+    empty = 0
+
+    async def worker():
+        nonlocal errors, empty
+        while True:
+            try:
+                query = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = time.perf_counter()
+            try:
+                response = await client.post("/api/v1/recommend", json={"query": query})
+                if response.status_code != 200:
+                    errors += 1
+                elif not response.json().get("results"):
+                    empty += 1
+            except Exception:
+                errors += 1
+            timings.record("request", time.perf_counter() - start)
+
+    timings.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    return {
+        "requests": requests_count,
+        "errors": errors,
+        "empty_results": empty,
+        "elapsed_s": elapsed,
+        "throughput_rps": requests_count / elapsed,
+        "stages": {stage: summarize(samples) for stage, samples in sorted(timings.samples.items())},
+    }
+
+
+async def run(levels: List[int], requests_count: int, embed_latency: float, query_latency: float,
+              warmup: int = 20) -> Dict[str, Any]:
+    from src.main import app
+
+    timings = StageTimings()
+    store = LocalBackend()
+    # Queries embed near catalog rows, so responses carry results as in production
+    embedder = TimedEmbedder(StubEmbedder(latency=embed_latency, anchors=store.matrix), timings)
+    recommender.set_embedder(embedder, embedder.embed_batch)
+    recommender.set_backend(TimedBackend(LatencyBackend(store, latency=query_latency), timings))
+    recommender.embedding_cache.clear()
+    recommender.get_lexical_index()
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        offset = 0
+        if warmup:
+            await run_level(client, min(levels), warmup, timings, offset)
+            offset += warmup
+        for concurrency in levels:
+            results[str(concurrency)] = await run_level(client, concurrency, requests_count, timings, offset)
+            offset += requests_count
+
+    return {
+        "config": {
+            "levels": levels,
+            "requests_per_level": requests_count,
+            "embed_latency_s": embed_latency,
+            "query_latency_s": query_latency,
+            "max_concurrent_searches": recommender.MAX_CONCURRENT_SEARCHES,
+            "python": platform.python_version(),
+        },
+        "created": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "levels": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions of current against baseline, one message each"""
+    regressions = []
+    for level, base in baseline["levels"].items():
+        run_result = current["levels"].get(level)
+        if run_result is None:
+            continue
+        if run_result["errors"] > base["errors"]:
+            regressions.append(f"c={level}: {run_result['errors']} errors (baseline {base['errors']})")
+        if run_result["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"c={level}: throughput {run_result['throughput_rps']:.1f} req/s "
+                               f"(baseline {base['throughput_rps']:.1f})")
+        for key in ("p95_ms", "p99_ms"):
+            now = run_result["stages"]["request"].get(key)
+            before = base["stages"]["request"].get(key)
+            if now is not None and before is not None and now > before * (1 + tolerance):
+                regressions.append(f"c={level}: request {key} {now:.1f} (baseline {before:.1f})")
+    return regressions
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"{'conc':>5}{'req/s':>10}{'errors':>8}  {'stage':<10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'calls':>7}")
+    for level, result in report["levels"].items():
+        first = True
+        for stage, stats in result["stages"].items():
+            head = f"{level:>5}{result['throughput_rps']:>10.1f}{result['errors']:>8}" if first else " " * 23
+            if stats["count"]:
+                print(f"{head}  {stage:<10}{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}"
+                      f"{stats['p99_ms']:>9.1f}{stats['count']:>7}")
+            first = False
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark /api/v1/recommend with stub upstream services")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    parser.add_argument("--requests", type=int, default=200, help="Requests per concurrency level")
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--query-latency", type=float, default=0.02)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--output", help="Write the results as JSON")
+    parser.add_argument("--baseline", help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative regression")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.concurrency, args.requests, args.embed_latency,
+                             args.query_latency, args.warmup))
+    print_report(report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"✅ Results written to {args.output}")
+
+    if args.baseline:
+        regressions = compare(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if regressions:
+            print("❌ Regressions against baseline:")
+            for message in regressions:
+                print(f"  {message}")
+            sys.exit(1)
+        print("✅ No regressions against baseline")
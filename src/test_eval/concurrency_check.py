@@ -0,0 +1,59 @@
+"""Check that /api/v1/recommend overlaps upstream I/O instead of serializing it.
+
+Runs the app in-process with stub services that add fixed latency, fires a
+burst of concurrent requests and compares the wall time with what a fully
+serialized worker would need.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core import recommender
+from src.core.backends import LocalBackend
+from src.test_eval.stubs import StubEmbedder, LatencyBackend
+
+
+async def run(requests_count: int, embed_latency: float, query_latency: float) -> float:
+    from src.main import app
+
+    recommender.embedding_cache.clear()
+    embedder = StubEmbedder(latency=embed_latency)
+    recommender.set_embedder(embedder, embedder.embed_batch)
+    recommender.set_backend(LatencyBackend(LocalBackend(), latency=query_latency))
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://stub") as client:
+        start = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.post("/api/v1/recommend", json={"query": f"query {i}"})
+            for i in range(requests_count)
+        ])
+        elapsed = time.perf_counter() - start
+
+    failed = [r for r in responses if r.status_code != 200]
+    if failed:
+        raise RuntimeError(f"{len(failed)} requests failed")
+    return elapsed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=32)
+    parser.add_argument("--embed-latency", type=float, default=0.05)
+    parser.add_argument("--query-latency", type=float, default=0.02)
+    args = parser.parse_args()
+
+    elapsed = asyncio.run(run(args.requests, args.embed_latency, args.query_latency))
+    serialized = args.requests * (args.embed_latency + args.query_latency)
+
+    print(f"{args.requests} requests in {elapsed:.3f}s ({args.requests / elapsed:.1f} req/s)")
+    print(f"Fully serialized worker would need {serialized:.3f}s")
+    print(f"Overlap factor: {serialized / elapsed:.1f}x "
+          f"(MAX_CONCURRENT_SEARCHES={recommender.MAX_CONCURRENT_SEARCHES})")
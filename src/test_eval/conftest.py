@@ -0,0 +1,78 @@
+"""Shared pytest fixtures: a small synthetic catalog with a matching index artifact"""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from src.core.artifact import save_artifact
+
+CATALOG_ROWS = [
+    ("1", "Java 8 (New)", "K", "True", "True", 20),
+    ("2", "Python (New)", "K", "True", "False", 11),
+    ("3", "Verify - Numerical Ability", "A", "True", "True", 18),
+    ("4", "Occupational Personality Questionnaire OPQ32r", "P", "True", "False", 25),
+    ("5", "Sales Representative Solution", "B,P", "False", "False", 40),
+    ("6", "Core Java (Advanced Level) (New)", "K", "True", "True", 13),
+    ("7", "Verbal Reasoning", "A", "False", "True", 30),
+    ("8", "Customer Service Simulation", "S", "True", "False", 35),
+]
+
+
+def write_catalog(path: Path, rows=CATALOG_ROWS) -> Path:
+    pd.DataFrame(
+        [{"id": row_id, "assessment_name": name, "url": f"https://example.com/{row_id}",
+          "remote_testing": remote, "adaptive_irt_support": irt, "test_type": test_type, "duration": duration}
+         for row_id, name, test_type, remote, irt, duration in rows]
+    ).to_csv(path, index=False)
+    return path
+
+
+def random_vectors(count: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def catalog_path(tmp_path) -> Path:
+    return write_catalog(tmp_path / "catalog.csv")
+
+
+@pytest.fixture
+def index_dir(tmp_path, catalog_path) -> Path:
+    """Artifact of random unit vectors, row-aligned with the catalog"""
+    directory = tmp_path / "index"
+    ids = [row[0] for row in CATALOG_ROWS]
+    save_artifact(directory, ids, random_vectors(len(ids)), "test-model")
+    return directory
+
+
+@pytest.fixture
+def serving(monkeypatch, index_dir, catalog_path):
+    """The recommender serving the synthetic catalog with a counting stub embedder and no response cache"""
+    from src.core import recommender
+    from src.core.backends import LocalBackend
+    from src.core.catalog import CatalogColumns
+    from src.core.embedding_cache import EmbeddingCache
+    from src.core.lexical import LexicalIndex
+    from src.core.response_cache import ResponseCache
+    from src.test_eval.stubs import StubEmbedder
+
+    embedder = StubEmbedder(latency=0.05, anchors=random_vectors(len(CATALOG_ROWS)))
+    monkeypatch.setattr(recommender, "INDEX_DIR", index_dir)
+    monkeypatch.setattr(recommender, "CATALOG_PATH", catalog_path)
+    monkeypatch.setattr(recommender, "_index_resolved", False)
+    monkeypatch.setattr(recommender, "_index_version", None)
+    monkeypatch.setattr(recommender, "_index_lease", None)
+    monkeypatch.setattr(recommender, "_backend", LocalBackend(index_dir, catalog_path))
+    monkeypatch.setattr(recommender, "_catalog", CatalogColumns.from_csv(catalog_path))
+    monkeypatch.setattr(recommender, "_lexical", LexicalIndex(pd.read_csv(catalog_path)))
+    monkeypatch.setattr(recommender, "_embedder", None)
+    monkeypatch.setattr(recommender, "embedding_cache", EmbeddingCache(max_size=64))
+    monkeypatch.setattr(recommender, "response_cache", ResponseCache(None, index_dir=index_dir, catalog_path=catalog_path))
+    recommender.set_embedder(embedder, embedder.embed_batch)
+    return embedder
@@ -1,132 +1,210 @@
-from typing import List, Dict
+"""Offline retrieval evaluation over a JSONL file of labeled queries.
+
+Each line of the labeled file is {"query": ..., "assessments": [names]}.
+Queries run concurrently on a bounded worker pool; query embeddings and
+retrieved lists are cached on disk (keyed by the retrieval configuration),
+so re-running after a metric-only change doesn't touch any service.
+"""
+from typing import List, Dict, Any, Optional
+import argparse
+import hashlib
 import json
-import numpy as np
-import sys
 import os
+import sys
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-PROJECT_ROOT = Path(__file__).parent.parent.parent  
+PROJECT_ROOT = Path(__file__).parent.parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
+from src.core import recommender
+from src.core.embedding_cache import EmbeddingCache
 
-from src.core.recommender import search_pinecone
-test_queries=[
-
-
-    {
-        "query": "I am hiring for Java developers who can also collaborate effectively with my business teams. Looking for an assessment(s) that can be completed in 40 minutes.",
-        "assessments": [
-            "Automata - Fix (New) ",
-            "Core Java (Entry Level) (New) ",
-            "Java 8 (New) ",
-            "Core Java (Advanced Level) (New) ",
-            "Agile Software Development",
-            "Technology Professional 8.0 - Job Focused Assessment",
-            "Computer Science (New)"
-        ]
-    },
-    {
-        "query": "I want to hire new graduates for a sales role in my company, the budget is for about an hour for each test. Give me some options",
-        "assessments": [
-            "Entry Level Sales 7.1 ",
-            "Entry Level Sales Sift Out 7.1 ",
-            "Entry Level Sales Solution ",
-            "Sales Representative Solution ",
-            "Sales Support Specialist Solution ",
-            "Technical Sales Associate Solution ",
-            "SVAR Spoken English - Indian Accent (New) ",
-            "Sales and Service Phone Solution ",
-            "Sales and Service Phone Simulation ",
-            "English Comprehension (New)"
-        ]
-    },
-    {
-        "query": "Content Writer required, expert in English and SEO.",
-        "assessments": [
-            "Drupal (New) ",
-            "Search Engine Optimization (New)",
-            "Administrative Professional - Short Form",
-            "Entry Level Sales Sift Out 7.1 ",
-            "General Entry Level Data Entry 7.0 - Solution "
-        ]
-    }
-]
+LABELED_QUERIES_PATH = Path(__file__).parent / "labeled_queries.jsonl"
+EVAL_CACHE_DIR = Path(os.getenv("EVAL_CACHE_DIR", Path(__file__).parent / ".eval_cache"))
 
 
 def normalize(text: str) -> str:
-    return text.lower().strip()
-
-
-def recall_at_k(relevant: List[str], retrieved: List[str], k: int = 3) -> float:
-    """Calculate Recall@K metric"""
-    relevant_set = set(relevant)
-    retrieved_set = set(retrieved[:k])
-    intersection = relevant_set & retrieved_set
-    return len(intersection) / min(len(relevant_set), k) if relevant_set else 0.0
-
-def map_at_k(relevant: List[str], retrieved: List[str], k: int = 3) -> float:
-    """Calculate Mean Average Precision@K"""
-    precision_scores = []
-    num_relevant = 0
-    
-    for i, item in enumerate(retrieved[:k], 1):
-        if item in relevant:
-            num_relevant += 1
-            precision_scores.append(num_relevant / i)
-    
-    return sum(precision_scores) / min(len(relevant), k) if relevant else 0.0
-
-def evaluate() -> Dict[str, float]:
-    """Run evaluation and return metrics"""
-    recalls, maps = [], []
-    failed_queries = 0
-
-    for test in test_queries:
-        query = test["query"]
-        relevant = [normalize(a) for a in test["assessments"]]
-
-
-        try:
-            results = search_pinecone(query, top_k=3)
-            retrieved = [normalize(f"{item['name']} | SHL") for item in results]
-            
-            if not retrieved:
-                failed_queries += 1
-                print(f"No results for: {query[:50]}...")
-                continue
-
-            recall = recall_at_k(relevant, retrieved)
-            avg_precision = map_at_k(relevant, retrieved)
-
-            recalls.append(recall)
-            maps.append(avg_precision)
-
-            print(f"\n Query: {query[:50]}...")
-            print(f"Relevant: {relevant[:3]}...")
-            print(f" Retrieved: {retrieved}")
-            print(f" Recall@3: {recall:.2f} | MAP@3: {avg_precision:.2f}")
-
-        except Exception as e:
-            print(f"⚠️ Error processing query: {str(e)}")
-            failed_queries += 1
-
-    metrics = {
-        "mean_recall@3": np.mean(recalls) if recalls else 0,
-        "mean_map@3": np.mean(maps) if maps else 0,
-        "success_rate": 1 - (failed_queries / len(test_queries)) if test_queries else 0
+    return " ".join(text.lower().split())
+
+
+def load_labeled_queries(path: Path) -> List[Dict[str, Any]]:
+    """Labeled queries from a JSONL file, skipping blank lines"""
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def retrieval_fingerprint(top_k: int) -> str:
+    """Everything that changes retrieved lists; cached lists from another configuration are ignored"""
+    # The response cache's data version: the build_id of the version served
+    # (resolved through CURRENT on a versioned root) plus the catalog file
+    recommender.serving_index_dir()
+    recommender.response_cache.invalidate_version()
+    parts = [
+        recommender.RETRIEVAL_BACKEND, recommender.get_embedder().name, recommender.response_cache.version(),
+        str(top_k), str(recommender.LEXICAL_SEARCH), str(recommender.CONSTRAINT_FILTERS),
+        str(recommender.TYPE_PREFERENCE_BOOST),
+        os.getenv("LOCAL_INDEX_QUANTIZATION", ""), os.getenv("LOCAL_ANN_INDEX", ""), os.getenv("IVF_NPROBE", ""),
+    ]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+class RetrievalCache:
+    """Retrieved names and latency per query, stored as one JSON file per configuration"""
+
+    def __init__(self, directory: Path, fingerprint: str):
+        self.path = Path(directory) / f"retrieved-{fingerprint}.json"
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        if self.path.exists():
+            self.entries = json.loads(self.path.read_text())
+
+    def get(self, query: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(query)
+
+    def set(self, query: str, entry: Dict[str, Any]):
+        self.entries[query] = entry
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.entries))
+        os.replace(tmp, self.path)
+
+
+def retrieve(query: str, top_k: int) -> Dict[str, Any]:
+    """Run one query and time it; degraded results (a fallback path answered) aren't cached"""
+    start = time.perf_counter()
+    try:
+        results, complete = recommender.run_search(query, top_k=top_k)
+        error = None
+    except Exception as e:
+        results, complete, error = [], False, str(e)
+    return {
+        "retrieved": [item["name"] for item in results],
+        "latency_ms": (time.perf_counter() - start) * 1000,
+        "error": error,
+        "degraded": not complete
     }
 
-    print("\n Evaluation Summary:")
-    print(f" Mean Recall@3: {metrics['mean_recall@3']:.2f}")
-    print(f" Mean MAP@3: {metrics['mean_map@3']:.2f}")
-    print(f" Success Rate: {metrics['success_rate']:.1%}")
-    print(f"⚠️  Failed queries: {failed_queries}/{len(test_queries)}")
 
+def relevance_matrix(relevant: List[List[str]], retrieved: List[List[str]], depth: int) -> np.ndarray:
+    """(n_queries, depth) 0/1 matrix: is the item at each rank relevant"""
+    rel = np.zeros((len(retrieved), depth), dtype=np.float32)
+    for i, (labels, items) in enumerate(zip(relevant, retrieved)):
+        labels = {normalize(a) for a in labels}
+        for j, item in enumerate(items[:depth]):
+            rel[i, j] = normalize(item) in labels
+    return rel
+
+
+def ranking_metrics(rel: np.ndarray, n_relevant: np.ndarray, ks: List[int]) -> Dict[str, np.ndarray]:
+    """Per-query Recall@k, MAP@k and NDCG@k for every k, computed on the whole matrix at once"""
+    ranks = np.arange(1, rel.shape[1] + 1, dtype=np.float32)
+    precision = np.cumsum(rel, axis=1) / ranks
+    discounts = 1.0 / np.log2(ranks + 1)
+    dcg = np.cumsum(rel * discounts, axis=1)
+    ideal = np.cumsum(discounts)
+
+    metrics = {}
+    for k in ks:
+        denom = np.minimum(n_relevant, k).astype(np.float32)
+        safe = np.maximum(denom, 1)
+        metrics[f"recall@{k}"] = rel[:, :k].sum(axis=1) / safe
+        metrics[f"map@{k}"] = (precision[:, :k] * rel[:, :k]).sum(axis=1) / safe
+        metrics[f"ndcg@{k}"] = dcg[:, k - 1] / ideal[np.maximum(denom.astype(int), 1) - 1]
     return metrics
 
 
+def evaluate(labeled: List[Dict[str, Any]], ks: List[int], workers: int = 8,
+             cache_dir: Optional[Path] = EVAL_CACHE_DIR) -> Dict[str, Any]:
+    """Run evaluation and return summary and per-query metrics"""
+    depth = max(ks)
+    queries = [test["query"] for test in labeled]
+
+    retrieval_cache = None
+    if cache_dir is not None:
+        # Persist query embeddings too, so changed retrieval settings don't re-embed
+        Path(cache_dir).mkdir(parents=True, exist_ok=True)
+        recommender.embedding_cache = EmbeddingCache(disk_path=str(Path(cache_dir) / "embeddings.sqlite"))
+        retrieval_cache = RetrievalCache(cache_dir, retrieval_fingerprint(depth))
+
+    entries: Dict[str, Dict[str, Any]] = {}
+    pending = []
+    for query in dict.fromkeys(queries):
+        cached = retrieval_cache.get(query) if retrieval_cache else None
+        if cached is not None:
+            entries[query] = {**cached, "cached": True}
+        else:
+            pending.append(query)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for query, entry in zip(pending, pool.map(lambda q: retrieve(q, depth), pending)):
+            entries[query] = {**entry, "cached": False}
+            if retrieval_cache is not None and entry["error"] is None and not entry["degraded"]:
+                retrieval_cache.set(query, entry)
+    if retrieval_cache is not None and pending:
+        retrieval_cache.save()
+
+    retrieved = [entries[q]["retrieved"] for q in queries]
+    relevant = [test["assessments"] for test in labeled]
+    rel = relevance_matrix(relevant, retrieved, depth)
+    n_relevant = np.array([len({normalize(a) for a in r}) for r in relevant])
+    per_query = ranking_metrics(rel, n_relevant, ks)
+
+    failed = np.array([entries[q]["error"] is not None or not entries[q]["retrieved"] for q in queries])
+    scored = ~failed & (n_relevant > 0)
+    latencies = np.array([entries[q]["latency_ms"] for q in queries])
+    fresh = np.array([not entries[q]["cached"] for q in queries])
+
+    summary = {name: float(values[scored].mean()) if scored.any() else 0.0 for name, values in per_query.items()}
+    summary.update({
+        "queries": len(queries),
+        "success_rate": float(1 - failed.mean()) if len(queries) else 0.0,
+        "cached_queries": int((~fresh).sum()),
+        "latency_p50_ms": float(np.percentile(latencies, 50)) if len(queries) else 0.0,
+        "latency_p95_ms": float(np.percentile(latencies, 95)) if len(queries) else 0.0,
+    })
+
+    rows = [
+        {
+            "query": query,
+            "retrieved": entries[query]["retrieved"],
+            "latency_ms": entries[query]["latency_ms"],
+            "cached": entries[query]["cached"],
+            "error": entries[query]["error"],
+            **{name: float(values[i]) for name, values in per_query.items()}
+        }
+        for i, query in enumerate(queries)
+    ]
+    return {"summary": summary, "queries": rows}
+
+
+def print_summary(summary: Dict[str, Any], ks: List[int]):
+    print("\n Evaluation Summary:")
+    for k in ks:
+        print(f" @{k}: Recall {summary[f'recall@{k}']:.3f} | MAP {summary[f'map@{k}']:.3f} | "
+              f"NDCG {summary[f'ndcg@{k}']:.3f}")
+    print(f" Success Rate: {summary['success_rate']:.1%}")
+    print(f" Latency p50/p95: {summary['latency_p50_ms']:.1f} / {summary['latency_p95_ms']:.1f} ms "
+          f"({summary['cached_queries']}/{summary['queries']} from cache)")
+
+
 if __name__ == "__main__":
-    evaluation_results = evaluate()
-    
-    with open('evaluation_results.json', 'w') as f:
-        json.dump(evaluation_results, f, indent=2)
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Evaluate retrieval quality on labeled queries")
+    parser.add_argument("--queries", default=str(LABELED_QUERIES_PATH), help="JSONL of labeled queries")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--cache-dir", default=str(EVAL_CACHE_DIR))
+    parser.add_argument("--no-cache", action="store_true", help="Always query the live services")
+    parser.add_argument("--output", default="evaluation_results.json")
+    args = parser.parse_args()
+
+    ks = sorted(set(args.k))
+    results = evaluate(load_labeled_queries(Path(args.queries)), ks, args.workers,
+                       None if args.no_cache else Path(args.cache_dir))
+    print_summary(results["summary"], ks)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
@@ -0,0 +1,124 @@
+"""Deterministic local stand-ins for the embedding service and vector store"""
+import hashlib
+import threading
+import time
+import numpy as np
+from typing import List, Dict, Any, Iterator, Optional
+
+from src.core.backends import RetrievalBackend
+from src.core.constraints import QueryConstraints
+
+
+def stub_vector(text: str, dim: int = 768) -> List[float]:
+    """Pseudo-random unit vector derived from the text, so equal queries embed equally"""
+    seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return (vector / np.linalg.norm(vector)).tolist()
+
+
+class StubEmbedder:
+    """Embedding function that sleeps for a fixed latency, like a remote call.
+
+    With anchors (e.g. the catalog matrix) each query lands close to one
+    anchor row, so searches return results like real queries do.
+    """
+
+    def __init__(self, latency: float = 0.05, dim: int = 768, anchors: Optional[np.ndarray] = None,
+                 noise: float = 0.3):
+        self.latency = latency
+        self.dim = dim if anchors is None else anchors.shape[1]
+        self.anchors = anchors
+        self.noise = noise
+        self.calls = 0
+
+    def vector(self, query: str) -> List[float]:
+        vector = stub_vector(query, self.dim)
+        if self.anchors is None:
+            return vector
+        anchor = np.asarray(self.anchors[int(abs(vector[0]) * 1e6) % len(self.anchors)], dtype=np.float32)
+        mixed = anchor + self.noise * np.asarray(vector, dtype=np.float32)
+        return (mixed / np.linalg.norm(mixed)).tolist()
+
+    def __call__(self, query: str) -> List[float]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.vector(query)
+
+    def embed_batch(self, queries: List[str]) -> List[List[float]]:
+        """Batched call: one round trip regardless of the number of queries"""
+        self.calls += 1
+        time.sleep(self.latency)
+        return [self.vector(q) for q in queries]
+
+
+class LatencyBackend(RetrievalBackend):
+    """Wraps a backend and adds a fixed per-query latency, like a network round trip"""
+
+    def __init__(self, inner: RetrievalBackend, latency: float = 0.02):
+        self.inner = inner
+        self.latency = latency
+        self.calls = 0
+
+    def query(self, vector: List[float], top_k: int,
+              constraints: Optional[QueryConstraints] = None) -> List[Dict[str, Any]]:
+        self.calls += 1
+        time.sleep(self.latency)
+        return self.inner.query(vector, top_k, constraints)
+
+
+class InMemoryIndex:
+    """Local stand-in for a Pinecone index (upsert/delete/list/fetch/query)"""
+
+    def __init__(self, max_request_vectors: int = 1000, latency: float = 0.0):
+        self.max_request_vectors = max_request_vectors
+        self.latency = latency
+        self.vectors: Dict[str, tuple] = {}
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, vectors: List[tuple]) -> Dict[str, int]:
+        if len(vectors) > self.max_request_vectors:
+            raise ValueError(f"Request exceeds {self.max_request_vectors} vectors")
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            for row_id, values, metadata in vectors:
+                self.vectors[row_id] = (np.asarray(values, dtype=np.float32), metadata)
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids: List[str]) -> Dict:
+        time.sleep(self.latency)
+        with self._lock:
+            self.requests += 1
+            for row_id in ids:
+                self.vectors.pop(row_id, None)
+        return {}
+
+    def list(self, prefix: str = "", limit: int = 100) -> Iterator[List[str]]:
+        with self._lock:
+            ids = sorted(i for i in self.vectors if i.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def fetch(self, ids: List[str]) -> Dict[str, Any]:
+        with self._lock:
+            return {"vectors": {
+                i: {"id": i, "values": self.vectors[i][0].tolist(), "metadata": self.vectors[i][1]}
+                for i in ids if i in self.vectors
+            }}
+
+    def query(self, vector: List[float], top_k: int, include_metadata: bool = False, **kwargs) -> Dict[str, Any]:
+        time.sleep(self.latency)
+        with self._lock:
+            items = list(self.vectors.items())
+        if not items:
+            return {"matches": []}
+        matrix = np.vstack([values for _, (values, _) in items])
+        q = np.asarray(vector, dtype=np.float32)
+        scores = (matrix @ q) / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(q) + 1e-12)
+        order = np.argsort(-scores)[:top_k]
+        return {"matches": [
+            {"id": items[i][0], "score": float(scores[i]),
+             "metadata": items[i][1][1] if include_metadata else None}
+            for i in order
+        ]}
@@ -1,33 +1,80 @@
-import requests
+"""End-to-end checks of the HTTP API, run in-process against the synthetic catalog"""
+import time
 
-BASE_URL = "http://your-api-url" 
+import orjson
+import pytest
+from fastapi.testclient import TestClient
 
-def test_health_check():
-    response = requests.get(f"{BASE_URL}/health")
+from src.api.models import MAX_BATCH_QUERIES
+from src.core import recommender
+from src.main import app
+
+RESULT_KEYS = {"name", "url", "score", "type", "duration", "remote", "irt"}
+QUERIES = ["Java 8", "Looking for a sales person who can handle customers", "numerical ability test under 20 minutes"]
+
+
+@pytest.fixture
+def client(serving, monkeypatch):
+    monkeypatch.setattr(recommender, "WARMUP_QUERY", "")
+    with TestClient(app) as client:
+        yield client
+
+
+def test_health_and_ready(client):
+    response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"}
 
-def test_recommendations():
-    test_queries = [...]  
-    
-    for query_data in test_queries:
-        response = requests.post(
-            f"{BASE_URL}/recommend",
-            json={"query": query_data["query"]}
-        )
-        
+    deadline = time.monotonic() + 5
+    while client.get("/ready").status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert client.get("/ready").json() == {"status": "ready"}
+
+
+def test_recommendations(client):
+    for query in QUERIES:
+        response = client.post("/api/v1/recommend", json={"query": query})
+
         assert response.status_code == 200
-        results = response.json()
-        
-        # Validate response structure
-        assert "recommended_assessments" in results
-        for assessment in results["recommended_assessments"]:
-            assert all(key in assessment for key in [
-                "url", "adaptive_support", "description",
-                "duration", "remote_support", "test_type"
-            ])
-
-if __name__ == "__main__":
-    test_health_check()
-    test_recommendations()
-    print("All API tests passed!")
\ No newline at end of file
+        results = response.json()["results"]
+        assert 0 < len(results) <= 3
+        for result in results:
+            assert set(result) == RESULT_KEYS
+        assert "Server-Timing" in response.headers
+
+    assert client.post("/api/v1/recommend", json={"query": "Java 8"}).json()["results"][0]["name"] == "Java 8 (New)"
+    assert client.post("/api/v1/recommend", json={"query": "  "}).json() == {"results": []}
+
+
+def test_malformed_bodies_are_rejected(client):
+    assert client.post("/api/v1/recommend", json={"query": 42}).status_code == 422
+    assert client.post("/api/v1/recommend", content=b"not json").status_code == 422
+    assert client.post("/api/v1/recommend/batch", json={"queries": "Java"}).status_code == 422
+
+
+def test_batch(client):
+    response = client.post("/api/v1/recommend/batch",
+                           json={"queries": [QUERIES[0], {"query": QUERIES[1], "top_k": 5}]})
+
+    assert response.status_code == 200
+    first, second = response.json()["results"]
+    assert first["query"] == QUERIES[0] and 0 < len(first["results"]) <= 3
+    assert second["query"] == QUERIES[1] and 0 < len(second["results"]) <= 5
+    assert all(set(result) == RESULT_KEYS for result in first["results"] + second["results"])
+
+
+def test_oversized_batch_is_rejected_not_truncated(client):
+    queries = ["Java developer"] * (MAX_BATCH_QUERIES + 1)
+    response = client.post("/api/v1/recommend/batch", json={"queries": queries})
+
+    assert response.status_code == 422
+    assert response.json()["detail"][0]["loc"] == ["body", "queries"]
+
+
+def test_stream(client):
+    response = client.post("/api/v1/recommend/stream", json={"query": QUERIES[1], "top_k": 3})
+
+    assert response.status_code == 200
+    events = [orjson.loads(line) for line in response.text.splitlines()]
+    assert [event["event"] for event in events][-2:] == ["results", "done"]
+    assert events[-1]["count"] == len(events[-2]["results"]) > 0
@@ -0,0 +1,109 @@
+import importlib.util
+import os
+from pathlib import Path
+
+import pytest
+
+PAGE = """
+<html><body>
+<div class="custom__table-responsive"><table>
+  <tr><th>Pre-packaged Job Solutions</th></tr>
+  <tr data-course-id="4094">
+    <td class="custom__table-heading__title"><a href="/products/product-catalog/view/net-mvc-new/">
+      .NET MVC   (New)</a></td>
+    <td class="custom__table-heading__general"><span class="catalogue__circle -yes"></span></td>
+    <td class="custom__table-heading__general"><span class="catalogue__circle"></span></td>
+    <td class="custom__table-heading__general product-catalogue__keys">
+      <span class="product-catalogue__key">K</span><span class="product-catalogue__key">A</span>
+      <span class="product-catalogue__key">K</span>
+    </td>
+  </tr>
+  <tr data-entity-id="3827">
+    <td class="custom__table-heading__title"><a href="https://www.shl.com/view/net-framework/">.NET Framework 4.5</a></td>
+    <td class="custom__table-heading__general"><span class="catalogue__circle"></span></td>
+    <td class="custom__table-heading__general"><span class="catalogue__circle -yes"></span><br></td>
+    <td class="custom__table-heading__general product-catalogue__keys"></td>
+  </tr>
+  <tr data-course-id="1"><td class="custom__table-heading__title"></td></tr>
+</table></div>
+<ul class="pagination">
+  <li class="pagination__item"><a href="?start=12">2</a></li>
+  <li class="pagination__item"><a href="?start=372">32</a></li>
+  <li class="pagination__item"><a href="?start=12">Next</a></li>
+</ul>
+</body></html>
+"""
+
+
+@pytest.fixture(scope="module")
+def scraping(tmp_path_factory):
+    # The module name has a hyphen, and importing it opens scraping.log in the working directory
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("scraping"))
+    try:
+        path = Path(__file__).parent.parent / "utils" / "web-scraping.py"
+        spec = importlib.util.spec_from_file_location("web_scraping", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        os.chdir(cwd)
+    return module
+
+
+def test_parses_rows_and_last_page(scraping):
+    products, last_page = scraping.parse_catalog_page(PAGE, 3)
+
+    assert last_page == 32
+    assert products == [
+        {"page": 3, "assessment_name": ".NET MVC (New)",
+         "url": "https://www.shl.com/products/product-catalog/view/net-mvc-new/",
+         "remote_testing": True, "adaptive_irt_support": False, "test_type": "A, K", "id": "4094"},
+        {"page": 3, "assessment_name": ".NET Framework 4.5", "url": "https://www.shl.com/view/net-framework/",
+         "remote_testing": False, "adaptive_irt_support": True, "test_type": "N/A", "id": "3827"},
+    ]
+
+
+def test_page_without_pagination(scraping):
+    products, last_page = scraping.parse_catalog_page("<table></table>", 1)
+    assert products == [] and last_page is None
+
+
+class FakeResponse:
+    def __init__(self, status_code, text="", headers=None):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers or {}
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = responses
+        self.sent_headers = []
+
+    def get(self, url, headers=None, timeout=None):
+        self.sent_headers.append(headers)
+        return self.responses.pop(0)
+
+
+def test_unchanged_page_is_served_from_cache(scraping, tmp_path):
+    cache = scraping.PageCache(tmp_path)
+    session = FakeSession([FakeResponse(200, PAGE, {"ETag": '"v1"'}), FakeResponse(304)])
+
+    first = scraping.scrape_page_http(session, "https://example.com/catalog", 1, cache)
+    second = scraping.scrape_page_http(session, "https://example.com/catalog", 1, cache)
+
+    assert second == first and len(first[0]) == 2
+    assert session.sent_headers[1] == {"If-None-Match": '"v1"'}
+
+
+def test_file_urls_are_read_from_disk(scraping, tmp_path):
+    (tmp_path / "page_1.html").write_text(PAGE, encoding="utf-8")
+    session = FakeSession([])
+
+    products, last_page = scraping.scrape_page_http(session, (tmp_path / "page_1.html").as_uri(), 1)
+    assert len(products) == 2 and last_page == 32
+    assert scraping.scrape_page_http(session, (tmp_path / "missing.html").as_uri(), 2) == ([], None)
+    assert session.sent_headers == []
@@ -0,0 +1,55 @@
+import asyncio
+
+from src.core import recommender
+from src.core.metrics import COALESCED_REQUESTS
+
+QUERY = "someone to build backend services"
+
+
+async def search_concurrently(count: int, query: str = QUERY):
+    return await asyncio.gather(*(recommender.search_async(query, 3) for _ in range(count)))
+
+
+def test_identical_concurrent_searches_share_one_embedding(serving):
+    joined = COALESCED_REQUESTS.value()
+
+    results = asyncio.run(search_concurrently(20))
+
+    assert serving.calls == 1
+    assert COALESCED_REQUESTS.value() - joined == 19
+    assert results[0] and all(r == results[0] for r in results)
+    assert recommender._in_flight == {}
+
+
+def test_queries_differing_only_in_case_and_spacing_are_coalesced(serving):
+    joined = COALESCED_REQUESTS.value()
+
+    async def search():
+        return await asyncio.gather(recommender.search_async(QUERY, 3),
+                                    recommender.search_async(f"  {QUERY.upper()} ", 3),
+                                    recommender.search_async(QUERY, 5))
+
+    first, second, third = asyncio.run(search())
+
+    assert second == first and len(third) >= len(first)
+    assert COALESCED_REQUESTS.value() - joined == 1  # top_k 5 is a separate search
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_search(serving):
+    async def search():
+        leader = asyncio.ensure_future(recommender.search_async(QUERY, 3))
+        follower = asyncio.ensure_future(recommender.search_async(QUERY, 3))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(search())
+    assert serving.calls == 1
+
+
+def test_coalescing_can_be_disabled(serving, monkeypatch):
+    monkeypatch.setattr(recommender, "COALESCE_REQUESTS", False)
+
+    asyncio.run(search_concurrently(4))
+
+    assert serving.calls == 4
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.core import recommender
+from src.core.artifact import save_artifact
+from src.core.backends import LocalBackend, catalog_metadata
+from src.core.constraints import AttributeIndex, QueryConstraints, parse_constraints
+from src.test_eval.conftest import CATALOG_ROWS
+
+
+@pytest.mark.parametrize("query, minutes", [
+    ("Java developer test under 40 minutes", 40.0),
+    ("assessment of 30-45 mins", 45.0),
+    ("can be completed in 1 hour", 60.0),
+    ("no longer than an hour and a half", 90.0),
+    ("about half an hour", 30.0),
+    ("Java developer", None),
+])
+def test_duration(query, minutes):
+    assert parse_constraints(query).max_duration == minutes
+
+
+def test_remote_adaptive_and_types():
+    constraints = parse_constraints("Personality and numerical reasoning tests, remote testing, adaptive")
+    assert constraints.remote is True
+    assert constraints.adaptive is True
+    assert constraints.test_types == ["A", "P"]
+
+
+def test_plain_query_has_no_constraints():
+    constraints = parse_constraints("I am hiring a remote Java developer")
+    # "remote" alone describes the job, not how the test is delivered
+    assert constraints.is_empty()
+
+
+def test_pinecone_filter():
+    assert parse_constraints("simulation").to_pinecone_filter() == {"type_codes": {"$in": ["S"]}}
+    assert QueryConstraints().to_pinecone_filter() is None
+    combined = QueryConstraints(max_duration=20, remote=True).to_pinecone_filter()
+    assert combined["$and"][0] == {"remote": {"$eq": True}}
+
+
+def test_mask_agrees_with_allows(catalog_path):
+    metadata = [catalog_metadata(row) for row in pd.read_csv(catalog_path).to_dict("records")]
+    attributes = AttributeIndex(metadata)
+    constraints = parse_constraints("knowledge tests, remote testing, within 15 minutes")
+
+    mask = attributes.mask(constraints)
+    assert mask.tolist() == [constraints.allows(m) for m in metadata]
+    assert [m["name"] for m, ok in zip(metadata, mask) if ok] == ["Python (New)", "Core Java (Advanced Level) (New)"]
+    assert attributes.mask(parse_constraints("Java developer")) is None
+
+
+@pytest.mark.parametrize("query, required, preferred", [
+    ("Personality and Java test for backend engineers", None, ["P"]),
+    ("need competencies in SQL and Excel", None, ["C"]),
+    ("a personality test for sales staff", ["P"], None),
+    ("only simulations please", ["S"], None),
+    ("simulation", ["S"], None),
+    ("personality, cognitive for managers", None, ["A", "P"]),
+])
+def test_types_mentioned_in_passing_are_preferences(query, required, preferred):
+    constraints = parse_constraints(query)
+    assert constraints.test_types == required
+    assert constraints.preferred_types == preferred
+
+
+def test_preferences_alone_filter_nothing(catalog_path):
+    metadata = [catalog_metadata(row) for row in pd.read_csv(catalog_path).to_dict("records")]
+    constraints = parse_constraints("Personality and Java test for backend engineers")
+
+    assert not constraints.is_empty() and not constraints.has_filters()
+    assert AttributeIndex(metadata).mask(constraints) is None
+    assert constraints.to_pinecone_filter() is None
+    assert [constraints.prefers(m) for m in metadata] == [False, False, False, True, True, False, False, False]
+
+
+@pytest.fixture
+def clustered(serving, monkeypatch, tmp_path, catalog_path):
+    """Catalog vectors all close to one another; the query is closest to Java 8 (New)"""
+    count, dim = len(CATALOG_ROWS), 16
+    base = np.zeros(dim, dtype=np.float32)
+    base[-1] = 1.0
+    vectors = np.stack([base + 0.1 * np.eye(dim, dtype=np.float32)[i] for i in range(count)])
+    save_artifact(tmp_path / "clustered", [row[0] for row in CATALOG_ROWS], vectors, "test-model")
+    monkeypatch.setattr(recommender, "_backend", LocalBackend(tmp_path / "clustered", catalog_path))
+    monkeypatch.setattr(recommender, "LEXICAL_SEARCH", False)  # Rank by the vectors alone
+    recommender.set_embedder(lambda query: vectors[0].tolist())
+
+
+def test_mentioned_type_boosts_without_dropping_other_products(clustered):
+    names = [r["name"] for r in recommender.search_pinecone("Personality and Java test for backend engineers", 4)]
+
+    assert names[0] == "Java 8 (New)"
+    assert set(names[1:3]) == {"Occupational Personality Questionnaire OPQ32r", "Sales Representative Solution"}
+    assert len(names) == 4
+
+
+def test_filter_leaving_fewer_than_top_k_is_filled_without_it(clustered):
+    results = recommender.search_pinecone("only simulations please", 3)
+
+    assert [r["name"] for r in results][:2] == ["Customer Service Simulation", "Java 8 (New)"]
+    assert len({r["url"] for r in results}) == 3
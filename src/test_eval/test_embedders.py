@@ -0,0 +1,38 @@
+import numpy as np
+
+from src.core import recommender
+from src.core.backends import LocalBackend
+from src.core.embedders import build_local_index, load_local_embedder, local_embedder_fitted
+
+
+def test_local_embedder_ranks_the_matching_product_first(tmp_path, catalog_path):
+    embedder = build_local_index(catalog_path, tmp_path / "local", dim=8)
+    backend = LocalBackend(tmp_path / "local", catalog_path)
+
+    for query, name in [("java 8", "Java 8 (New)"), ("numerical ability", "Verify - Numerical Ability")]:
+        assert backend.query(embedder.embed(query), 1)[0]['metadata']['name'] == name
+    assert embedder.embed("zzz unknown words") == []
+
+    loaded = load_local_embedder(catalog_path, tmp_path / "local")
+    assert loaded.name == embedder.name
+    assert np.allclose(loaded.embed("java 8"), embedder.embed("java 8"))
+
+
+def test_local_embedder_is_refitted_for_a_changed_catalog(tmp_path, catalog_path):
+    build_local_index(catalog_path, tmp_path / "local", dim=4)
+    assert local_embedder_fitted(catalog_path, tmp_path / "local")
+
+    with open(catalog_path, "a") as f:
+        f.write("9,Extra,https://example.com/9,True,True,K,10\n")
+    assert not local_embedder_fitted(catalog_path, tmp_path / "local")
+    assert not local_embedder_fitted(catalog_path, tmp_path / "missing")
+
+
+def test_response_key_does_not_create_the_embedder(monkeypatch):
+    # Creating a cold local embedder fits it, which must not happen on the event loop
+    monkeypatch.setattr(recommender, "QUERY_EMBEDDER", "local")
+    monkeypatch.setattr(recommender, "_embedder", None)
+    monkeypatch.setattr(recommender, "get_local_embedder", lambda: (_ for _ in ()).throw(AssertionError("fitted")))
+
+    assert recommender.response_key("Java developer", 3) is not None
+    assert recommender._embedder is None
@@ -0,0 +1,76 @@
+import pytest
+
+from src.core import embedding_cache as cache_module
+from src.core.embedding_cache import EmbeddingCache
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+def test_hit_is_keyed_by_normalized_query_and_model(clock):
+    cache = EmbeddingCache()
+    cache.set("Java  Developer", "model-a", [1.0, 2.0])
+
+    assert cache.get("java developer", "model-a") == [1.0, 2.0]
+    assert cache.get("java developer", "model-b") is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = EmbeddingCache(ttl=60)
+    cache.set("query", "model", [1.0])
+
+    clock.now += 59
+    assert cache.get("query", "model") == [1.0]
+    clock.now += 2
+    assert cache.get("query", "model") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = EmbeddingCache(max_size=2)
+    cache.set("a", "model", [1.0])
+    cache.set("b", "model", [2.0])
+    cache.get("a", "model")
+    cache.set("c", "model", [3.0])
+
+    assert cache.get("b", "model") is None
+    assert cache.get("a", "model") == [1.0] and cache.get("c", "model") == [3.0]
+
+
+def test_disk_tier_outlives_the_process_cache_but_not_the_ttl(clock, tmp_path):
+    path = str(tmp_path / "embeddings.sqlite")
+    EmbeddingCache(ttl=60, disk_path=path).set("query", "model", [0.5, 0.25])
+
+    restarted = EmbeddingCache(ttl=60, disk_path=path)
+    assert restarted.get("query", "model") == [0.5, 0.25]
+    assert restarted.stats()["disk_hits"] == 1
+
+    clock.now += 61
+    assert EmbeddingCache(ttl=60, disk_path=path).get("query", "model") is None
+
+
+def test_disk_tier_deletes_expired_rows_and_keeps_the_newest(clock, tmp_path, monkeypatch):
+    monkeypatch.setattr(EmbeddingCache, "EVICT_EVERY", 2)
+    cache = EmbeddingCache(max_size=1, ttl=60, disk_path=str(tmp_path / "embeddings.sqlite"), disk_max_size=3)
+    for i in range(4):
+        clock.now += 1
+        cache.set(f"query {i}", "model", [float(i)])
+    assert cache.disk_size() == 3  # The oldest row is evicted past disk_max_size
+
+    clock.now += 61
+    cache.set("fresh", "model", [9.0])
+    cache.set("newer", "model", [10.0])
+    assert cache.disk_size() == 2  # Every expired row is gone, not just skipped on read
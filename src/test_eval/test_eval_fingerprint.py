@@ -0,0 +1,34 @@
+from src.core import recommender
+from src.core.artifact import save_artifact
+from src.core.versions import publish
+from src.test_eval.conftest import CATALOG_ROWS, random_vectors, write_catalog
+from src.test_eval.eval import retrieval_fingerprint
+
+
+def publish_build(root, tmp_path, catalog_path, seed):
+    build = tmp_path / f"build-{seed}"
+    save_artifact(build, [row[0] for row in CATALOG_ROWS], random_vectors(len(CATALOG_ROWS), seed=seed), "test-model")
+    return publish(root, build, catalog_path)
+
+
+def serve_current(monkeypatch, root):
+    """Resolve the versioned root afresh, as a new eval process would"""
+    monkeypatch.setattr(recommender, "_index_resolved", False)
+    monkeypatch.setattr(recommender.response_cache, "index_dir", root)
+    return retrieval_fingerprint(3)
+
+
+def test_fingerprint_follows_the_published_version_and_its_catalog(serving, monkeypatch, tmp_path, catalog_path):
+    root = tmp_path / "root"
+    monkeypatch.setattr(recommender, "INDEX_DIR", root)
+    publish_build(root, tmp_path, catalog_path, 1)
+    first = serve_current(monkeypatch, root)
+    assert serve_current(monkeypatch, root) == first
+
+    publish_build(root, tmp_path, catalog_path, 2)
+    second = serve_current(monkeypatch, root)
+    assert second != first
+
+    # The same build published again with a re-scraped catalog
+    publish(root, tmp_path / "build-2", write_catalog(tmp_path / "rescraped.csv", CATALOG_ROWS[:-1]))
+    assert serve_current(monkeypatch, root) not in (first, second)
@@ -0,0 +1,60 @@
+import pandas as pd
+import pytest
+
+from src.core import recommender
+from src.core.backends import LocalBackend
+from src.core.catalog import CatalogColumns
+from src.core.lexical import LexicalIndex, reciprocal_rank_fusion
+
+
+@pytest.fixture
+def lexical(catalog_path):
+    return LexicalIndex(pd.read_csv(catalog_path))
+
+
+def names(lexical, rows):
+    return [lexical.metadata[row]["name"] for row in rows]
+
+
+def test_exact_name_ignores_case_order_punctuation_and_new(lexical):
+    assert names(lexical, lexical.exact_matches("java 8")) == ["Java 8 (New)"]
+    assert names(lexical, lexical.exact_matches("numerical ability - VERIFY")) == ["Verify - Numerical Ability"]
+    assert lexical.exact_matches("java") == []
+    assert lexical.exact_matches("the") == []  # Only stopwords
+
+
+def test_bm25_ranks_the_named_product_first(lexical):
+    hits = lexical.search("core java advanced", 5)
+    assert names(lexical, [row for row, _ in hits])[:2] == ["Core Java (Advanced Level) (New)", "Java 8 (New)"]
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_test_type_names_are_searchable(lexical):
+    hits = lexical.search("personality", 5)
+    assert set(names(lexical, [row for row, _ in hits])) == {
+        "Occupational Personality Questionnaire OPQ32r", "Sales Representative Solution"
+    }
+
+
+def test_normalized_fusion_scores():
+    fused = reciprocal_rank_fusion([["a", "b"], ["a", "c"]], normalize=True)
+    assert fused["a"] == pytest.approx(1.0)
+    assert fused["b"] == fused["c"] < 0.5
+
+
+def test_fused_results_report_scores_in_result_order(monkeypatch, catalog_path, index_dir, lexical):
+    monkeypatch.setattr(recommender, "_backend", LocalBackend(index_dir, catalog_path))
+    monkeypatch.setattr(recommender, "_catalog", CatalogColumns.from_csv(catalog_path))
+    monkeypatch.setattr(recommender, "_lexical", lexical)
+    monkeypatch.setattr(recommender, "LEXICAL_SEARCH", True)
+
+    # The vector ranking puts Java 8 second; BM25 puts it first
+    matches = [{'id': '3', 'score': 0.9, 'metadata': {}}, {'id': '1', 'score': 0.85, 'metadata': {}},
+               {'id': '2', 'score': 0.8, 'metadata': {}}]
+    fused = recommender.fuse_lexical("java 8 test", [1.0] * 32, matches, 9)
+    results = recommender.format_matches(fused, 3)
+
+    assert results[0]['name'] == "Java 8 (New)"
+    scores = [r['score'] for r in results]
+    assert scores == sorted(scores, reverse=True)
+    assert all(0 < score <= 1 for score in scores)
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from src.core.artifact import save_artifact
+from src.core.backends import LocalBackend
+from src.core.constraints import QueryConstraints
+from src.test_eval.conftest import CATALOG_ROWS, random_vectors
+
+ROWS = 3000
+DIM = 64
+
+
+@pytest.fixture
+def large_index(tmp_path):
+    """Catalog rows first, then rows without catalog metadata, like a bigger index"""
+    directory = tmp_path / "large"
+    ids = [row[0] for row in CATALOG_ROWS] + [f"x{i}" for i in range(ROWS - len(CATALOG_ROWS))]
+    vectors = random_vectors(ROWS, DIM, seed=1)
+    save_artifact(directory, ids, vectors, "test-model")
+    return directory, ids, vectors
+
+
+def queries(vectors, count=20, seed=2):
+    """Noisy copies of random rows, so each query has clear near neighbours"""
+    rng = np.random.default_rng(seed)
+    picks = vectors[rng.choice(len(vectors), count, replace=False)]
+    return picks + 0.5 * random_vectors(count, vectors.shape[1], seed=seed)
+
+
+def exact_top(vectors, q, k):
+    scores = vectors @ (q / np.linalg.norm(q))
+    return list(np.argsort(-scores)[:k]), scores
+
+
+def test_top_k_matches_brute_force(large_index, catalog_path):
+    directory, ids, vectors = large_index
+    backend = LocalBackend(directory, catalog_path)
+
+    for q in queries(vectors):
+        expected, scores = exact_top(vectors, q, 10)
+        matches = backend.query(q.tolist(), 10)
+        assert [m['id'] for m in matches] == [ids[i] for i in expected]
+        assert [m['score'] for m in matches] == pytest.approx([scores[i] for i in expected], abs=1e-5)
+
+
+def test_batch_matches_single_queries(large_index, catalog_path):
+    directory, _, vectors = large_index
+    backend = LocalBackend(directory, catalog_path)
+    batch = queries(vectors, 5).tolist()
+    for batched, q in zip(backend.query_batch(batch, 7), batch):
+        single = backend.query(q, 7)
+        assert [m['id'] for m in batched] == [m['id'] for m in single]
+        assert [m['score'] for m in batched] == pytest.approx([m['score'] for m in single], abs=1e-5)
+    assert backend.query([0.0] * DIM, 3) == []
+
+
+def test_constraints_filter_before_scoring(index_dir, catalog_path):
+    backend = LocalBackend(index_dir, catalog_path)
+    constraints = QueryConstraints(remote=True, test_types=["K"])
+    matches = backend.query(random_vectors(1, 32, seed=5)[0].tolist(), 10, constraints)
+    assert sorted(m['metadata']['name'] for m in matches) == [
+        "Core Java (Advanced Level) (New)", "Java 8 (New)", "Python (New)"
+    ]
+
+
+@pytest.mark.parametrize("kind", ["int8", "float16"])
+def test_quantized_search_agrees_with_exact(large_index, catalog_path, kind):
+    directory, ids, vectors = large_index
+    exact = LocalBackend(directory, catalog_path)
+    quantized = LocalBackend(directory, catalog_path, quantization=kind)
+    assert quantized.quantized is not None
+
+    overlap = []
+    for q in queries(vectors):
+        expected = {m['id']: m['score'] for m in exact.query(q.tolist(), 10)}
+        found = quantized.query(q.tolist(), 10)
+        overlap.append(len(expected.keys() & {m['id'] for m in found}) / 10)
+        # Shortlisted rows are re-ranked in float32, so shared ids have exact scores
+        for m in found:
+            if m['id'] in expected:
+                assert m['score'] == pytest.approx(expected[m['id']], abs=1e-6)
+    assert np.mean(overlap) >= 0.95
+
+
+def test_quantization_needs_a_memory_mapped_artifact(tmp_path, catalog_path):
+    # Legacy embeddings.npy: the float32 matrix is already in memory, so a quantized copy would add to it
+    embeddings = np.empty(len(CATALOG_ROWS), dtype=object)
+    embeddings[:] = list(random_vectors(len(CATALOG_ROWS), 16))
+    np.save(tmp_path / "embeddings.npy", embeddings, allow_pickle=True)
+
+    backend = LocalBackend(tmp_path / "missing", catalog_path, tmp_path / "embeddings.npy", quantization="int8")
+    assert backend.quantized is None
+    assert len(backend.query(random_vectors(1, 16)[0].tolist(), 3)) == 3
+
+
+def test_quantization_is_skipped_with_ivf(large_index, catalog_path):
+    directory, _, _ = large_index
+    backend = LocalBackend(directory, catalog_path, quantization="int8", ann="ivf")
+    assert backend.quantized is None and backend.ivf is not None
+
+
+def clustered_vectors(count, dim=DIM, seed=3):
+    from src.test_eval.ann_benchmark import synthetic_vectors
+    return synthetic_vectors(count, dim, 40, np.random.default_rng(seed), spread=0.5)
+
+
+def test_ivf_search_agrees_with_exact(tmp_path, catalog_path):
+    vectors = clustered_vectors(ROWS)
+    ids = [str(i) for i in range(ROWS)]
+    save_artifact(tmp_path / "ivf", ids, vectors, "test-model")
+    exact = LocalBackend(tmp_path / "ivf", catalog_path)
+    approximate = LocalBackend(tmp_path / "ivf", catalog_path, ann="ivf")
+
+    recall = []
+    for q in queries(vectors):
+        expected = {m['id'] for m in exact.query(q.tolist(), 10)}
+        found = approximate.query(q.tolist(), 10)
+        recall.append(len(expected & {m['id'] for m in found}) / 10)
+    assert np.mean(recall) >= 0.9
+
+
+def test_new_build_applies_its_change_set_to_the_parent_ivf_index(tmp_path, catalog_path):
+    from src.core.artifact import load_artifact, save_changes
+    from src.core.ivf import IVFIndex, artifact_vectors
+    from src.core.versions import publish, staging_dir
+
+    root = tmp_path / "root"
+    vectors = clustered_vectors(ROWS + 1)
+    ids = [str(i) for i in range(ROWS)]
+    build = staging_dir(root)
+    save_artifact(build, ids, vectors[:ROWS], "test-model")
+    parent = root / "versions" / publish(root, build)
+    parent_artifact = load_artifact(parent)
+    parent_index = IVFIndex.build(artifact_vectors(parent_artifact), ids,
+                                  build_id=parent_artifact.manifest["build_id"])
+    parent_index.save(parent)
+
+    # Next build: row 0 deleted, row 1 updated, "new" added
+    new_ids = ids[1:] + ["new"]
+    new_vectors = np.vstack([-vectors[1:2], vectors[2:ROWS], vectors[ROWS:]])
+    build = staging_dir(root)
+    save_artifact(build, new_ids, new_vectors, "test-model")
+    save_changes(build, ["new"], ["1"], ["0"], parent_build_id=parent_artifact.manifest["build_id"])
+    child = root / "versions" / publish(root, build)
+
+    backend = LocalBackend(child, catalog_path, ann="ivf")
+    assert backend.ivf.inserted == 2
+    # Unchanged rows keep the parent's clusters
+    assert np.array_equal(backend.ivf.assign[1:-1], parent_index.assign[2:])
+
+    assert backend.query(vectors[ROWS].tolist(), 1)[0]['id'] == "new"
+    assert backend.query((-vectors[1]).tolist(), 1)[0]['id'] == "1"
+    assert "0" not in {m['id'] for m in backend.query(vectors[0].tolist(), 10)}
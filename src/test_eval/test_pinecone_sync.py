@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+
+from src.core.artifact import load_artifact, save_changes
+from src.test_eval.stubs import InMemoryIndex
+from src.utils.pinecone_utils import (
+    applicable_changes, load_synced_build, save_synced_build, sync_index
+)
+
+
+def test_full_sync_upserts_everything_in_chunks_and_deletes_stale_ids(index_dir, catalog_path):
+    artifact = load_artifact(index_dir)
+    index = InMemoryIndex(max_request_vectors=3)
+    index.upsert([("stale", [1.0] * artifact.vectors.shape[1], {})])
+
+    summary = sync_index(index, artifact, pd.read_csv(catalog_path), chunk_size=3, workers=2)
+
+    assert summary == {"upserted": len(artifact.ids), "deleted": 1, "failed_chunks": 0}
+    assert set(index.vectors) == {str(i) for i in artifact.ids}
+    values, metadata = index.vectors["1"]
+    assert np.allclose(values, artifact.vectors[0])
+    assert metadata["name"] == "Java 8 (New)"
+
+
+def test_change_set_sync_touches_only_changed_ids(index_dir, catalog_path):
+    artifact = load_artifact(index_dir)
+    catalog = pd.read_csv(catalog_path)
+    index = InMemoryIndex()
+    sync_index(index, artifact, catalog)
+    index.upsert([("gone", [1.0] * artifact.vectors.shape[1], {})])
+    index.requests = 0
+
+    changes = {"added": ["2"], "updated": ["3"], "deleted": ["gone"]}
+    summary = sync_index(index, artifact, catalog, changes)
+
+    assert summary == {"upserted": 2, "deleted": 1, "failed_chunks": 0}
+    assert "gone" not in index.vectors
+    assert index.requests == 2  # One upsert and one delete request
+
+
+def test_change_set_applies_only_on_top_of_its_parent_build(index_dir):
+    build_id = load_artifact(index_dir).manifest["build_id"]
+    save_changes(index_dir, ["2"], [], [], parent_build_id="parent")
+
+    assert applicable_changes(index_dir, "parent")["added"] == ["2"]
+    # Pinecone is at an older build (or unknown): the change set would miss earlier diffs
+    assert applicable_changes(index_dir, "older") is None
+    assert applicable_changes(index_dir, None) is None
+
+    save_synced_build(index_dir.parent, "catalog", build_id)
+    assert load_synced_build(index_dir.parent, "catalog") == build_id
+    assert load_synced_build(index_dir.parent, "other") is None
@@ -0,0 +1,86 @@
+import pytest
+
+from src.core import response_cache as cache_module
+from src.core.artifact import save_artifact
+from src.core.response_cache import MemoryResponseStore, ResponseCache, SQLiteResponseStore
+from src.test_eval.conftest import CATALOG_ROWS, random_vectors
+
+RESULTS = [{"name": "Java 8 (New)", "url": "https://example.com/1", "score": 0.9}]
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache_module.time, "time", clock)
+    return clock
+
+
+@pytest.mark.parametrize("store", ["memory", "sqlite"])
+def test_entries_expire_after_ttl(clock, tmp_path, store):
+    store = MemoryResponseStore(ttl=60) if store == "memory" else SQLiteResponseStore(str(tmp_path / "r.db"), ttl=60)
+    store.set("key", RESULTS)
+
+    clock.now += 59
+    assert store.get("key") == RESULTS
+    clock.now += 2
+    assert store.get("key") is None
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = MemoryResponseStore(max_size=2)
+    store.set("a", [])
+    store.set("b", [])
+    store.get("a")
+    store.set("c", [])
+    assert store.get("b") is None and store.get("a") == []
+
+
+def test_shared_hit_fills_the_local_tier(tmp_path):
+    shared = SQLiteResponseStore(str(tmp_path / "r.db"))
+    shared.set("key", RESULTS)
+    cache = ResponseCache(MemoryResponseStore(), shared, index_dir=tmp_path / "none")
+
+    assert cache.get("key") == RESULTS
+    assert cache.local.get("key") == RESULTS
+
+
+@pytest.fixture
+def always_recheck(monkeypatch):
+    monkeypatch.setattr(cache_module, "VERSION_CHECK_INTERVAL", 0)
+
+
+def test_rebuilding_the_index_or_catalog_changes_every_key(always_recheck, index_dir, catalog_path):
+    cache = ResponseCache(MemoryResponseStore(), index_dir=index_dir, catalog_path=catalog_path)
+    key = cache.make_key("Java developer", 3)
+    assert cache.make_key("  JAVA   developer ", 3) == key
+    assert cache.make_key("Java developer", 5) != key
+    assert cache.make_key("Java developer", 3, "remote=True") != key
+
+    ids = [row[0] for row in CATALOG_ROWS]
+    save_artifact(index_dir, ids, random_vectors(len(ids), seed=9), "test-model")
+    rebuilt = cache.make_key("Java developer", 3)
+    assert rebuilt != key
+
+    with open(catalog_path, "a") as f:
+        f.write("9,Extra,https://example.com/9,True,True,K,10\n")
+    assert cache.make_key("Java developer", 3) != rebuilt
+
+
+def test_version_is_reread_only_after_the_check_interval(monkeypatch, index_dir, catalog_path):
+    monkeypatch.setattr(cache_module, "VERSION_CHECK_INTERVAL", 3600)
+    cache = ResponseCache(MemoryResponseStore(), index_dir=index_dir, catalog_path=catalog_path)
+    key = cache.make_key("query", 3)
+
+    ids = [row[0] for row in CATALOG_ROWS]
+    save_artifact(index_dir, ids, random_vectors(len(ids), seed=9), "test-model")
+    assert cache.make_key("query", 3) == key
+    cache.invalidate_version()
+    assert cache.make_key("query", 3) != key
@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+
+from src.core import recommender, versions
+from src.core.artifact import load_artifact, save_artifact
+from src.core.versions import (
+    Lease, collect_garbage, current_version, list_versions, live_leases, publish, version_catalog, version_dir
+)
+from src.test_eval.conftest import CATALOG_ROWS, random_vectors
+
+
+@pytest.fixture
+def root(tmp_path, monkeypatch):
+    # Version names sort by their creation second; give each publish its own
+    seconds = iter(range(1_700_000_000, 1_700_001_000))
+    real_gmtime = time.gmtime
+    monkeypatch.setattr(versions.time, "gmtime", lambda *args: real_gmtime(*args) if args else real_gmtime(next(seconds)))
+    return tmp_path / "root"
+
+
+def publish_build(root, tmp_path, catalog_path, seed):
+    build = tmp_path / f"build-{seed}"
+    save_artifact(build, [row[0] for row in CATALOG_ROWS], random_vectors(len(CATALOG_ROWS), seed=seed), "test-model")
+    return publish(root, build, catalog_path)
+
+
+def test_publish_switches_current_to_a_complete_copy(root, tmp_path, catalog_path):
+    first = publish_build(root, tmp_path, catalog_path, 1)
+    second = publish_build(root, tmp_path, catalog_path, 2)
+
+    assert current_version(root) == second
+    assert list_versions(root) == [first, second]
+    assert version_catalog(version_dir(root, second), tmp_path / "missing.csv").read_text() == catalog_path.read_text()
+    assert len(load_artifact(version_dir(root, second)).ids) == len(CATALOG_ROWS)
+    assert not [p for p in (root / "versions").iterdir() if p.name.startswith(".")]
+
+
+def test_gc_keeps_current_newest_and_leased_versions(root, tmp_path, catalog_path):
+    first, second, third = (publish_build(root, tmp_path, catalog_path, seed) for seed in (1, 2, 3))
+    lease = Lease(root, first)
+
+    assert collect_garbage(root, keep=1) == [second]
+    assert live_leases(root) == {first: [lease.path.name]}
+
+    lease.release()
+    assert collect_garbage(root, keep=1) == [first]
+    assert list_versions(root) == [third]
+
+
+def test_lease_of_a_dead_process_is_removed(root, tmp_path, catalog_path):
+    version = publish_build(root, tmp_path, catalog_path, 1)
+    dead = root / "leases" / version / f"{versions.socket.gethostname()}.999999999"
+    dead.parent.mkdir(parents=True)
+    dead.touch()
+
+    assert live_leases(root) == {}
+    assert not dead.exists()
+
+
+def test_lease_from_another_host_expires_without_renewal(root, tmp_path, catalog_path):
+    first = publish_build(root, tmp_path, catalog_path, 1)
+    publish_build(root, tmp_path, catalog_path, 2)
+    foreign = root / "leases" / first / "other-host.42"
+    foreign.parent.mkdir(parents=True)
+    foreign.touch()
+
+    assert collect_garbage(root, keep=1) == []
+
+    stale = time.time() - versions.LEASE_TTL - 1
+    os.utime(foreign, (stale, stale))
+    assert collect_garbage(root, keep=1) == [first]
+    assert not foreign.exists()
+
+
+def test_held_lease_is_renewed_in_the_background(root):
+    lease = Lease(root, "v1", ttl=0.3)
+    os.utime(lease.path, (0, 0))
+    time.sleep(0.25)
+
+    assert lease.path.stat().st_mtime > time.time() - 1
+    lease.release()
+    assert not lease.path.exists()
+
+
+def test_swap_serves_the_new_version_and_rekeys_the_response_cache(serving, monkeypatch, root, tmp_path,
+                                                                   catalog_path):
+    first = publish_build(root, tmp_path, catalog_path, 1)
+    monkeypatch.setattr(recommender, "INDEX_DIR", root)
+    monkeypatch.setattr(recommender.response_cache, "index_dir", root)
+    monkeypatch.setattr(recommender, "RETRIEVAL_BACKEND", "local")
+    monkeypatch.setattr(recommender, "QUERY_EMBEDDER", "gemini")
+    assert recommender.serving_index_dir() == version_dir(root, first)
+    key = recommender.response_cache.make_key("java", 3)
+
+    second = publish_build(root, tmp_path, catalog_path, 2)
+    recommender.swap_index(second)
+    try:
+        assert recommender._index_version == second
+        assert live_leases(root) == {second: [recommender._index_lease.path.name]}
+        assert recommender.response_cache.make_key("java", 3) != key
+    finally:
+        recommender._index_lease.release()
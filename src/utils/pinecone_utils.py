@@ -1,9 +1,20 @@
-from pinecone import Pinecone, ServerlessSpec
 import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from dotenv import load_dotenv
-import numpy as np
 import pandas as pd
-import time
+from tenacity import retry, stop_after_attempt, wait_exponential
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.core.artifact import INDEX_DIR, IndexArtifact, load_artifact, load_changes
+from src.core.versions import resolve_index_dir, version_catalog
+from src.core.backends import CATALOG_PATH, catalog_metadata
 
 # Load env variables
 load_dotenv()
@@ -11,51 +22,197 @@ PINECONE_API_KEY = os.getenv("PINECONE_API_KEY")
 PINECONE_INDEX_NAME = os.getenv("PINECONE_INDEX_NAME")
 PINECONE_DIM = int(os.getenv("PINECONE_DIM", 768))
 
-if not all([PINECONE_API_KEY, PINECONE_INDEX_NAME]):
-    raise ValueError("Missing required Pinecone environment variables.")
-
-# Init Pinecone (v3+ style)
-pc = Pinecone(api_key=PINECONE_API_KEY)
-
-# Create index if it doesn't exist
-if PINECONE_INDEX_NAME not in pc.list_indexes().names():
-    pc.create_index(
-        name=PINECONE_INDEX_NAME,
-        dimension=PINECONE_DIM,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")  # serverless region!
-    )
-    # Optional wait loop
-    while True:
-        status = pc.describe_index(PINECONE_INDEX_NAME).status
-        if status['ready']:
-            break
-        print("Waiting for Pinecone index to be ready...")
-        time.sleep(2)
-
-# Connect to the index
-index = pc.Index(PINECONE_INDEX_NAME)
-
-# Load data
-df = pd.read_csv("app/data/embeddings.csv")
-embeddings = np.load("app/data/embeddings.npy", allow_pickle=True)
-
-# Format vectors for upsert
-to_upsert = [
-    (
-        str(row["id"]),
-        embedding.tolist(),
-        {
-            "name": row["assessment_name"],
-            "url": row["url"],
-            "remote": row["remote_testing"],
-            "irt": row["adaptive_irt_support"],
-            "type": row["test_type"]
+# Pinecone caps upserts at 1000 vectors and 2 MB per request
+CHUNK_SIZE = int(os.getenv("PINECONE_CHUNK_SIZE", 100))
+MAX_REQUEST_BYTES = int(os.getenv("PINECONE_MAX_REQUEST_BYTES", 2 * 1024 * 1024))
+SYNC_WORKERS = int(os.getenv("PINECONE_SYNC_WORKERS", 4))
+
+# Build id last synced to each Pinecone index, kept in the index root
+SYNC_STATE_FILE = ".pinecone_sync.json"
+
+Vector = Tuple[str, List[float], Dict[str, Any]]
+
+
+def get_index():
+    """Connect to the Pinecone index, creating it if it doesn't exist"""
+    from pinecone import Pinecone, ServerlessSpec
+
+    if not all([PINECONE_API_KEY, PINECONE_INDEX_NAME]):
+        raise ValueError("Missing required Pinecone environment variables.")
+
+    # Init Pinecone (v3+ style)
+    pc = Pinecone(api_key=PINECONE_API_KEY)
+
+    # Create index if it doesn't exist
+    if PINECONE_INDEX_NAME not in pc.list_indexes().names():
+        pc.create_index(
+            name=PINECONE_INDEX_NAME,
+            dimension=PINECONE_DIM,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")  # serverless region!
+        )
+        # Optional wait loop
+        while True:
+            status = pc.describe_index(PINECONE_INDEX_NAME).status
+            if status['ready']:
+                break
+            print("Waiting for Pinecone index to be ready...")
+            time.sleep(2)
+
+    return pc.Index(PINECONE_INDEX_NAME)
+
+
+def build_vectors(artifact: IndexArtifact, catalog: pd.DataFrame,
+                  only_ids: Optional[set] = None) -> List[Vector]:
+    """(id, values, metadata) tuples for every artifact row that is in the catalog"""
+    rows_by_id = {str(row["id"]): row for row in catalog.to_dict("records")}
+    vectors = []
+    for row_id, embedding in zip(artifact.ids, artifact.vectors):
+        row_id = str(row_id)
+        row = rows_by_id.get(row_id)
+        if row is None or (only_ids is not None and row_id not in only_ids):
+            continue
+        vectors.append((row_id, embedding.tolist(), catalog_metadata(row)))
+    return vectors
+
+
+def vector_size(vector: Vector) -> int:
+    """Rough serialized size of one vector in an upsert request"""
+    row_id, values, metadata = vector
+    return len(row_id) + 12 * len(values) + len(json.dumps(metadata, default=str)) + 32
+
+
+def chunk_vectors(vectors: List[Vector], chunk_size: int = CHUNK_SIZE,
+                  max_bytes: int = MAX_REQUEST_BYTES) -> Iterator[List[Vector]]:
+    """Split vectors into upsert requests bounded by both count and payload size"""
+    chunk, chunk_bytes = [], 0
+    for vector in vectors:
+        size = vector_size(vector)
+        if chunk and (len(chunk) >= chunk_size or chunk_bytes + size > max_bytes):
+            yield chunk
+            chunk, chunk_bytes = [], 0
+        chunk.append(vector)
+        chunk_bytes += size
+    if chunk:
+        yield chunk
+
+
+@retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=0.5, min=0.5, max=8), reraise=True)
+def upsert_chunk(index, chunk: List[Vector]) -> int:
+    index.upsert(vectors=chunk)
+    return len(chunk)
+
+
+@retry(stop=stop_after_attempt(4), wait=wait_exponential(multiplier=0.5, min=0.5, max=8), reraise=True)
+def delete_chunk(index, ids: List[str]) -> int:
+    index.delete(ids=ids)
+    return len(ids)
+
+
+def list_index_ids(index) -> set:
+    """Every vector id currently in the index"""
+    ids = set()
+    for page in index.list():
+        ids.update(page)
+    return ids
+
+
+def load_synced_build(root: Path, index_name: str) -> Optional[str]:
+    """Build id of the artifact last fully synced to index_name, if recorded"""
+    path = Path(root) / SYNC_STATE_FILE
+    if not path.exists():
+        return None
+    return json.loads(path.read_text()).get(index_name, {}).get("build_id")
+
+
+def save_synced_build(root: Path, index_name: str, build_id: str) -> None:
+    path = Path(root) / SYNC_STATE_FILE
+    state = json.loads(path.read_text()) if path.exists() else {}
+    state[index_name] = {"build_id": build_id, "synced": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())}
+    tmp = Path(root) / f".{SYNC_STATE_FILE}.tmp"
+    tmp.write_text(json.dumps(state, indent=2))
+    os.replace(tmp, path)
+
+
+def applicable_changes(index_dir: Path, synced_build_id: Optional[str]) -> Optional[Dict[str, Any]]:
+    """The current build's change set if the index is at the build it was diffed against, else None.
+
+    Builds made without a sync in between each diff against their own
+    parent, so applying only the latest one would lose the earlier ones.
+    """
+    changes = load_changes(index_dir)
+    if changes is None or synced_build_id is None or changes.get("parent_build_id") != synced_build_id:
+        return None
+    return changes
+
+
+def sync_index(index, artifact: IndexArtifact, catalog: pd.DataFrame,
+               changes: Optional[Dict[str, List[str]]] = None, workers: int = SYNC_WORKERS,
+               chunk_size: int = CHUNK_SIZE, max_bytes: int = MAX_REQUEST_BYTES) -> Dict[str, int]:
+    """Bring the vector index in line with the artifact.
+
+    With a change set only added/updated ids are upserted and deleted ids
+    removed. Without one every vector is upserted and any id in the index
+    that is no longer in the artifact is deleted.
+    """
+    if changes is not None:
+        vectors = build_vectors(artifact, catalog, set(changes["added"]) | set(changes["updated"]))
+        stale = list(changes["deleted"])
+    else:
+        vectors = build_vectors(artifact, catalog)
+        stale = sorted(list_index_ids(index) - {v[0] for v in vectors})
+
+    summary = {"upserted": 0, "deleted": 0, "failed_chunks": 0}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(upsert_chunk, index, chunk): "upserted"
+            for chunk in chunk_vectors(vectors, chunk_size, max_bytes)
         }
-    )
-    for row, embedding in zip(df.to_dict("records"), embeddings)
-]
+        futures.update({
+            pool.submit(delete_chunk, index, stale[i:i + chunk_size]): "deleted"
+            for i in range(0, len(stale), chunk_size)
+        })
+        for future in as_completed(futures):
+            try:
+                summary[futures[future]] += future.result()
+            except Exception as e:
+                print(f"❌ Failed to sync chunk: {str(e)}")
+                summary["failed_chunks"] += 1
+
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sync the index artifact to Pinecone")
+    parser.add_argument("--index-dir", default=str(INDEX_DIR))
+    parser.add_argument("--catalog", default=None,
+                        help="Catalog to take metadata from (default: the one published with the version)")
+    parser.add_argument("--full", action="store_true", help="Upsert everything and delete stale ids")
+    parser.add_argument("--workers", type=int, default=SYNC_WORKERS)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    root = Path(args.index_dir)
+    index_dir = resolve_index_dir(root)  # Current version of a versioned root
+    artifact = load_artifact(index_dir)
+    build_id = artifact.manifest.get("build_id")
+    synced = load_synced_build(root, PINECONE_INDEX_NAME)
+    if synced == build_id and not args.full:
+        print(f"✅ Pinecone is already at build {build_id}")
+        sys.exit(0)
+
+    # The catalog snapshot the build was made from, so rows re-scraped since can't
+    # be skipped on upsert (or deleted as stale in a full sync)
+    catalog = pd.read_csv(args.catalog or version_catalog(index_dir, CATALOG_PATH))
+    changes = None if args.full else applicable_changes(index_dir, synced)
+    if changes is None and not args.full:
+        print("No change set from the last synced build; running a full sync")
 
-# Upsert to Pinecone
-index.upsert(vectors=to_upsert)
-print(f"✅ Upserted {len(to_upsert)} vectors to Pinecone.")
+    summary = sync_index(get_index(), artifact, catalog, changes,
+                         workers=args.workers, chunk_size=args.chunk_size)
+    print(f"✅ Upserted {summary['upserted']} and deleted {summary['deleted']} vectors in Pinecone.")
+    if summary["failed_chunks"]:
+        # The build isn't recorded as synced, so the next run does a full sync
+        print(f"⚠️  {summary['failed_chunks']} chunks failed; the next run will reconcile with a full sync")
+        sys.exit(1)
+    save_synced_build(root, PINECONE_INDEX_NAME, build_id)
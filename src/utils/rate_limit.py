@@ -0,0 +1,28 @@
+import threading
+import time
+
+
+class RateLimiter:
+    """Thread-safe token bucket shared by every worker that calls a rate-limited service"""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate  # tokens per second; 0 or less disables limiting
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Block until a token is available"""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
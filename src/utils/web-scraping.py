@@ -6,12 +6,35 @@ from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import NoSuchElementException, TimeoutException, WebDriverException
 import pandas as pd
+import requests
 import time
+import os
+import json
+import hashlib
+import argparse
+import threading
+from html.parser import HTMLParser
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from webdriver_manager.chrome import ChromeDriverManager
 import logging
 import sys
 from urllib3.exceptions import MaxRetryError
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional, Callable
+
+sys.path.append(str(Path(__file__).parent.parent.parent))
+
+from src.core.artifact import DATA_DIR
+from src.utils.rate_limit import RateLimiter
+
+BASE_URL = "https://www.shl.com/products/product-catalog/"
+OUTPUT_FILE = DATA_DIR / "product_catalog.csv"
+PAGE_CACHE_DIR = DATA_DIR / ".page_cache"
+PAGE_SIZE = 12
 
 logging.basicConfig(
     level=logging.INFO,
@@ -65,10 +88,13 @@ def clean_text(text: str) -> str:
     return cleaned
 
 def get_yes_no_status(row, position) -> bool:
-    """Check status in specific table column and return boolean"""
+    """Check status in the position-th (1-based) general table column and return boolean"""
+    # nth-of-type counts every td, including the title cell, so pick the column by index instead
+    cells = row.find_elements(By.CSS_SELECTOR, "td.custom__table-heading__general")
+    if len(cells) < position:
+        return False
     try:
-        row.find_element(By.CSS_SELECTOR, 
-            f"td.custom__table-heading__general:nth-of-type({position}) .catalogue__circle.-yes")
+        cells[position - 1].find_element(By.CSS_SELECTOR, ".catalogue__circle.-yes")
         return True
     except NoSuchElementException:
         return False
@@ -106,13 +132,19 @@ def clean_product_data(data: Dict[str, Any]) -> Dict[str, Any]:
         "id": data["ID"]
     }
 
-def scrape_page(driver, url, page_num):
+def page_url(base_url: str, page: int) -> str:
+    """Catalog pages are addressable directly by their offset"""
+    return f"{base_url}?start={(page-1)*PAGE_SIZE}" if page > 1 else base_url
+
+def scrape_page(driver, url, page_num, limiter: Optional[RateLimiter] = None):
     """Scrape a single page with error handling"""
     products = []
     max_retries = 3
     
     for attempt in range(max_retries):
         try:
+            if limiter:
+                limiter.acquire()
             driver.get(url)
             # Wait for either table format to appear
             wait_for_element(driver, By.CSS_SELECTOR, "div.custom__table-responsive table")
@@ -149,11 +181,56 @@ def scrape_page(driver, url, page_num):
             logging.warning(f"Retrying page {page_num}. Attempt {attempt + 1} of {max_retries}")
             time.sleep(5)  # Wait before retry
 
-def scrape_all_shl_products():
+def get_last_page(driver) -> Optional[int]:
+    """Highest page number in the pagination bar, if the page shows one"""
+    try:
+        labels = [clean_text(link.text) for link in driver.find_elements(
+            By.CSS_SELECTOR, "li.pagination__item a")]
+        numbers = [int(label) for label in labels if label.isdigit()]
+        return max(numbers) if numbers else None
+    except WebDriverException:
+        return None
+
+def build_catalog_dataframe(products: List[Dict[str, Any]]) -> Optional[pd.DataFrame]:
+    """Type, de-duplicate and order scraped products into the catalog layout"""
+    df = pd.DataFrame(products)
+    if df.empty:
+        return None
+
+    # Ensure proper data types
+    df = df.astype({
+        'page': 'int32',
+        'assessment_name': 'string',
+        'url': 'string',
+        'remote_testing': 'bool',
+        'adaptive_irt_support': 'bool',
+        'test_type': 'string',
+        'id': 'string'
+    })
+
+    df = df.drop_duplicates(subset=["id"], keep='first')
+    df = df.sort_values(by=["page", "assessment_name"]).reset_index(drop=True)
+
+    # Remove 'page' column and reorder columns before saving
+    df = df.drop(columns=['page'])
+    return df[['id', 'assessment_name', 'url', 'remote_testing', 'adaptive_irt_support', 'test_type']]
+
+def save_catalog(products: List[Dict[str, Any]], pages: int, output_file=OUTPUT_FILE) -> Optional[pd.DataFrame]:
+    """Build the catalog DataFrame and save it to CSV in the data directory"""
+    df = build_catalog_dataframe(products)
+    if df is None:
+        logging.error("No products were scraped")
+        return None
+
+    df.to_csv(output_file, index=False)
+    logging.info(f"Successfully extracted {len(df)} products from {pages} pages")
+    logging.info(f"Data saved to {output_file}")
+    return df
+
+def scrape_all_shl_products(output_file=OUTPUT_FILE):
     """Main scraping function with improved error handling"""
     driver = None
     products = []
-    base_url = "https://www.shl.com/products/product-catalog/"
     
     try:
         driver = setup_driver()
@@ -161,7 +238,7 @@ def scrape_all_shl_products():
         
         while True:
             logging.info(f"Scraping page {page}...")
-            url = f"{base_url}?start={(page-1)*12}" if page > 1 else base_url
+            url = page_url(BASE_URL, page)
             
             page_products = scrape_page(driver, url, page)
             
@@ -181,35 +258,7 @@ def scrape_all_shl_products():
             except NoSuchElementException:
                 break
         
-        # Create and clean DataFrame
-        df = pd.DataFrame(products)
-        if not df.empty:
-            # Ensure proper data types
-            df = df.astype({
-                'page': 'int32',
-                'assessment_name': 'string',
-                'url': 'string',
-                'remote_testing': 'bool',
-                'adaptive_irt_support': 'bool',
-                'test_type': 'string',
-                'id': 'string'
-            })
-            
-            df = df.drop_duplicates(subset=["id"], keep='first')
-            df = df.sort_values(by=["page", "assessment_name"]).reset_index(drop=True)
-            
-            # Remove 'page' column and reorder columns before saving
-            df = df.drop(columns=['page'])
-            df = df[['id', 'assessment_name', 'url', 'remote_testing', 'adaptive_irt_support', 'test_type']]
-            # Save to CSV in the data directory
-            output_file = "app/data/product_catalog.csv"
-            df.to_csv(output_file, index=False)
-            logging.info(f"Successfully extracted {len(df)} products from {page-1} pages")
-            logging.info(f"Data saved to {output_file}")
-            return df
-        else:
-            logging.error("No products were scraped")
-            return None
+        return save_catalog(products, page - 1, output_file)
 
     except Exception as e:
         logging.error(f"Scraping failed: {str(e)}")
@@ -219,9 +268,334 @@ def scrape_all_shl_products():
         if driver:
             driver.quit()
 
+def crawl_pages(fetch: Callable[[int], tuple], pool: ThreadPoolExecutor, workers: int,
+                max_pages: Optional[int] = None):
+    """Fetch every catalog page on the pool; fetch(page) returns (products, last_page).
+
+    Returns (products, pages scraped), or (None, 0) when page 1 is empty.
+    """
+    first_products, last_page = pool.submit(fetch, 1).result()
+    if not first_products:
+        logging.error("No products found on the first page")
+        return None, 0
+    products = list(first_products)
+    if max_pages:
+        last_page = min(last_page or max_pages, max_pages)
+
+    if last_page:
+        # The page count is known, so every page can be fetched independently
+        for page, (page_products, _) in zip(range(2, last_page + 1),
+                                            pool.map(fetch, range(2, last_page + 1))):
+            if not page_products:
+                logging.warning(f"No products found on page {page}")
+            products.extend(page_products)
+        return products, last_page
+
+    # Unknown page count: fetch a wave of pages at a time until one comes back empty
+    page, pages, done = 2, 1, False
+    while not done:
+        wave = list(range(page, page + workers))
+        for wave_page, (page_products, _) in zip(wave, pool.map(fetch, wave)):
+            if not page_products:
+                done = True
+                break
+            products.extend(page_products)
+            pages = wave_page
+        page += workers
+    logging.info(f"No products found on page {pages + 1}. Assuming end of catalog.")
+    return products, pages
+
+def scrape_all_shl_products_parallel(workers: int = 4, requests_per_second: float = 0.5,
+                                     url_for_page: Optional[Callable[[int], str]] = None,
+                                     max_pages: Optional[int] = None,
+                                     driver_factory: Callable = setup_driver,
+                                     output_file=OUTPUT_FILE):
+    """Scrape catalog pages concurrently on a pool of drivers, one per worker thread.
+
+    All drivers share one rate limiter, so the site sees at most
+    requests_per_second page loads however many workers run.
+    """
+    url_for_page = url_for_page or (lambda page: page_url(BASE_URL, page))
+    limiter = RateLimiter(requests_per_second, burst=1)
+    local = threading.local()
+    drivers = []
+    drivers_lock = threading.Lock()
+
+    def fetch(page: int):
+        if not hasattr(local, "driver"):
+            local.driver = driver_factory()
+            with drivers_lock:
+                drivers.append(local.driver)
+        logging.info(f"Scraping page {page}...")
+        products = scrape_page(local.driver, url_for_page(page), page, limiter)
+        last_page = get_last_page(local.driver) if page == 1 else None
+        return products, last_page
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            products, pages = crawl_pages(fetch, pool, workers, max_pages)
+        if products is None:
+            return None
+        return save_catalog(products, pages, output_file)
+
+    except Exception as e:
+        logging.error(f"Scraping failed: {str(e)}")
+        raise
+
+    finally:
+        for driver in drivers:
+            driver.quit()
+
+# Lightweight HTTP engine: plain GETs on a pooled session, parsed with the
+# stdlib HTML parser, with an on-disk cache revalidated via ETag/Last-Modified.
+
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+class CatalogPageParser(HTMLParser):
+    """Extract product rows and the pagination bar from a catalog page"""
+
+    def __init__(self, page_num: int):
+        super().__init__(convert_charrefs=True)
+        self.page_num = page_num
+        self.products = []
+        self.page_numbers = []
+        self._depth = 0
+        self._row = None
+        self._general = 0
+        self._cell = None  # "title", "general", "keys" or None
+        self._capture = None  # (kind, depth at which the captured element closes)
+        self._text = []
+        self._in_pagination = False
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        classes = (attrs.get("class") or "").split()
+
+        if tag not in VOID_TAGS:
+            self._depth += 1
+
+        if tag == "tr" and (attrs.get("data-course-id") or attrs.get("data-entity-id")):
+            self._row = {
+                "Page": self.page_num,
+                "Assessment Name": "",
+                "URL": "",
+                "Remote Testing": False,
+                "Adaptive/IRT Support": False,
+                "Test Type": [],
+                "ID": attrs.get("data-course-id") or attrs.get("data-entity-id")
+            }
+            self._general = 0
+        elif tag == "li" and "pagination__item" in classes:
+            self._in_pagination = True
+        elif self._row is not None and tag == "td":
+            if "custom__table-heading__general" in classes:
+                self._general += 1
+            if "custom__table-heading__title" in classes:
+                self._cell = "title"
+            elif "product-catalogue__keys" in classes:
+                self._cell = "keys"
+            elif "custom__table-heading__general" in classes:
+                self._cell = "general"
+            else:
+                self._cell = None
+        elif self._row is not None and self._cell == "title" and tag == "a" and self._capture is None:
+            self._row["URL"] = attrs.get("href") or ""
+            self._start_capture("title")
+        elif self._row is not None and self._cell == "keys" and "product-catalogue__key" in classes:
+            self._start_capture("key")
+        elif self._row is not None and self._cell == "general" and \
+                "catalogue__circle" in classes and "-yes" in classes:
+            # Same column order as get_yes_no_status: 1 = remote testing, 2 = adaptive/IRT
+            if self._general == 1:
+                self._row["Remote Testing"] = True
+            elif self._general == 2:
+                self._row["Adaptive/IRT Support"] = True
+        elif self._in_pagination and tag == "a":
+            self._start_capture("page")
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if self._capture is not None and self._depth == self._capture[1]:
+            self._finish_capture()
+        self._depth -= 1
+
+        if tag == "td":
+            self._cell = None
+        elif tag == "li":
+            self._in_pagination = False
+        elif tag == "tr" and self._row is not None:
+            self._finish_row()
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._text.append(data)
+
+    def _start_capture(self, kind: str) -> None:
+        self._capture = (kind, self._depth)
+        self._text = []
+
+    def _finish_capture(self) -> None:
+        kind, _ = self._capture
+        text = clean_text("".join(self._text))
+        if kind == "title":
+            self._row["Assessment Name"] = text
+        elif kind == "key" and text:
+            self._row["Test Type"].append(text)
+        elif kind == "page" and text.isdigit():
+            self.page_numbers.append(int(text))
+        self._capture = None
+
+    def _finish_row(self) -> None:
+        row, self._row = self._row, None
+        if not row["Assessment Name"]:
+            logging.warning(f"Error processing row on page {self.page_num}: missing name")
+            return
+        codes = row["Test Type"]
+        row["Test Type"] = ", ".join(sorted(set(codes))) if codes else "N/A"
+        self.products.append(clean_product_data(row))
+
+def parse_catalog_page(html: str, page_num: int):
+    """Parse a catalog page into (products, last page number or None)"""
+    parser = CatalogPageParser(page_num)
+    parser.feed(html)
+    parser.close()
+    return parser.products, max(parser.page_numbers) if parser.page_numbers else None
+
+def create_http_session(pool_size: int = 4) -> requests.Session:
+    """Session with a connection pool sized for the worker count and retries on transient errors"""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504],
+                    allowed_methods=["GET"])
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers["User-Agent"] = "Mozilla/5.0 (compatible; shl-catalog-refresh)"
+    return session
+
+class PageCache:
+    """Cached page bodies and their parsed products, keyed by URL"""
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha256(url.encode('utf-8')).hexdigest()}.json"
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._path(url).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def put(self, url: str, entry: Dict[str, Any]) -> None:
+        path = self._path(url)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(entry))
+        os.replace(tmp, path)
+
+def scrape_page_http(session: requests.Session, url: str, page_num: int,
+                     cache: Optional[PageCache] = None, limiter: Optional[RateLimiter] = None,
+                     timeout: float = 30):
+    """Fetch and parse one page; unchanged pages (HTTP 304) are served from the cache.
+
+    file:// URLs (saved pages, test fixtures) are read from disk, uncached.
+    """
+    if url.startswith("file://"):
+        try:
+            html = Path(url2pathname(urlparse(url).path)).read_text(encoding="utf-8")
+        except OSError as e:
+            logging.error(f"Failed to read page {page_num}: {str(e)}")
+            return [], None
+        return parse_catalog_page(html, page_num)
+
+    cached = cache.get(url) if cache else None
+    headers = {}
+    if cached:
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    try:
+        if limiter:
+            limiter.acquire()
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached:
+            logging.info(f"Page {page_num} unchanged; using cached copy")
+            return cached["products"], cached.get("last_page")
+        response.raise_for_status()
+    except requests.RequestException as e:
+        logging.error(f"Failed to fetch page {page_num}: {str(e)}")
+        return [], None
+
+    products, last_page = parse_catalog_page(response.text, page_num)
+    if cache and products:
+        cache.put(url, {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "products": products,
+            "last_page": last_page
+        })
+    return products, last_page
+
+def scrape_all_shl_products_http(workers: int = 4, requests_per_second: float = 2.0,
+                                 url_for_page: Optional[Callable[[int], str]] = None,
+                                 max_pages: Optional[int] = None,
+                                 cache_dir: Optional[Path] = PAGE_CACHE_DIR,
+                                 output_file=OUTPUT_FILE):
+    """Scrape the catalog over plain HTTP; returns None if the pages have no parsable rows"""
+    url_for_page = url_for_page or (lambda page: page_url(BASE_URL, page))
+    limiter = RateLimiter(requests_per_second, burst=1)
+    cache = PageCache(cache_dir) if cache_dir else None
+    session = create_http_session(pool_size=workers)
+
+    def fetch(page: int):
+        logging.info(f"Fetching page {page}...")
+        return scrape_page_http(session, url_for_page(page), page, cache, limiter)
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            products, pages = crawl_pages(fetch, pool, workers, max_pages)
+        if products is None:
+            return None
+        return save_catalog(products, pages, output_file)
+    finally:
+        session.close()
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape the SHL product catalog")
+    parser.add_argument("--engine", choices=["auto", "http", "selenium"], default="auto",
+                        help="auto tries plain HTTP first and falls back to Selenium")
+    parser.add_argument("--workers", type=int, default=1, help="Concurrent sessions; more than 1 scrapes pages in parallel")
+    parser.add_argument("--rate", type=float, default=0.5, help="Page loads per second across all workers")
+    parser.add_argument("--url-template", help="Page URL with a {page} placeholder, e.g. file:///fixtures/page_{page}.html")
+    parser.add_argument("--max-pages", type=int)
+    parser.add_argument("--output", default=str(OUTPUT_FILE))
+    parser.add_argument("--no-cache", action="store_true", help="HTTP engine: skip the on-disk page cache")
+    args = parser.parse_args()
+
     try:
-        product_data = scrape_all_shl_products()
+        url_for_page = (lambda page: args.url_template.format(page=page)) if args.url_template else None
+        product_data = None
+        if args.engine in ("auto", "http"):
+            product_data = scrape_all_shl_products_http(
+                workers=args.workers, requests_per_second=args.rate, url_for_page=url_for_page,
+                max_pages=args.max_pages, cache_dir=None if args.no_cache else PAGE_CACHE_DIR,
+                output_file=args.output
+            )
+            if product_data is None and args.engine == "auto":
+                logging.warning("HTTP engine found no products; falling back to Selenium")
+
+        if product_data is None and args.engine in ("auto", "selenium"):
+            if args.workers > 1 or args.url_template:
+                product_data = scrape_all_shl_products_parallel(
+                    workers=args.workers, requests_per_second=args.rate, url_for_page=url_for_page,
+                    max_pages=args.max_pages, output_file=args.output
+                )
+            else:
+                product_data = scrape_all_shl_products(output_file=args.output)
         if product_data is not None:
             print("\nFirst few products:")
             print(product_data.head())